@@ -0,0 +1,237 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import datetime
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger("OperaMonitor")
+
+# 严重程度，数值越大越严重
+SEVERITY_WARNING = 1
+SEVERITY_CRITICAL = 2
+
+# 持续存在的问题（以及一切正常的状态）默认每天汇总发送一次
+DEFAULT_DIGEST_HOURS = 24
+
+# 上下文中的时间、序列号等变化的数字不参与指纹；ORA-/TNS- 等错误号保留
+_VOLATILE_NUMBER_RE = re.compile(r"(?<![A-Za-z]-)(?<![A-Za-z\d])\d+(?:[.:,/-]\d+)*")
+# Oracle 的 DD-MON-YY(YY) 日期（如 17-OCT-2026）整体替换，月份和年份变化时指纹不变
+_ORACLE_DATE_RE = re.compile(r"(?<![A-Za-z\d])\d{1,2}-[A-Za-z]{3}-\d{2,4}(?![A-Za-z\d])")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_context(text: str) -> str:
+    """把问题上下文规范化，同一问题在不同轮次中得到相同的文本。"""
+    text = _VOLATILE_NUMBER_RE.sub('#', _ORACLE_DATE_RE.sub('#', text))
+    return _WHITESPACE_RE.sub(' ', text).strip().lower()
+
+
+@dataclass
+class Alert:
+    """一轮检查中发现的一个问题。
+
+    属性:
+        target (str): 监控目标名称
+        key (str): 问题来源和规范化后的内容，同一问题在每轮中相同
+        summary (str): 显示的说明（本轮的原文）
+        severity (int): 严重程度
+    """
+    target: str
+    key: str
+    summary: str
+    severity: int = SEVERITY_CRITICAL
+
+    @property
+    def fingerprint(self) -> str:
+        return hashlib.sha1(f"{self.target}|{self.key}".encode('utf-8')).hexdigest()[:16]
+
+
+def make_alert(target: str, source: str, text: str, summary: Optional[str] = None,
+               severity: int = SEVERITY_CRITICAL) -> Alert:
+    """用来源和规范化后的文本创建问题，summary 默认为原文（合并为一行）。"""
+    summary = ' '.join((summary if summary is not None else text).split())
+    return Alert(target, f"{source}|{normalize_context(text)}", summary, severity)
+
+
+@dataclass
+class AlertChanges:
+    """一轮检查后问题状态的变化。
+
+    属性:
+        new (list): 新出现的问题
+        escalated (list): 严重程度升高的问题
+        resolved (list): 已恢复的问题
+        ongoing (list): 持续存在的问题（按首次出现时间排序）
+        digest (bool): 是否到了发送定期摘要的时间
+    """
+    new: List[Dict] = field(default_factory=list)
+    escalated: List[Dict] = field(default_factory=list)
+    resolved: List[Dict] = field(default_factory=list)
+    ongoing: List[Dict] = field(default_factory=list)
+    digest: bool = False
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.new or self.escalated or self.resolved)
+
+    @property
+    def should_notify(self) -> bool:
+        return self.has_changes or self.digest
+
+    def title(self) -> str:
+        """邮件标题中的标记。"""
+        if not self.has_changes:
+            return "定期摘要"
+        parts = []
+        if self.new:
+            parts.append(f"新问题{len(self.new)}个")
+        if self.escalated:
+            parts.append(f"升级{len(self.escalated)}个")
+        if self.resolved:
+            parts.append(f"已恢复{len(self.resolved)}个")
+        return "，".join(parts)
+
+    def format(self) -> str:
+        lines = []
+        sections = (("新出现的问题", self.new), ("严重程度升高的问题", self.escalated), ("已恢复的问题", self.resolved))
+        for title, records in sections:
+            if records:
+                lines.append(f"{title}:")
+                lines.extend(f"   - [{record['target']}] {record['summary']}" for record in records)
+                lines.append("")
+        if self.ongoing:
+            lines.append("持续存在的问题:")
+            for record in self.ongoing:
+                first_seen = datetime.datetime.fromtimestamp(record['first_seen']).strftime('%Y-%m-%d %H:%M')
+                lines.append(f"   - [{record['target']}] {record['summary']} "
+                             f"(自 {first_seen} 起，上次通知后又出现 {record['repeats']} 次)")
+            lines.append("")
+        elif not self.has_changes:
+            lines.append("没有持续存在的问题，所有检查正常。")
+            lines.append("")
+        return "\n".join(lines)
+
+
+class AlertTracker:
+    """按问题指纹记录每个问题的状态，决定一轮检查后是否需要发送邮件。
+
+    指纹由目标、问题来源和规范化后的上下文生成，同一个持续存在的问题
+    （例如已知的 ORA- 警告）每轮得到相同的指纹。只有新出现、严重程度升高
+    或已恢复的问题会触发邮件；持续的问题只累计次数，到了摘要间隔时合并
+    发送一次。邮件发送成功后调用 mark_sent()，发送失败时这些变化下一轮仍会通知。
+
+    属性:
+        state_path (str): 保存状态的JSON文件路径
+        digest_interval (float): 定期摘要的间隔（秒），0 表示不发送摘要
+    """
+
+    def __init__(self, state_path: str, digest_interval: float = DEFAULT_DIGEST_HOURS * 3600):
+        self.state_path = state_path
+        self.digest_interval = digest_interval
+        self._lock = threading.Lock()
+        self._state = self._load()
+
+    def _empty_state(self) -> Dict:
+        return {'alerts': {}, 'resolved': [], 'last_sent': 0.0}
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.state_path):
+            return self._empty_state()
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取告警状态时出错，所有问题将重新通知: {e}")
+            return self._empty_state()
+        for key, value in self._empty_state().items():
+            state.setdefault(key, value)
+        return state
+
+    def _save(self) -> None:
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir and not os.path.exists(state_dir):
+            os.makedirs(state_dir)
+        # 先写临时文件再替换，避免中途退出时损坏状态文件
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def update(self, alerts: Iterable[Alert], checked_targets: Iterable[str],
+               now: Optional[float] = None) -> AlertChanges:
+        """用一轮检查发现的问题更新状态。
+
+        Args:
+            alerts: 本轮发现的问题
+            checked_targets: 本轮完整检查过的目标；其他目标（脚本失败或未检查）的问题不会被当作已恢复
+            now: 当前时间戳，默认为当前时间
+
+        Returns:
+            AlertChanges: 需要通知的变化
+        """
+        now = time.time() if now is None else now
+        checked_targets = set(checked_targets)
+        with self._lock:
+            records = self._state['alerts']
+            seen = set()
+            for alert in alerts:
+                fingerprint = alert.fingerprint
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+                record = records.get(fingerprint)
+                if record is None:
+                    records[fingerprint] = {
+                        'target': alert.target, 'key': alert.key, 'summary': alert.summary,
+                        'severity': alert.severity, 'first_seen': now, 'last_seen': now,
+                        'count': 1, 'repeats': 0, 'pending': 'new'}
+                    continue
+                if alert.severity > record['severity'] and record['pending'] != 'new':
+                    record['pending'] = 'escalated'
+                elif record['pending'] is None:
+                    record['repeats'] += 1
+                # 严重程度降低时只更新记录，之后再次升高时会重新通知
+                record['severity'] = alert.severity
+                record['summary'] = alert.summary
+                record['last_seen'] = now
+                record['count'] += 1
+
+            for fingerprint in [fp for fp, record in records.items()
+                                if fp not in seen and record['target'] in checked_targets]:
+                record = records.pop(fingerprint)
+                # 尚未通知过的新问题在恢复前消失时不需要通知
+                if record['pending'] != 'new':
+                    record['resolved_at'] = now
+                    self._state['resolved'].append(record)
+
+            changes = AlertChanges(
+                new=[record for record in records.values() if record['pending'] == 'new'],
+                escalated=[record for record in records.values() if record['pending'] == 'escalated'],
+                resolved=list(self._state['resolved']),
+                ongoing=sorted((record for record in records.values() if record['pending'] is None),
+                               key=lambda record: record['first_seen']),
+            )
+            changes.digest = bool(self.digest_interval) and now - self._state['last_sent'] >= self.digest_interval
+            self._save()
+        return changes
+
+    def mark_sent(self, now: Optional[float] = None) -> None:
+        """邮件发送成功后调用：清除待通知的变化，持续问题的次数重新计数。"""
+        with self._lock:
+            for record in self._state['alerts'].values():
+                record['pending'] = None
+                record['repeats'] = 0
+            self._state['resolved'] = []
+            self._state['last_sent'] = time.time() if now is None else now
+            self._save()
+
+    def reset(self) -> None:
+        """清除所有状态，下一轮发现的问题都作为新问题通知。"""
+        with self._lock:
+            self._state = self._empty_state()
+            self._save()
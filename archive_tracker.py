@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import logging
+import datetime
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("OperaMonitor")
+
+# check_standby.sql 输出的 "THREAD# SEQUENCE# APPLIED" 行；旧脚本没有 THREAD# 列时按线程1处理
+_ARCHIVED_LOG_RE = re.compile(r"^[ \t]*(?:(\d+)[ \t]+)?(\d+)[ \t]+(YES|NO|IN-MEMORY)[ \t]*\r?$", re.MULTILINE)
+
+# check_standby.sql 输出的当前化身的 RESETLOGS_CHANGE#，RESETLOGS 或重建备库后改变
+_RESETLOGS_RE = re.compile(r"^[ \t]*RESETLOGS_CHANGE#[ \t]+(\d+)[ \t]*\r?$", re.MULTILINE)
+
+# 每个线程保留的最近归档日志行数，没有新日志时仍可显示
+RECENT_LOGS = 10
+
+
+@dataclass
+class ArchivedLog:
+    """v$archived_log 中的一行。"""
+    thread: int
+    sequence: int
+    applied: str
+
+
+@dataclass
+class ThreadStatus:
+    """一个重做线程的日志接收和应用状态。
+
+    属性:
+        thread (int): 线程号
+        applied (int): 连续应用到的最高序列号（水位线）
+        received (int): 已接收的最高序列号
+        gaps (list): 水位线之后缺失的序列号
+        not_applied (list): 已接收但尚未应用的序列号
+    """
+    thread: int
+    applied: int
+    received: int
+    gaps: List[int] = field(default_factory=list)
+    not_applied: List[int] = field(default_factory=list)
+
+    @property
+    def lag(self) -> int:
+        """已接收但未应用的日志数。"""
+        return self.received - self.applied
+
+
+def parse_archived_logs(output: str) -> List[ArchivedLog]:
+    """从 check_standby 输出中提取归档日志行。"""
+    return [ArchivedLog(int(thread or 1), int(sequence), applied)
+            for thread, sequence, applied in _ARCHIVED_LOG_RE.findall(output or '')]
+
+
+def parse_resetlogs(output: str) -> Optional[int]:
+    """从 check_standby 输出中提取 RESETLOGS_CHANGE#，旧脚本没有输出时返回 None。"""
+    match = _RESETLOGS_RE.search(output or '')
+    return int(match.group(1)) if match else None
+
+
+class ArchiveLogTracker:
+    """按线程持久化归档日志的应用水位线，只处理水位线之后的增量。
+
+    check_standby.sql 接收每个线程的水位线作为参数，只查询序列号大于水位线的行，
+    所以每轮的输出和分析耗时只与未应用的日志数有关，不随归档历史增长。
+    水位线是每个线程连续应用到的最高序列号，之后的缺口和未应用日志
+    每轮都会重新检查，直到被应用。水位线与记录时的 RESETLOGS_CHANGE# 一起保存，
+    RESETLOGS 或重建备库后序列号从头开始，此时自动清除旧的水位线。
+
+    属性:
+        state_path (str): 保存水位线的JSON文件路径
+    """
+
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._state = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取归档日志水位线时出错，将重新全量检查: {e}")
+            return {}
+
+    def _save(self) -> None:
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir and not os.path.exists(state_dir):
+            os.makedirs(state_dir)
+        # 先写临时文件再替换，避免中途退出时损坏状态文件
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def watermarks(self, target: str) -> Dict[int, int]:
+        """每个线程的应用水位线。"""
+        with self._lock:
+            return {int(thread): info['applied'] for thread, info in self._state.get(target, {}).items()}
+
+    def watermark_arg(self, target: str) -> str:
+        """传给 check_standby.sql 的参数，格式为 "线程:水位线/线程:水位线"，没有记录时为 "0"（查询全部）。"""
+        watermarks = self.watermarks(target)
+        if not watermarks:
+            return '0'
+        return '/'.join(f"{thread}:{applied}" for thread, applied in sorted(watermarks.items()))
+
+    def reset(self, target: str) -> None:
+        """清除目标的水位线（例如备库 RESETLOGS 之后），下一轮重新全量检查。"""
+        with self._lock:
+            if self._state.pop(target, None) is not None:
+                self._save()
+
+    def recent_logs(self, target: str) -> List[ArchivedLog]:
+        """每个线程最近的归档日志行，按线程号和序列号排序。"""
+        with self._lock:
+            threads = self._state.get(target, {})
+            return [ArchivedLog(int(thread), sequence, applied)
+                    for thread in sorted(threads, key=int)
+                    for sequence, applied in threads[thread].get('recent', [])]
+
+    def update(self, target: str, logs: List[ArchivedLog], resetlogs: Optional[int] = None) -> List[ThreadStatus]:
+        """用本轮查询到的增量行更新水位线，并计算每个线程的缺口和延迟。
+
+        Args:
+            target: 监控目标名称
+            logs: 本轮查询到的归档日志行
+            resetlogs: 本轮查询到的 RESETLOGS_CHANGE#，与保存的不同时先清除水位线
+
+        Returns:
+            List[ThreadStatus]: 按线程号排序的状态
+        """
+        with self._lock:
+            threads = self._state.setdefault(target, {})
+            if resetlogs is not None and any(info.get('resetlogs') not in (None, resetlogs) for info in threads.values()):
+                logger.warning(f"{target}: RESETLOGS_CHANGE# 已变为 {resetlogs}（RESETLOGS 或重建备库），"
+                               f"清除旧的归档日志水位线后重新计算")
+                threads.clear()
+
+            # 同一序列号可能对应多个归档目的地，任意一行已应用即视为已应用
+            by_thread = {}
+            for log in logs:
+                sequences = by_thread.setdefault(log.thread, {})
+                if sequences.get(log.sequence) != 'YES':
+                    sequences[log.sequence] = log.applied
+
+            statuses = []
+            for thread in sorted(set(by_thread) | {int(key) for key in threads}):
+                info = threads.get(str(thread), {'applied': 0, 'received': 0})
+                watermark = info['applied']
+                rows = by_thread.get(thread, {})
+                # 旧版 check_standby.sql 不接收参数时会返回全部行，这里再过滤一次
+                sequences = {seq: applied == 'YES' for seq, applied in rows.items() if seq > watermark}
+
+                received = max([info['received']] + list(sequences))
+                if watermark == 0 and sequences:
+                    # 首次检查：从查询到的最早序列号开始
+                    watermark = min(sequences) - 1
+
+                # 水位线推进到连续已应用的最高序列号
+                applied = watermark
+                while sequences.get(applied + 1):
+                    applied += 1
+
+                gaps = [seq for seq in range(applied + 1, received + 1) if seq not in sequences]
+                not_applied = [seq for seq, is_applied in sorted(sequences.items()) if seq > applied and not is_applied]
+                statuses.append(ThreadStatus(thread, applied, received, gaps, not_applied))
+
+                # 本轮的行覆盖保存的同一序列号的状态，只保留最近的几行
+                recent = dict(info.get('recent', []))
+                recent.update(rows)
+                threads[str(thread)] = {
+                    'applied': applied,
+                    'received': received,
+                    'resetlogs': resetlogs if resetlogs is not None else info.get('resetlogs'),
+                    'recent': [[seq, recent[seq]] for seq in sorted(recent)[-RECENT_LOGS:]],
+                    'updated': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                }
+
+            try:
+                self._save()
+            except OSError as e:
+                logger.error(f"保存归档日志水位线时出错: {e}")
+            return statuses
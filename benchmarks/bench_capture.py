@@ -0,0 +1,105 @@
+"""脚本输出捕获性能测试。
+
+生成一个模拟的sqlplus输出文件（默认100 MB），分别用旧的逐行拼接方式和
+script_runner.run_script 读取，比较耗时和吞吐量。
+
+用法:
+    python benchmarks/bench_capture.py [大小MB]
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script_runner import run_script  # noqa: E402
+
+SPOOL_LINE = "  {seq:>10}  YES  ARCH  RFS  {seq:>10}  o1_mf_1_{seq}_.arc   DONE\n"
+
+
+def make_spool(path, size_mb):
+    target = size_mb * 1024 * 1024
+    written = 0
+    seq = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < target:
+            block = "".join(SPOOL_LINE.format(seq=seq + i) for i in range(1000))
+            f.write(block)
+            written += len(block)
+            seq += 1000
+    return written
+
+
+def cat_command(path, stderr_lines=0):
+    code = (
+        "import sys, shutil;"
+        f"[sys.stderr.write('ORA-00000 warning line %d\\n' % i) for i in range({stderr_lines})];"
+        f"shutil.copyfileobj(open(r'{path}', 'rb'), sys.stdout.buffer)"
+    )
+    return f'"{sys.executable}" -c "{code}"'
+
+
+def legacy_capture(command):
+    """旧版 run_batch_file 的读取方式（不含界面更新）"""
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               shell=True, text=True, encoding='utf-8', errors='replace')
+    output = ""
+    lines = 0
+    while True:
+        line = process.stdout.readline()
+        if not line and process.poll() is not None:
+            break
+        if line:
+            output += line
+            lines += 1
+    stdout, stderr = process.communicate()
+    output += stdout
+    if stderr:
+        output += "\n错误输出:\n" + stderr
+    return output, lines
+
+
+def new_capture(command, max_output_size):
+    counter = [0]
+
+    def on_output(source, lines):
+        counter[0] += len(lines)
+
+    output = run_script(command, output_callback=on_output, max_output_size=max_output_size)
+    return output, counter[0]
+
+
+def report(name, elapsed, size, lines, retained):
+    mb = size / 1024 / 1024
+    print(f"{name:<28} {elapsed:8.2f} s  {mb / elapsed:8.1f} MB/s  {lines:>10} 行  保留 {retained / 1024 / 1024:.1f} MB")
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    with tempfile.TemporaryDirectory() as tmp:
+        spool = os.path.join(tmp, 'spool.lst')
+        size = make_spool(spool, size_mb)
+        print(f"模拟输出: {size / 1024 / 1024:.1f} MB")
+
+        start = time.perf_counter()
+        output, lines = legacy_capture(cat_command(spool))
+        report("旧版 (readline + +=)", time.perf_counter() - start, size, lines, len(output))
+
+        start = time.perf_counter()
+        output, lines = new_capture(cat_command(spool), max_output_size=0)
+        report("run_script (不限制)", time.perf_counter() - start, size, lines, len(output))
+
+        start = time.perf_counter()
+        output, lines = new_capture(cat_command(spool), max_output_size=10 * 1024 * 1024)
+        report("run_script (保留10MB)", time.perf_counter() - start, size, lines, len(output))
+
+        # 大量错误输出：旧版先读完stdout再读stderr，stderr写满管道时会互相等待
+        start = time.perf_counter()
+        output, lines = new_capture(cat_command(spool, stderr_lines=200000), max_output_size=10 * 1024 * 1024)
+        report("run_script (大量stderr)", time.perf_counter() - start, size, lines, len(output))
+
+
+if __name__ == '__main__':
+    main()
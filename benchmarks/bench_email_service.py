@@ -0,0 +1,229 @@
+"""确认函邮件发送吞吐量测试（不会发出真实邮件）。
+
+在进程内启动一个本地SMTP接收服务器（只计数、丢弃邮件），生成指定规模的
+"年-月-供应商-确认函.xlsx" 模拟文件夹和对应的 email.ini，然后分别用以下模式
+运行 EmailService.process_folder：
+
+    sequential  每封邮件单独建立连接并登录（smtp_max_messages_per_connection: 1）
+    pooled      复用已登录的会话，逐个发送
+    concurrent  复用会话，多线程并行发送
+
+每种模式在单独的子进程中运行，报告邮件数/秒、单封邮件耗时的 p50/p99、
+建立的连接数和进程峰值内存（RSS）。
+
+用法:
+    python benchmarks/bench_email_service.py [--vendors 300] [--files-per-vendor 2] [--size-kb 200]
+                                             [--workers 8] [--server-delay-ms 5]
+                                             [--modes sequential,pooled,concurrent]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import socketserver
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ('sequential', 'pooled', 'concurrent')
+
+
+class SinkStats:
+    connections = 0
+    messages = 0
+    bytes = 0
+    delay = 0.0
+    lock = threading.Lock()
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """最小的SMTP服务器：接受登录和所有收件人，读取并丢弃邮件内容。"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        with SinkStats.lock:
+            SinkStats.connections += 1
+        self.reply('220 sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.strip().upper()
+            if command.startswith((b'EHLO', b'HELO')):
+                self.reply('250-sink')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif command.startswith(b'AUTH'):
+                self.reply('235 ok')
+            elif command == b'DATA':
+                self.reply('354 go ahead')
+                size = 0
+                for data in iter(self.rfile.readline, b''):
+                    if data == b'.\r\n':
+                        break
+                    size += len(data)
+                if SinkStats.delay:
+                    time.sleep(SinkStats.delay)
+                with SinkStats.lock:
+                    SinkStats.messages += 1
+                    SinkStats.bytes += size
+                self.reply('250 queued')
+            elif command == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+def start_sink(delay):
+    SinkStats.delay = delay
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SinkHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_folder(path, vendors, files_per_vendor, size_kb):
+    """生成模拟确认函文件，返回供应商名称列表。"""
+    os.makedirs(path, exist_ok=True)
+    content = os.urandom(size_kb * 1024)
+    names = [f"供应商{i:04d}" for i in range(vendors)]
+    for name in names:
+        for j in range(files_per_vendor):
+            # 同一供应商的多个文件用税率区分：年-月-供应商%税率-确认函.xlsx
+            rate = f"%{j * 3 + 6}" if files_per_vendor > 1 else ""
+            with open(os.path.join(path, f"2025-07-{name}{rate}-确认函.xlsx"), 'wb') as f:
+                f.write(content)
+    return names
+
+
+def write_config(path, port, vendors, mode, workers):
+    settings = {
+        'smtp_host': '127.0.0.1',
+        'smtp_port': port,
+        'smtp_encryption': 'none',
+        'smtp_username': 'bench',
+        'smtp_password': 'bench',
+        'smtp_max_messages_per_connection': 1 if mode == 'sequential' else 0,
+        'smtp_max_workers': workers if mode == 'concurrent' else 1,
+        'outbox_path': f'outbox_{mode}.db',
+        'scan_manifest_path': f'manifest_{mode}.json',
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        for key, value in settings.items():
+            f.write(f"{key}: {value}\n")
+        for i, name in enumerate(vendors):
+            f.write(f"{name}: vendor{i:04d}@example.com\n")
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以KB为单位，macOS 以字节为单位
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def run_mode(args):
+    """在子进程中运行一种模式，结果以JSON输出到标准输出。"""
+    logging.disable(logging.CRITICAL)
+    server = start_sink(args.server_delay_ms / 1000)
+    os.chdir(args.work_dir)
+    with open('vendors.json', encoding='utf-8') as f:
+        vendors = json.load(f)
+    write_config('email.ini', server.server_address[1], vendors, args.run_mode, args.workers)
+
+    from email_service import EmailService
+
+    latencies = []
+
+    class TimedEmailService(EmailService):
+        def send_reconciliation_email(self, *a, **kw):
+            start = time.perf_counter()
+            try:
+                return super().send_reconciliation_email(*a, **kw)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+    service = TimedEmailService()
+    start = time.perf_counter()
+    service.process_folder('confirmations')
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    print(json.dumps({
+        'mode': args.run_mode,
+        'messages': SinkStats.messages,
+        'failed': len(service.failed_vendors) + len(service.skipped_vendors),
+        'elapsed': elapsed,
+        'rate': SinkStats.messages / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'connections': SinkStats.connections,
+        'mb_sent': SinkStats.bytes / 1024 / 1024,
+        'peak_rss': peak_rss_mb(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="确认函邮件发送吞吐量测试")
+    parser.add_argument('--vendors', type=int, default=300, help="供应商数量")
+    parser.add_argument('--files-per-vendor', type=int, default=2, help="每个供应商的确认函数量")
+    parser.add_argument('--size-kb', type=int, default=200, help="每个确认函的大小（KB）")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent 模式的线程数")
+    parser.add_argument('--server-delay-ms', type=float, default=5, help="服务器处理每封邮件的模拟延迟（毫秒）")
+    parser.add_argument('--modes', default=','.join(MODES), help="要运行的模式，逗号分隔")
+    parser.add_argument('--run-mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args)
+        return
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    work_dir = tempfile.mkdtemp(prefix="bench_email_")
+    try:
+        vendors = make_folder(os.path.join(work_dir, 'confirmations'), args.vendors,
+                              args.files_per_vendor, args.size_kb)
+        with open(os.path.join(work_dir, 'vendors.json'), 'w', encoding='utf-8') as f:
+            json.dump(vendors, f, ensure_ascii=False)
+        print(f"供应商: {args.vendors}, 每个供应商 {args.files_per_vendor} 个文件 x {args.size_kb} KB, "
+              f"服务器延迟 {args.server_delay_ms:g} ms")
+        print(f"{'模式':<12} {'邮件数':>6} {'耗时(s)':>8} {'邮件/秒':>8} {'p50(ms)':>8} {'p99(ms)':>8} "
+              f"{'连接数':>6} {'峰值RSS(MB)':>11}")
+
+        for mode in modes:
+            command = [sys.executable, os.path.abspath(__file__), '--run-mode', mode, '--work-dir', work_dir,
+                       '--workers', str(args.workers), '--server-delay-ms', str(args.server_delay_ms)]
+            output = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8').stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            rss = f"{result['peak_rss']:.1f}" if result['peak_rss'] is not None else "-"
+            failed = f"  ({result['failed']} 个失败)" if result['failed'] else ""
+            print(f"{mode:<12} {result['messages']:>6} {result['elapsed']:>8.2f} {result['rate']:>8.1f} "
+                  f"{result['p50']:>8.1f} {result['p99']:>8.1f} {result['connections']:>6} {rss:>11}{failed}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
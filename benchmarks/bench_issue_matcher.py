@@ -0,0 +1,109 @@
+"""错误模式匹配性能测试。
+
+生成一个数MB的模拟HTML报告，用60个错误模式分别测试旧版逐行逐模式的
+check_for_issues 和 IssueMatcher（整段文本 / 流式读取文件），比较耗时。
+
+用法:
+    python benchmarks/bench_issue_matcher.py [大小MB] [模式数]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from issue_matcher import IssueMatcher  # noqa: E402
+
+BASE_PATTERNS = ['error', 'warning', 'danger', 'failed', 'ORA-', 'TNS-']
+ROW = ('<tr><td align="right">{n}</td><td>USERS</td><td align="right">{size:,.3f}</td>'
+       '<td align="right">{used:.2f}</td><td>PERMANENT</td><td>{status}</td></tr>\n')
+
+
+def make_patterns(count):
+    patterns = list(BASE_PATTERNS)
+    i = 0
+    while len(patterns) < count:
+        patterns.append(f"ORA-{i:05d}x" if i % 2 else f"keyword{i}")
+        i += 1
+    return patterns
+
+
+def make_report(size_mb, seed=1):
+    rnd = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    parts = []
+    size = 0
+    n = 0
+    while size < target:
+        status = 'OK'
+        roll = rnd.random()
+        if roll < 0.001:
+            status = '<b>DANGER</b>'
+        elif roll < 0.002:
+            status = 'ORA-01555: snapshot too old'
+        row = ROW.format(n=n, size=rnd.random() * 10000, used=rnd.random() * 100, status=status)
+        parts.append(row)
+        size += len(row)
+        n += 1
+    return ''.join(parts)
+
+
+def legacy_check_for_issues(text, error_patterns):
+    """旧版 OperaMonitor.check_for_issues"""
+    issues = []
+    lines = text.lower().split('\n')
+    for i, line in enumerate(lines):
+        for pattern in error_patterns:
+            if pattern in line:
+                start = max(0, i - 1)
+                end = min(len(lines), i + 2)
+                context = '\n'.join(lines[start:end])
+                issues.append(f"发现 '{pattern}': {context}")
+                break
+    return issues
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    pattern_count = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+
+    patterns = make_patterns(pattern_count)
+    text = make_report(size_mb)
+    print(f"报告大小: {len(text) / 1024 / 1024:.1f} MB, 行数: {text.count(chr(10))}, 模式数: {len(patterns)}")
+
+    legacy_time, legacy_issues = timed(legacy_check_for_issues, text, [p.lower() for p in patterns])
+    print(f"{'旧版 (逐行 x 逐模式)':<26} {legacy_time:8.3f} s  {len(legacy_issues)} 个问题")
+
+    matcher = IssueMatcher(patterns)
+    compile_time, _ = timed(IssueMatcher, patterns)
+    print(f"{'IssueMatcher 编译':<26} {compile_time * 1000:8.3f} ms")
+
+    new_time, new_issues = timed(matcher.find_issues, text)
+    print(f"{'IssueMatcher.find_issues':<26} {new_time:8.3f} s  {len(new_issues)} 个问题  "
+          f"({legacy_time / new_time:.1f}x)")
+
+    with tempfile.NamedTemporaryFile('w', suffix='.html', encoding='utf-8', delete=False) as f:
+        f.write(text)
+        path = f.name
+    try:
+        scan_time, scan_issues = timed(matcher.scan_file, path)
+        print(f"{'IssueMatcher.scan_file':<26} {scan_time:8.3f} s  {len(scan_issues)} 个问题  "
+              f"({legacy_time / scan_time:.1f}x)")
+    finally:
+        os.remove(path)
+
+    whole_word = IssueMatcher(patterns, whole_word=True)
+    word_time, word_issues = timed(whole_word.find_issues, text)
+    print(f"{'IssueMatcher (整词匹配)':<26} {word_time:8.3f} s  {len(word_issues)} 个问题")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,5 +2,5 @@
 chcp 65001
 set NLS_LANG=AMERICAN_AMERICA.AL32UTF8
 
-SQLPLUS "SYS/opera10g AS SYSDBA" @D:\SCRIPTS\CHECK_STANDBY.SQL
+SQLPLUS "SYS/opera10g AS SYSDBA" @D:\SCRIPTS\CHECK_STANDBY.SQL %1
 pause
\ No newline at end of file
@@ -1,4 +1,20 @@
 select process, status, sequence# from v$managed_standby;
 select database_role,controlfile_type,open_mode,protection_mode from v$database;
-Select sequence#,applied from v$archived_log;
-
+-- RESETLOGS or a rebuilt standby restarts sequence numbers; the monitor resets its watermarks when this changes
+select 'RESETLOGS_CHANGE# ' || resetlogs_change# incarnation from v$database;
+-- Argument 1: applied sequence watermark per thread from the last check, e.g. 1:1234/2:567
+-- Only archived logs of the current incarnation after the watermark are listed;
+-- threads not in the list (or no argument) list all rows
+set verify off
+column 1 new_value 1 noprint
+select '' "1" from dual where rownum = 0;
+select thread#, sequence#, applied
+  from (select thread#, sequence#, applied,
+               instr(marks, tkey) pos, length(tkey) keylen, marks
+          from (select l.thread#, l.sequence#, l.applied,
+                       '/' || '&1' || '/' marks, '/' || l.thread# || ':' tkey
+                  from v$archived_log l
+                 where l.resetlogs_change# = (select resetlogs_change# from v$database)))
+ where pos = 0
+    or sequence# > to_number(substr(marks, pos + keylen, instr(marks, '/', pos + keylen) - pos - keylen))
+ order by thread#, sequence#;
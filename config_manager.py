@@ -0,0 +1,396 @@
+import os
+import sys
+import time
+import logging
+import threading
+import configparser
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from fleet_executor import load_targets, DEFAULT_CHECK_STANDBY_TIMEOUT, DEFAULT_DAILY_REPORT_TIMEOUT
+from script_runner import DEFAULT_MAX_OUTPUT_SIZE
+from issue_matcher import IssueMatcher, DEFAULT_ERROR_PATTERNS
+from metrics_store import DEFAULT_RETENTION_DAYS
+from log_buffer import DEFAULT_MAX_LINES
+from metric_baseline import DEFAULT_ALPHA, DEFAULT_SIGMA, DEFAULT_WARMUP
+from alert_state import DEFAULT_DIGEST_HOURS
+from oracle_backend import BACKEND_SQLPLUS, BACKEND_ORACLEDB
+from log_pipeline import (LogOptions, LOG_FORMAT_TEXT, LOG_FORMAT_JSON, DEFAULT_LOG_FILE, DEFAULT_MAX_SIZE_MB,
+                          DEFAULT_ROTATE_HOURS, DEFAULT_BACKUP_COUNT)
+
+logger = logging.getLogger("OperaMonitor")
+
+# 两次检查配置文件修改时间的最短间隔（秒），避免每次读取设置都访问文件系统
+RELOAD_CHECK_INTERVAL = 2.0
+
+_BOOLEAN_STATES = configparser.ConfigParser.BOOLEAN_STATES
+
+
+def _parse_boolean(value: str) -> bool:
+    state = _BOOLEAN_STATES.get(value.strip().lower())
+    if state is None:
+        raise ValueError(f"不是有效的布尔值: {value}")
+    return state
+
+
+class _SettingsReader:
+    """从 [Settings] 节读取并校验一个选项；无效的值记录问题并使用默认值。"""
+
+    def __init__(self, config: configparser.ConfigParser, section: str = 'Settings'):
+        self.config = config
+        self.section = section
+        self.problems: List[str] = []
+
+    def read(self, option: str, convert: Callable, default, check: Optional[Callable] = None,
+             requirement: str = ''):
+        raw = self.config.get(self.section, option, fallback=None)
+        if raw is None or not raw.strip():
+            return default
+        try:
+            value = convert(raw.strip())
+        except ValueError:
+            self.problems.append(f"{option} = {raw} 无效，使用默认值 {default}")
+            return default
+        if check is not None and not check(value):
+            self.problems.append(f"{option} = {raw} {requirement}，使用默认值 {default}")
+            return default
+        return value
+
+    def boolean(self, option: str, default: bool) -> bool:
+        return self.read(option, _parse_boolean, default)
+
+    def integer(self, option: str, default: int, minimum: int = 0) -> int:
+        return self.read(option, int, default, lambda value: value >= minimum, f"应不小于 {minimum}")
+
+    def number(self, option: str, default: float, check: Callable, requirement: str) -> float:
+        return self.read(option, float, default, check, requirement)
+
+
+@dataclass(frozen=True)
+class MonitorSettings:
+    """[Settings] 节中每轮监控都要用到的设置，读取配置时编译一次。
+
+    所有值都已转换为对应的类型并经过校验；错误模式已编译为 IssueMatcher，
+    每轮检查不再重复拆分模式和构建正则表达式。快照是只读的，配置变化时
+    由 ConfigManager 重新编译一个新的快照。
+
+    属性:
+        matcher (IssueMatcher): 由 error_patterns / match_ignore_case / match_whole_word 编译的匹配器
+        problems (tuple): 校验时发现的无效选项说明
+        其余属性与 [Settings] 节中的同名选项对应
+    """
+    check_errors: bool
+    matcher: IssueMatcher
+    auto_run_interval: int
+    auto_send_email: bool
+    run_missed_schedules: bool
+    check_standby_timeout: int
+    daily_report_timeout: int
+    max_output_size: int
+    concurrent_scripts: bool
+    fleet_mode: bool
+    fleet_max_workers: int
+    fleet_target_timeout: int
+    metrics_retention_days: int
+    log_max_lines: int
+    baseline_alpha: float
+    baseline_sigma: float
+    baseline_warmup: int
+    alert_dedup: bool
+    alert_digest_hours: float
+    db_backend: str
+    log_format: str
+    log_max_size_mb: float
+    log_rotate_hours: float
+    log_backup_count: int
+    log_compress: bool
+    problems: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_config(cls, config: configparser.ConfigParser) -> 'MonitorSettings':
+        reader = _SettingsReader(config)
+        patterns = config.get('Settings', 'error_patterns', fallback=DEFAULT_ERROR_PATTERNS)
+        matcher = IssueMatcher.from_string(patterns,
+                                           ignore_case=reader.boolean('match_ignore_case', True),
+                                           whole_word=reader.boolean('match_whole_word', False))
+        return cls(
+            check_errors=reader.boolean('check_errors', True),
+            matcher=matcher,
+            auto_run_interval=reader.integer('auto_run_interval', 86400, minimum=1),
+            auto_send_email=reader.boolean('auto_send_email', False),
+            run_missed_schedules=reader.boolean('run_missed_schedules', True),
+            check_standby_timeout=reader.integer('check_standby_timeout', DEFAULT_CHECK_STANDBY_TIMEOUT),
+            daily_report_timeout=reader.integer('daily_report_timeout', DEFAULT_DAILY_REPORT_TIMEOUT),
+            max_output_size=reader.integer('max_output_size', DEFAULT_MAX_OUTPUT_SIZE),
+            concurrent_scripts=reader.boolean('concurrent_scripts', False),
+            fleet_mode=reader.boolean('fleet_mode', False),
+            fleet_max_workers=reader.integer('fleet_max_workers', 4, minimum=1),
+            fleet_target_timeout=reader.integer('fleet_target_timeout', 1800),
+            metrics_retention_days=reader.integer('metrics_retention_days', DEFAULT_RETENTION_DAYS),
+            log_max_lines=reader.integer('log_max_lines', DEFAULT_MAX_LINES, minimum=1),
+            baseline_alpha=reader.number('baseline_alpha', DEFAULT_ALPHA, lambda value: 0 < value <= 1,
+                                         "应在 (0, 1] 之间"),
+            baseline_sigma=reader.number('baseline_sigma', DEFAULT_SIGMA, lambda value: value > 0, "应大于 0"),
+            baseline_warmup=reader.integer('baseline_warmup', DEFAULT_WARMUP),
+            alert_dedup=reader.boolean('alert_dedup', True),
+            alert_digest_hours=reader.number('alert_digest_hours', DEFAULT_DIGEST_HOURS,
+                                             lambda value: value >= 0, "应不小于 0"),
+            db_backend=reader.read('db_backend', str.lower, BACKEND_SQLPLUS,
+                                   lambda value: value in (BACKEND_SQLPLUS, BACKEND_ORACLEDB),
+                                   f"应为 {BACKEND_SQLPLUS} 或 {BACKEND_ORACLEDB}"),
+            log_format=reader.read('log_format', str.lower, LOG_FORMAT_TEXT,
+                                   lambda value: value in (LOG_FORMAT_TEXT, LOG_FORMAT_JSON),
+                                   f"应为 {LOG_FORMAT_TEXT} 或 {LOG_FORMAT_JSON}"),
+            log_max_size_mb=reader.number('log_max_size_mb', DEFAULT_MAX_SIZE_MB, lambda value: value >= 0, "应不小于 0"),
+            log_rotate_hours=reader.number('log_rotate_hours', DEFAULT_ROTATE_HOURS,
+                                           lambda value: value >= 0, "应不小于 0"),
+            log_backup_count=reader.integer('log_backup_count', DEFAULT_BACKUP_COUNT),
+            log_compress=reader.boolean('log_compress', True),
+            # 关键字参数按顺序求值，此时所有选项都已读取
+            problems=tuple(reader.problems),
+        )
+
+
+class ConfigManager:
+    def get_app_dir(self):
+        """获取应用程序根目录"""
+        if getattr(sys, 'frozen', False):
+            # 如果是打包后的可执行文件
+            return os.path.dirname(sys.executable)
+        else:
+            # 如果是开发环境
+            return os.path.dirname(os.path.abspath(__file__))
+            
+    def __init__(self, config_file="opera_monitor.ini"):
+        # 如果配置文件路径不是绝对路径，则使用应用程序目录
+        if not os.path.isabs(config_file):
+            app_dir = self.get_app_dir()
+            self.config_file = os.path.join(app_dir, config_file)
+        else:
+            self.config_file = config_file
+        self.config = configparser.ConfigParser()
+        self._lock = threading.RLock()
+        self._settings: Optional[MonitorSettings] = None
+        self._mtime_ns: Optional[int] = None
+        self._last_check = 0.0
+        self._batch_depth = 0
+        self._dirty = False
+        self.load_config()
+    
+    def load_config(self):
+        # 获取应用程序根目录
+        app_dir = self.get_app_dir()
+            
+        # 默认配置
+        default_config = {
+            'Email': {
+                'smtp_server': 'smtp.example.com',
+                'smtp_port': '587',
+                'sender_email': 'your_email@example.com',
+                'sender_password': '',
+                'recipient_emails': 'recipient1@example.com,recipient2@example.com',
+                'use_tls': 'True'
+            },
+            'Paths': {
+                'check_standby_bat': os.path.join(app_dir, 'check_standby.bat'),
+                'daily_report_bat': os.path.join(app_dir, 'daily_report.bat'),
+                'report_path': os.path.join(app_dir, 'logs', 'daily_report.html'),
+                'metrics_db': os.path.join(app_dir, 'logs', 'opera_metrics.db'),
+                'archive_state': os.path.join(app_dir, 'logs', 'archive_watermark.json'),
+                'baseline_state': os.path.join(app_dir, 'logs', 'metric_baselines.json'),
+                'alert_state': os.path.join(app_dir, 'logs', 'alert_state.json'),
+                'report_snapshots': os.path.join(app_dir, 'logs', 'report_snapshots.json'),
+                'log_file': os.path.join(app_dir, 'logs', 'opera_monitor.log')
+            },
+            'Settings': {
+                'auto_run_interval': '86400',  # 24小时，单位：秒
+                'daily_report_schedule': '',  # 完整检查的计划，如 "0 6 * * *"，为空时按 auto_run_interval 运行
+                'standby_check_schedule': '',  # 只检查备库的计划，如 "5m" 或 "*/5 * * * *"，为空时不单独检查
+                'run_missed_schedules': 'True',  # 错过的计划合并为一次立即补跑
+                'check_errors': 'True',
+                'error_patterns': 'error,warning,danger,failed,ORA-,TNS-',
+                'match_ignore_case': 'True',  # 错误模式匹配时忽略大小写
+                'match_whole_word': 'False',  # 错误模式只匹配完整的词
+                # 脚本超时时间，单位：秒，0表示不限制；未配置时分别为600秒和1800秒
+                'check_standby_timeout': str(DEFAULT_CHECK_STANDBY_TIMEOUT),
+                'daily_report_timeout': str(DEFAULT_DAILY_REPORT_TIMEOUT),
+                'max_output_size': str(DEFAULT_MAX_OUTPUT_SIZE),  # 每个脚本最多保留的输出，单位：字符
+                'concurrent_scripts': 'False',  # 同时运行check_standby和daily_report
+                'fleet_mode': 'False',  # 机群模式：并行检查所有 [Target:名称] 节定义的数据库
+                'fleet_max_workers': '4',
+                'fleet_target_timeout': '1800',  # 单个目标的超时时间，单位：秒
+                'metrics_retention_days': str(DEFAULT_RETENTION_DAYS),  # 指标历史保留天数，0表示不清理
+                'log_max_lines': str(DEFAULT_MAX_LINES),  # 界面日志最多保留的行数
+                'baseline_alpha': str(DEFAULT_ALPHA),  # 指标基线的平滑系数，越大越快适应新水平
+                'baseline_sigma': str(DEFAULT_SIGMA),  # 偏离基线超过几倍标准差时报告
+                'baseline_warmup': str(DEFAULT_WARMUP),  # 开始与基线比较前需要学习的采样数
+                'alert_dedup': 'True',  # 自动发送邮件时只通知新出现、升级或恢复的问题
+                'alert_digest_hours': str(DEFAULT_DIGEST_HOURS),  # 持续存在的问题的摘要间隔（小时），0表示不发送摘要
+                'db_backend': 'sqlplus',  # sqlplus：运行批处理脚本；oracledb：用 python-oracledb 直接查询
+                'log_format': 'text',  # text：文本；json：每行一个JSON对象，带 cycle_id / target / script 字段
+                'log_max_size_mb': str(DEFAULT_MAX_SIZE_MB),  # 日志文件超过此大小（MB）时轮转，0表示不按大小
+                'log_rotate_hours': str(DEFAULT_ROTATE_HOURS),  # 按时间轮转的间隔（小时，从零点起），0表示不按时间
+                'log_backup_count': str(DEFAULT_BACKUP_COUNT),  # 保留的旧日志文件数，0表示全部保留
+                'log_compress': 'True',  # 旧日志文件压缩为 .gz
+            },
+            'Database': {
+                # db_backend = oracledb 时使用；机群模式下在每个 [Target:名称] 节中设置 standby_dsn / production_dsn
+                'driver': 'oracledb',
+                'user': 'sys',
+                'password': '',
+                'sysdba': 'True',
+                'standby_dsn': '',  # 如 localhost:1521/OPERA
+                'production_dsn': '',
+                'pool_min': '1',
+                'pool_max': '2',
+                'run_report_script': 'False',  # 仍运行 daily_report.bat（生成HTML附件、删除已应用的归档日志）
+            }
+        }
+        
+        # 检查配置文件是否存在
+        if os.path.exists(self.config_file):
+            try:
+                self.config.read(self.config_file, encoding='utf-8')
+                self._mtime_ns = self._file_mtime()
+                logger.info(f"配置文件已加载: {self.config_file}")
+            except Exception as e:
+                logger.error(f"加载配置文件时出错: {e}")
+                self.create_default_config(default_config)
+        else:
+            logger.info(f"配置文件不存在，创建默认配置: {self.config_file}")
+            self.create_default_config(default_config)
+    
+    def create_default_config(self, default_config):
+        for section, options in default_config.items():
+            if not self.config.has_section(section):
+                self.config.add_section(section)
+            for option, value in options.items():
+                if not self.config.has_option(section, option):
+                    self.config.set(section, option, value)
+        
+        # 确保logs目录存在
+        app_dir = self.get_app_dir()
+        logs_dir = os.path.join(app_dir, 'logs')
+        if not os.path.exists(logs_dir):
+            os.makedirs(logs_dir)
+            
+        # 保存配置
+        self.save()
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def save(self):
+        """把当前配置写入文件：先写临时文件再替换，其他进程不会读到写了一半的配置。"""
+        with self._lock:
+            temp_path = self.config_file + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                self.config.write(f)
+            os.replace(temp_path, self.config_file)
+            # 记录自己写入后的修改时间，不把这次写入当作外部修改重新加载
+            self._mtime_ns = self._file_mtime()
+            self._dirty = False
+
+    def reload_if_changed(self, force_check=False):
+        """配置文件被外部修改（例如手工编辑）后重新加载。
+
+        为了让每轮读取设置的开销保持很小，两次检查之间至少间隔 RELOAD_CHECK_INTERVAL 秒。
+
+        Returns:
+            bool: 是否重新加载了配置
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._batch_depth or (not force_check and now - self._last_check < RELOAD_CHECK_INTERVAL):
+                return False
+            self._last_check = now
+            mtime_ns = self._file_mtime()
+            if mtime_ns is None or mtime_ns == self._mtime_ns:
+                return False
+            config = configparser.ConfigParser()
+            try:
+                config.read(self.config_file, encoding='utf-8')
+            except configparser.Error as e:
+                logger.error(f"重新加载配置文件时出错，继续使用原来的配置: {e}")
+                self._mtime_ns = mtime_ns
+                return False
+            self.config = config
+            self._mtime_ns = mtime_ns
+            self._settings = None
+        logger.info(f"配置文件已修改，重新加载: {self.config_file}")
+        return True
+
+    def settings(self) -> MonitorSettings:
+        """返回编译好的设置快照；配置文件被修改或调用 set() 之后重新编译。"""
+        self.reload_if_changed()
+        with self._lock:
+            if self._settings is None:
+                self._settings = MonitorSettings.from_config(self.config)
+                for problem in self._settings.problems:
+                    logger.warning(f"配置 [Settings] {problem}")
+            return self._settings
+
+    @contextmanager
+    def batch(self):
+        """在 with 块中的多次 set() 只在结束时写一次文件。
+
+        用法:
+            with config_manager.batch():
+                config_manager.set('Email', 'smtp_server', server)
+                config_manager.set('Email', 'smtp_port', port)
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._dirty:
+                    self.save()
+    
+    def get(self, section, option, fallback=None):
+        return self.config.get(section, option, fallback=fallback)
+    
+    def getboolean(self, section, option, fallback=None):
+        return self.config.getboolean(section, option, fallback=fallback)
+    
+    def getint(self, section, option, fallback=None):
+        return self.config.getint(section, option, fallback=fallback)
+    
+    def getfloat(self, section, option, fallback=None):
+        return self.config.getfloat(section, option, fallback=fallback)
+    
+    def get_targets(self):
+        """获取机群模式下配置的所有数据库目标"""
+        return load_targets(self.config, self.settings().fleet_target_timeout)
+    
+    def get_log_options(self) -> LogOptions:
+        """日志文件的路径、格式和轮转设置"""
+        settings = self.settings()
+        log_file = self.get('Paths', 'log_file', fallback='') or DEFAULT_LOG_FILE
+        return LogOptions(
+            log_file=log_file,
+            json_lines=settings.log_format == LOG_FORMAT_JSON,
+            max_bytes=int(settings.log_max_size_mb * 1024 * 1024),
+            rotate_hours=settings.log_rotate_hours,
+            backup_count=settings.log_backup_count,
+            compress=settings.log_compress,
+        )
+    
+    def is_fleet_mode(self):
+        return self.settings().fleet_mode
+    
+    def set(self, section, option, value):
+        with self._lock:
+            if not self.config.has_section(section):
+                self.config.add_section(section)
+            self.config.set(section, option, value)
+            self._settings = None
+            self._dirty = True
+            if not self._batch_depth:
+                self.save()
@@ -1,14 +1,23 @@
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
 import os
 from datetime import datetime
 import logging
 import socket
-from typing import List, Optional, Callable, Dict, Union
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Callable, Dict, Tuple, Union
 from pathlib import Path
 
+from smtp_pool import (SMTPConnectionPool, RateLimiter, DeliveryUnknown, deliver, is_permanent_error,
+                       DEFAULT_MAX_MESSAGES_PER_CONNECTION)
+from vendor_index import VendorIndex, MATCH_EXACT
+from mime_stream import StreamingMessage, AttachmentCache
+from mail_outbox import (MailOutbox, OutboxEntry, STATE_SENT, STATE_SENDING, STATE_FAILED,
+                         DEFAULT_MAX_ATTEMPTS, DEFAULT_RETRY_BASE_SECONDS, content_hash)
+from folder_scanner import FolderScanner, ScannedFile
+
 class EmailService:
     """邮件服务类，用于处理供应商对账确认函的邮件发送。
     
@@ -52,6 +61,10 @@ class EmailService:
         
         self.config = self.load_config()
         self.skipped_vendors = []
+        self.failed_vendors = []
+        self.already_sent_vendors = []
+        self.interrupted_vendors = []
+        self._skipped_lock = threading.Lock()
         self.ui_callback = ui_callback  # UI回调函数，用于在界面显示消息
         
         # 设置SMTP配置（优先使用ini文件配置，否则使用默认值）
@@ -64,6 +77,28 @@ class EmailService:
         else:
             self.smtp_encryption = self._auto_detect_encryption(self.smtp_port)
         
+        # 批量发送时复用的SMTP会话（见 smtp_session）
+        self.smtp_pool: Optional[SMTPConnectionPool] = None
+        # 批量发送时附件的编码缓存，同一附件发给多个供应商时只编码一次
+        self.attachment_cache: Optional[AttachmentCache] = None
+        self.max_messages_per_connection = int(self.config.get(
+            'smtp_max_messages_per_connection', DEFAULT_MAX_MESSAGES_PER_CONNECTION))
+        
+        # 并行发送的线程数（1为逐个发送）和每分钟最多发送的邮件数（0为不限制）
+        self.max_workers = max(1, int(self.config.get('smtp_max_workers', 1)))
+        self.rate_limit_per_minute = max(0, int(self.config.get('smtp_rate_limit_per_minute', 0)))
+        
+        # 发件箱：记录每个供应商的发送状态，中断后重新运行只发送未完成的部分
+        self.outbox_path = self.config.get('outbox_path', 'mail_outbox.db')
+        self.outbox_max_attempts = max(1, int(self.config.get('outbox_max_attempts', DEFAULT_MAX_ATTEMPTS)))
+        self.outbox_retry_base_seconds = float(self.config.get('outbox_retry_base_seconds', DEFAULT_RETRY_BASE_SECONDS))
+        self.outbox: Optional[MailOutbox] = None
+        
+        # 文件夹清单：记录已扫描文件的状态和解析结果，之后只处理新增或修改的文件
+        self.scan_manifest_path = self.config.get('scan_manifest_path', 'folder_manifest.json')
+        self.scanner: Optional[FolderScanner] = None
+        self.scanned_files: Dict[str, ScannedFile] = {}
+        
         # 提示使用的SMTP服务器来源
         if 'smtp_host' in self.config and 'smtp_port' in self.config:
             self.log_message("✓ 使用配置文件中的SMTP服务器", "info")
@@ -108,6 +143,12 @@ class EmailService:
             if missing_configs:
                 raise ValueError(f"缺少必需的配置项: {', '.join(missing_configs)}")
 
+            # 建立供应商名称索引，之后每次查找都是字典查询
+            fuzzy = config.get('vendor_fuzzy_match', 'true').lower() in ('true', 'yes', '1', 'on')
+            self.vendor_index = VendorIndex(config, fuzzy=fuzzy)
+            for keys in self.vendor_index.ambiguous.values():
+                self.logger.warning(f"供应商名称近似但邮箱不同，只能精确匹配: {', '.join(keys)}")
+
             return config
 
         except Exception as e:
@@ -155,6 +196,49 @@ class EmailService:
                 smtp.starttls()
             return smtp
     
+    def _create_authenticated_connection(self, timeout: int = 30):
+        """创建并登录SMTP连接，供连接池使用。"""
+        smtp = self._create_smtp_connection(timeout=timeout)
+        try:
+            smtp.login(self.config['smtp_username'], self.config['smtp_password'])
+        except Exception:
+            smtp.close()
+            raise
+        return smtp
+    
+    @contextmanager
+    def smtp_session(self) -> Iterator[SMTPConnectionPool]:
+        """在代码块内复用已登录的SMTP会话。
+
+        代码块内的 send_reconciliation_email 共用连接池中的会话，
+        TLS 握手和登录只在建立连接时进行一次，结束时关闭所有连接。
+        附件的编码结果也在代码块内按内容缓存，结束时删除。
+        """
+        if self.smtp_pool is not None:
+            # 已在会话中，直接复用
+            yield self.smtp_pool
+            return
+        pool = SMTPConnectionPool(
+            self._create_authenticated_connection,
+            max_size=self.max_workers,
+            max_messages_per_connection=self.max_messages_per_connection,
+            rate_limiter=RateLimiter(self.rate_limit_per_minute) if self.rate_limit_per_minute else None
+        )
+        self.smtp_pool = pool
+        self.attachment_cache = AttachmentCache()
+        try:
+            yield pool
+        finally:
+            self.smtp_pool = None
+            pool.close()
+            cache, self.attachment_cache = self.attachment_cache, None
+            cache.close()
+            if cache.hits:
+                self.logger.info(f"附件编码缓存：编码{cache.misses}个附件，复用{cache.hits}次")
+            if pool.connections_opened:
+                self.logger.info(f"SMTP会话已关闭：发送{pool.messages_sent}封邮件，"
+                                 f"建立{pool.connections_opened}个连接，重连{pool.reconnects}次")
+    
     def _get_vendor_email(self, vendor_name: str) -> str:
         """获取供应商邮箱地址。
 
@@ -167,14 +251,10 @@ class EmailService:
         Raises:
             ValueError: 未找到供应商邮箱配置
         """
-        # 标准化供应商名称（移除下划线和空格）
-        normalized_name = vendor_name.replace('_', '').strip()
-        
-        # 在配置中查找匹配的供应商
-        for key, value in self.config.items():
-            if key.replace('_', '').strip() == normalized_name:
-                self.logger.debug(f"找到供应商 {vendor_name} 的邮箱配置")
-                return value
+        match = self.vendor_index.lookup(vendor_name)
+        if match is not None:
+            self.logger.debug(f"找到供应商 {vendor_name} 的邮箱配置（{match.match_type}: {match.config_key}）")
+            return match.email
         
         error_msg = f"未找到供应商 {vendor_name} 的邮箱配置"
         self.logger.error(error_msg)
@@ -296,12 +376,13 @@ class EmailService:
             vendor_name = vendor_name.split('%')[0].strip()
         return vendor_name
 
-    def _print_summary(self, total_vendors: int, total_files: int) -> None:
+    def _print_summary(self, total_vendors: int, total_files: int, folder_path: str) -> None:
         """打印处理完成的汇总信息。
 
         Args:
             total_vendors: 总供应商数
             total_files: 总文件数
+            folder_path: 文件夹路径（用于提示如何重发中断的邮件）
         """
         self.log_message('\n' + '='*50, "header")
         self.log_message('处理完成汇总：', "header")
@@ -311,13 +392,23 @@ class EmailService:
         self.log_message(f'- 跳过的供应商数：{len(self.skipped_vendors)}', "error")
         if self.skipped_vendors:
             self.log_message(f'- 跳过的供应商列表：{", ".join(self.skipped_vendors)}', "error")
+        if self.already_sent_vendors:
+            self.log_message(f'- 之前已发送（本次未重发）：{len(self.already_sent_vendors)}', "info")
+        if self.failed_vendors:
+            self.log_message(f'- 多次重试后仍发送失败：{", ".join(self.failed_vendors)}', "error")
+        if self.interrupted_vendors:
+            self.log_message(f'- 发送中断、未确认是否送达：{", ".join(self.interrupted_vendors)}', "warning")
+            self.log_message(f'  确认没有送达后重新发送：process_folder({folder_path!r}, '
+                             f'resend_interrupted={self.interrupted_vendors!r})', "warning")
         self.log_message('='*50, "header")
-    def process_folder(self, folder_path: str, progress_callback: Optional[Callable[[int, int, str], None]] = None) -> None:
+    def process_folder(self, folder_path: str, progress_callback: Optional[Callable[[int, int, str], None]] = None,
+                       resend_interrupted: Iterable[str] = ()) -> None:
         """处理文件夹内的所有确认函文件。
 
         Args:
             folder_path: 文件夹路径
             progress_callback: 进度回调函数
+            resend_interrupted: 上次发送中断、已确认没有送达的供应商，本次重新发送
 
         Raises:
             FileNotFoundError: 文件夹不存在
@@ -327,53 +418,216 @@ class EmailService:
         if not folder.exists():
             raise FileNotFoundError(f"文件夹不存在：{folder}")
 
-        # 获取所有Excel文件
-        excel_files = list(folder.glob("*.xlsx"))
-        confirmation_files = [f for f in excel_files if self.CONFIRMATION_KEYWORD in f.name]
-        total_files = len(confirmation_files)
-        self.log_message(f"找到{total_files}个确认函文件", "info")
+        # 扫描确认函文件，只解析上次扫描后新增或修改的文件
+        scanner = self._get_scanner()
+        scan = scanner.scan(folder_path)
+        total_files = len(scan.files)
+        changes = f"（新增{len(scan.new)}个，修改{len(scan.changed)}个）" if scan.new or scan.changed else ""
+        self.log_message(f"找到{total_files}个确认函文件{changes}", "info")
+        self.scanned_files = {scanned.path: scanned for scanned in scan.files}
 
         # 按供应商分组文件
-        vendor_files: Dict[str, List[Path]] = {}
-        for file_path in confirmation_files:
-            vendor_name = self._extract_vendor_name(file_path.name)
-            if vendor_name:
-                if vendor_name not in vendor_files:
-                    vendor_files[vendor_name] = []
-                vendor_files[vendor_name].append(file_path)
-            else:
-                self.log_message(f"无法从文件名解析供应商信息：{file_path.name}", "error")
+        for scanned in scan.unparsed:
+            self.log_message(f"无法从文件名解析供应商信息：{scanned.name}", "error")
+        vendor_files = scan.group_by_vendor()
+        scanner.prune_groups(folder_path, vendor_files)
 
         # 处理每个供应商的所有文件
         total_vendors = len(vendor_files)
         self.log_message(f'开始处理{total_vendors}个供应商的邮件发送', "header")
         
-        for i, (vendor_name, file_paths) in enumerate(vendor_files.items(), 1):
-            try:
-                self.log_message(f'正在处理供应商：{vendor_name}（{len(file_paths)}个文件）', "info")
-                try:
-                    self.send_reconciliation_email([str(p) for p in file_paths], vendor_name)
-                    self.log_message(f"✓ 成功发送邮件给供应商：{vendor_name}", "success")
-                except ValueError as e:
-                    if "未找到供应商" in str(e):
-                        self.skipped_vendors.append(vendor_name)
-                        self.log_message(f"✗ 跳过供应商（未找到邮箱配置）：{vendor_name}", "error")
-                    else:
-                        self.log_message(f"✗ 发送失败（{vendor_name}）：{e}", "error")
-                except Exception as e:
-                    self.log_message(f"✗ 发送失败（{vendor_name}）：{e}", "error")
-                    self.logger.error(f"处理供应商 {vendor_name} 时出错", exc_info=True)
-
-            except Exception as e:
-                self.log_message(f"处理供应商时出错（{vendor_name}）：{e}", "error")
-                self.logger.error(f"处理供应商 {vendor_name} 时发生意外错误", exc_info=True)
-
-            # 更新进度
-            if progress_callback:
-                progress_callback(i, total_vendors, f"正在处理第 {i}/{total_vendors} 个供应商")
+        # 发送前列出按近似名称匹配和找不到邮箱配置的供应商
+        self._report_vendor_matches(vendor_files)
+        
+        # 确认没有送达的中断记录重新排队，其余中断记录仍不自动重发
+        for vendor_name in resend_interrupted:
+            if self.reset_interrupted(vendor_name):
+                self.log_message(f"上次发送中断的邮件已重新排队：{vendor_name}", "info")
+            else:
+                self.log_message(f"发件箱中没有发送中断的记录：{vendor_name}", "warning")
+
+        # 登记到发件箱，已发送的不再发送
+        entries = self._enqueue_vendors(folder_path, vendor_files)
+        scanner.save()
+        
+        with self.smtp_session():
+            self._send_vendor_batches(entries, progress_callback)
+            self._retry_failed(entries)
 
         # 处理完成后的汇总信息
-        self._print_summary(total_vendors, total_files)
+        self._print_summary(total_vendors, total_files, folder_path)
+
+    def _report_vendor_matches(self, vendor_files: Dict[str, List[ScannedFile]]) -> List[str]:
+        """发送前检查所有供应商的邮箱配置。
+
+        Args:
+            vendor_files: 供应商名称到确认函文件列表的映射
+
+        Returns:
+            List[str]: 找不到邮箱配置的供应商
+        """
+        matches = self.vendor_index.check(vendor_files)
+        approximate = [match for match in matches.values() if match is not None and match.match_type != MATCH_EXACT]
+        unmatched = [vendor_name for vendor_name, match in matches.items() if match is None]
+
+        if approximate:
+            self.log_message(f"以下{len(approximate)}个供应商按别名或近似名称匹配：", "warning")
+            for match in approximate:
+                self.log_message(f"  {match.vendor_name} → {match.config_key}（{match.email}）", "warning")
+        if unmatched:
+            self.log_message(f"以下{len(unmatched)}个供应商未找到邮箱配置，将被跳过：", "error")
+            for vendor_name in unmatched:
+                suggestions = self.vendor_index.suggest(vendor_name)
+                hint = f"（相近的配置：{', '.join(suggestions)}）" if suggestions else ""
+                self.log_message(f"  {vendor_name}{hint}", "error")
+        return unmatched
+
+    def _parse_file_name(self, file_path: str) -> Tuple[Optional[str], Optional[str]]:
+        """解析确认函文件名，返回 (供应商名称, 年月)。"""
+        return self._extract_vendor_name(os.path.basename(file_path)), self._extract_year_month(file_path)
+
+    def _get_scanner(self) -> FolderScanner:
+        if self.scanner is None:
+            self.scanner = FolderScanner(self.scan_manifest_path, self._parse_file_name,
+                                         keyword=self.CONFIRMATION_KEYWORD, suffix='.xlsx')
+        return self.scanner
+
+    def _get_outbox(self) -> MailOutbox:
+        if self.outbox is None:
+            self.outbox = MailOutbox(self.outbox_path, retry_base_seconds=self.outbox_retry_base_seconds)
+        return self.outbox
+
+    def _enqueue_vendors(self, folder_path: str, vendor_files: Dict[str, List[ScannedFile]]) -> Dict[str, OutboxEntry]:
+        """把供应商登记到发件箱，返回本次需要发送的记录。
+
+        同一组附件已发送过的不再发送；上次发送中断（无法确认是否送达）的也不自动重发，
+        确认没有送达后用 process_folder(..., resend_interrupted=[...]) 或 reset_interrupted() 重新排队。
+        附件组与清单记录相同时复用记录的内容摘要，不重新读取文件。
+        """
+        outbox = self._get_outbox()
+        scanner = self._get_scanner()
+        entries = {}
+        for vendor_name, files in vendor_files.items():
+            file_paths = [scanned.path for scanned in files]
+            digest = scanner.cached_digest(folder_path, vendor_name, files)
+            unchanged = digest is not None
+            if digest is None:
+                digest = content_hash(vendor_name, file_paths)
+                scanner.remember_digest(folder_path, vendor_name, files, digest)
+            entry = outbox.enqueue(vendor_name, file_paths, digest)
+            if entry.state == STATE_SENT:
+                self.already_sent_vendors.append(vendor_name)
+                # 没有变化的历史文件只计数，不逐个列出
+                if not unchanged:
+                    self.log_message(f"✓ 已于 {entry.sent_at:%Y-%m-%d %H:%M:%S} 发送过，跳过：{vendor_name}", "info")
+            elif entry.state == STATE_SENDING:
+                self.interrupted_vendors.append(vendor_name)
+                self.log_message(f"✗ 上次发送中断，无法确认是否已送达，未重发：{vendor_name}", "warning")
+            else:
+                entries[vendor_name] = entry
+        if self.already_sent_vendors:
+            self.log_message(f"发件箱中已发送{len(self.already_sent_vendors)}个供应商，本次发送{len(entries)}个", "info")
+        return entries
+
+    def reset_interrupted(self, vendor_name: Optional[str] = None) -> int:
+        """确认中断的邮件没有送达后，把它们重新排队，返回记录数。"""
+        return self._get_outbox().reset(vendor_name, states=(STATE_SENDING,))
+
+    def _retry_failed(self, entries: Dict[str, OutboxEntry]) -> None:
+        """按指数退避重试发送失败的供应商，直到成功或达到 outbox_max_attempts 次。
+
+        服务器明确拒绝（5xx）的不重试。
+        """
+        for attempt in range(2, self.outbox_max_attempts + 1):
+            failed = {vendor_name: entry for vendor_name, entry in entries.items()
+                      if entry.state == STATE_FAILED and entry.next_attempt is not None}
+            if not failed:
+                break
+            wait = max(0.0, (min(entry.next_attempt for entry in failed.values()) - datetime.now()).total_seconds())
+            self.log_message(f"{len(failed)}个供应商发送失败，{wait:.0f}秒后进行第{attempt}次尝试", "warning")
+            time.sleep(wait)
+            self._send_vendor_batches(failed)
+
+        self.failed_vendors = [vendor_name for vendor_name, entry in entries.items() if entry.state == STATE_FAILED]
+
+    def _send_vendor_batches(self, entries: Dict[str, OutboxEntry],
+                             progress_callback: Optional[Callable[[int, int, str], None]] = None) -> None:
+        """发送所有供应商的邮件。
+
+        smtp_max_workers 大于1时在线程池中并行发送，结果和进度仍按供应商顺序在当前线程报告。
+
+        Args:
+            entries: 供应商名称到发件箱记录的映射
+            progress_callback: 进度回调函数
+        """
+        total_vendors = len(entries)
+        vendors = [(vendor_name, entry) for vendor_name, entry in entries.items()]
+
+        if self.max_workers <= 1:
+            for i, (vendor_name, entry) in enumerate(vendors, 1):
+                self.log_message(f'正在处理供应商：{vendor_name}（{len(entry.files)}个文件）', "info")
+                self._record_vendor_result(vendor_name, self._send_vendor(vendor_name, entry))
+                if progress_callback:
+                    progress_callback(i, total_vendors, f"正在处理第 {i}/{total_vendors} 个供应商")
+            return
+
+        self.log_message(f'并行发送：{self.max_workers}个线程'
+                         + (f'，每分钟最多{self.rate_limit_per_minute}封' if self.rate_limit_per_minute else ''), "info")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="vendor-mail") as executor:
+            futures = [executor.submit(self._send_vendor, vendor_name, entry)
+                       for vendor_name, entry in vendors]
+            # 按提交顺序等待结果，日志和进度与顺序发送时一致
+            for i, ((vendor_name, entry), future) in enumerate(zip(vendors, futures), 1):
+                error = future.result()
+                self.log_message(f'正在处理供应商：{vendor_name}（{len(entry.files)}个文件）', "info")
+                self._record_vendor_result(vendor_name, error)
+                if progress_callback:
+                    progress_callback(i, total_vendors, f"正在处理第 {i}/{total_vendors} 个供应商")
+
+    def _send_vendor(self, vendor_name: str, entry: OutboxEntry) -> Optional[Exception]:
+        """发送一个供应商的邮件并更新发件箱，可在工作线程中调用。
+
+        Returns:
+            Optional[Exception]: 发送失败时的异常，成功时为None
+        """
+        outbox = self._get_outbox()
+        # 先标记为发送中，已被其他进程取走的记录不发送
+        if not outbox.mark_sending(entry):
+            return RuntimeError("发件箱记录已被其他进程处理，未重复发送")
+        try:
+            self.send_reconciliation_email(entry.files, vendor_name, message_id=entry.message_id)
+        except ValueError as e:
+            if "未找到供应商" in str(e):
+                outbox.mark_skipped(entry, str(e))
+            else:
+                outbox.mark_failed(entry, str(e))
+            return e
+        except DeliveryUnknown as e:
+            # 内容已发出但未确认，保持发送中状态，确认没有送达后再重新排队
+            return e
+        except Exception as e:
+            outbox.mark_failed(entry, str(e), retry=not is_permanent_error(e))
+            return e
+        outbox.mark_sent(entry)
+        return None
+
+    def _record_vendor_result(self, vendor_name: str, error: Optional[Exception]) -> None:
+        """记录一个供应商的发送结果。"""
+        if error is None:
+            self.log_message(f"✓ 成功发送邮件给供应商：{vendor_name}", "success")
+        elif isinstance(error, DeliveryUnknown):
+            self.interrupted_vendors.append(vendor_name)
+            self.log_message(f"✗ 发送中断，无法确认是否已送达，不自动重发：{vendor_name}", "warning")
+        elif isinstance(error, ValueError):
+            if "未找到供应商" in str(error):
+                with self._skipped_lock:
+                    self.skipped_vendors.append(vendor_name)
+                self.log_message(f"✗ 跳过供应商（未找到邮箱配置）：{vendor_name}", "error")
+            else:
+                self.log_message(f"✗ 发送失败（{vendor_name}）：{error}", "error")
+        else:
+            self.log_message(f"✗ 发送失败（{vendor_name}）：{error}", "error")
+            self.logger.error(f"处理供应商 {vendor_name} 时出错", exc_info=error)
 
     def _extract_year_month(self, file_path: str) -> Optional[str]:
         """从文件路径中提取年月信息。
@@ -408,12 +662,14 @@ class EmailService:
 
         return None
 
-    def send_reconciliation_email(self, file_paths: Union[str, List[str]], vendor_name: str) -> bool:
+    def send_reconciliation_email(self, file_paths: Union[str, List[str]], vendor_name: str,
+                                  message_id: Optional[str] = None) -> bool:
         """发送对账确认函邮件。
 
         Args:
             file_paths: 单个文件路径或文件路径列表
             vendor_name: 供应商名称
+            message_id: 固定的 Message-ID（发件箱按内容生成），默认由邮件服务器生成
 
         Returns:
             bool: 发送是否成功
@@ -421,25 +677,27 @@ class EmailService:
         Raises:
             ValueError: 供应商邮箱未配置
             FileNotFoundError: 附件文件不存在
+            DeliveryUnknown: 邮件内容已发出但连接中断，无法确认是否送达
             Exception: 其他邮件发送错误
         """
         file_paths = [file_paths] if isinstance(file_paths, str) else file_paths
         try:
-            # 从文件路径中提取年月
-            year_month = self._extract_year_month(file_paths[0])
+            # 从文件路径中提取年月（扫描时已解析的直接使用）
+            scanned = self.scanned_files.get(str(file_paths[0]))
+            year_month = scanned.year_month if scanned else self._extract_year_month(file_paths[0])
             if not year_month:
                 self.logger.warning(f"无法从文件路径提取年月信息：{file_paths[0]}")
 
-            # 验证所有文件是否存在
+            # 验证所有文件是否存在（本次扫描到的文件不再重复检查）
             for file_path in file_paths:
-                if not os.path.exists(file_path):
+                if str(file_path) not in self.scanned_files and not os.path.exists(file_path):
                     raise FileNotFoundError(f"附件文件不存在：{file_path}")
 
             # 获取供应商邮箱
             recipient_email = self._get_vendor_email(vendor_name)
             
-            # 构建邮件
-            msg = MIMEMultipart()
+            # 构建邮件：附件在发送时按块编码写入数据流，不整体读入内存
+            msg = StreamingMessage(self.attachment_cache)
             
             # 设置发件人（优先使用配置的sender_email，否则使用smtp_username）
             sender_email = self.config.get('sender_email', '').strip() or self.config['smtp_username']
@@ -451,23 +709,24 @@ class EmailService:
             if year_month:
                 subject = f'{year_month}月{subject}'
             msg['Subject'] = subject
+            if message_id:
+                msg['Message-ID'] = message_id
             
             # 添加正文（处理换行符）
             body = self.config.get('email_body', '').replace('\\n', '\n')
-            msg.attach(MIMEText(body, 'plain', 'utf-8'))
+            msg.attach_text(body, 'plain', 'utf-8')
             
             # 添加附件
             for file_path in file_paths:
-                with open(file_path, 'rb') as f:
-                    part = MIMEApplication(f.read())
-                    part.add_header('Content-Disposition', 'attachment',
-                                 filename=os.path.basename(file_path))
-                    msg.attach(part)
+                msg.attach_file(str(file_path), os.path.basename(file_path))
             
-            # 发送邮件（设置30秒超时）
-            with self._create_smtp_connection(timeout=30) as smtp:
-                smtp.login(self.config['smtp_username'], self.config['smtp_password'])
-                smtp.send_message(msg)
+            # 发送邮件：批量发送时复用会话，否则单独连接（设置30秒超时）
+            if self.smtp_pool is not None:
+                self.smtp_pool.send_message(msg)
+            else:
+                with self._create_smtp_connection(timeout=30) as smtp:
+                    smtp.login(self.config['smtp_username'], self.config['smtp_password'])
+                    deliver(smtp, msg)
             
             return True
             
@@ -475,6 +734,8 @@ class EmailService:
             raise
         except ValueError:
             raise
+        except DeliveryUnknown:
+            raise
         except Exception as e:
             self.logger.error(f"发送邮件失败", exc_info=True)
-            raise Exception(f"发送邮件失败：{e}")
\ No newline at end of file
+            raise Exception(f"发送邮件失败：{e}") from e
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""python-oracledb 的替身，用于在没有 Oracle 数据库时运行和测试 oracle_backend。
+
+只实现 OracleBackend 用到的接口：create_pool()、pool.acquire()、connection.cursor()、
+cursor.execute() / fetchall() 和 AUTH_MODE_SYSDBA。查询按语句中的关键片段匹配
+预先设置的结果，执行过的语句和绑定变量记录在 FakeDatabase.executed 中。
+
+用法:
+    [Database]
+    driver = fake_oracledb
+    standby_dsn = standby
+    production_dsn = production
+
+未注册的连接串使用 sample_database() 生成的示例数据（连接串中含 standby / stby
+时为备库，否则为主库）。也可以用 register(dsn, FakeDatabase(...)) 设置自己的数据。
+"""
+import datetime
+import threading
+from typing import Callable, Dict, List, Optional, Union
+
+AUTH_MODE_DEFAULT = 0
+AUTH_MODE_SYSDBA = 2
+
+Rows = Union[List[tuple], Callable[[Dict], List[tuple]]]
+
+
+class Error(Exception):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class FakeDatabase:
+    """按语句片段返回预设结果的数据库。
+
+    属性:
+        responses (list): (语句片段, 结果行或函数) 列表，按顺序匹配第一个包含该片段的语句
+        executed (list): 执行过的 (语句, 绑定变量)
+        connections_opened (int): 建立过的连接数
+    """
+
+    def __init__(self, responses: Optional[List] = None):
+        self.responses = list(responses or [])
+        self.executed = []
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+
+    def add(self, fragment: str, rows: Rows) -> None:
+        """设置结果；函数形式的结果以绑定变量为参数。先添加的片段优先匹配。"""
+        self.responses.append((fragment, rows))
+
+    def execute(self, sql: str, params: Dict) -> List[tuple]:
+        with self._lock:
+            self.executed.append((sql, dict(params)))
+        for fragment, rows in self.responses:
+            if fragment in sql:
+                return list(rows(params) if callable(rows) else rows)
+        raise DatabaseError(f"ORA-00942: table or view does not exist (fake: {sql.split()[:6]})")
+
+
+class Cursor:
+    def __init__(self, connection: 'Connection'):
+        self.connection = connection
+        self._rows = []
+
+    def execute(self, sql: str, parameters: Optional[Dict] = None) -> None:
+        if self.connection.closed:
+            raise DatabaseError("DPI-1010: not connected")
+        self._rows = self.connection.database.execute(sql, parameters or {})
+
+    def fetchall(self) -> List[tuple]:
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self) -> Optional[tuple]:
+        return self._rows.pop(0) if self._rows else None
+
+    def close(self) -> None:
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Connection:
+    def __init__(self, pool: 'ConnectionPool'):
+        self.pool = pool
+        self.database = pool.database
+        self.call_timeout = 0
+        self.closed = False
+
+    def cursor(self) -> Cursor:
+        return Cursor(self)
+
+    def close(self) -> None:
+        # 池中的连接关闭时归还到池中
+        if not self.closed:
+            self.closed = True
+            self.pool._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(self, database: FakeDatabase, user: str, dsn: str, min: int, max: int, mode: int):
+        self.database = database
+        self.user = user
+        self.dsn = dsn
+        self.min = min
+        self.max = max
+        self.mode = mode
+        self.busy = 0
+        self.opened = 0
+        self._idle = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Connection:
+        with self._lock:
+            if self.busy >= self.max:
+                raise DatabaseError("DPY-4005: timed out waiting for the connection pool to return a connection")
+            if self._idle:
+                self._idle -= 1
+            else:
+                self.opened += 1
+                self.database.connections_opened += 1
+            self.busy += 1
+        return Connection(self)
+
+    def _release(self, connection: Connection) -> None:
+        with self._lock:
+            self.busy -= 1
+            self._idle += 1
+
+    def close(self, force: bool = False) -> None:
+        with self._lock:
+            if self.busy and not force:
+                raise DatabaseError("DPY-1005: unable to close pool with connections in use")
+            self._idle = 0
+
+
+_databases: Dict[str, FakeDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def register(dsn: str, database: FakeDatabase) -> None:
+    with _databases_lock:
+        _databases[dsn] = database
+
+
+def create_pool(dsn: Optional[str] = None, *, user: Optional[str] = None, password: Optional[str] = None,
+                min: int = 1, max: int = 2, increment: int = 1, mode: int = AUTH_MODE_DEFAULT,
+                **kwargs) -> ConnectionPool:
+    with _databases_lock:
+        database = _databases.get(dsn)
+        if database is None:
+            standby = any(word in (dsn or '').lower() for word in ('standby', 'stby'))
+            database = _databases[dsn] = sample_database('PHYSICAL STANDBY' if standby else 'PRIMARY')
+    return ConnectionPool(database, user, dsn, min, max, mode)
+
+
+def sample_database(role: str = 'PHYSICAL STANDBY', sequences: int = 50) -> FakeDatabase:
+    """一个正常运行的数据库：归档日志连续应用，表空间、备份都正常。"""
+    now = datetime.datetime.now().replace(second=0, microsecond=0)
+    standby = role != 'PRIMARY'
+    logs = [(1, seq, 'YES' if seq < sequences else 'IN-MEMORY') for seq in range(1, sequences + 1)]
+
+    def archived_logs(params: Dict) -> List[tuple]:
+        marks = {params[key]: params['s' + key[1:]] for key in params if key.startswith('t')}
+        return [log for log in logs if log[1] > marks.get(log[0], 0)]
+
+    database = FakeDatabase()
+    database.add('v$managed_standby', [('ARCH', 'CONNECTED', 0), ('RFS', 'IDLE', sequences),
+                                       ('MRP0', 'APPLYING_LOG', sequences)] if standby else [])
+    database.add('controlfile_type', [(role, 'STANDBY' if standby else 'CURRENT',
+                                       'MOUNTED' if standby else 'READ WRITE', 'MAXIMUM PERFORMANCE', 1)])
+    database.add('select thread#, sequence#, applied', archived_logs)
+    database.add('gv$database a, gv$instance c', [
+        (1, 'OPERA', 'OPERA', 'MOUNTED' if standby else 'OPEN', 'stbyhost' if standby else 'prodhost', role,
+         'MAXIMUM PERFORMANCE', now - datetime.timedelta(days=30), now)])
+    database.add('from v$instance', [('MOUNTED' if standby else 'OPEN',)])
+    database.add('max(next_time)', [(now - datetime.timedelta(minutes=10), now - datetime.timedelta(minutes=5))])
+    database.add('v$archive_gap', [(0,)])
+    database.add("registrar = 'RFS'", [(0,)])
+    database.add("deleted = 'NO'", [(12,)])
+    database.add('dba_tablespaces', [('OPERA_DATA', 20480.0, 32767.9844, 45.12, 'PERMANENT'),
+                                     ('SYSTEM', 1024.0, 32767.9844, 2.75, 'PERMANENT'),
+                                     ('TEMP', 2048.0, 32767.9844, 0.0, 'TEMPORARY')])
+    database.add('gv$session', [(1, 42)])
+    database.add('dba_objects', [])
+    database.add('select count(*) from v$rman_backup_job_details', [(3,)])
+    database.add('time_taken_display', [
+        (100 + day, now - datetime.timedelta(days=day, hours=2), now - datetime.timedelta(days=day, hours=1),
+         10240.0, 'COMPLETED', 'DB FULL', '01:00:00') for day in (2, 1, 0)])
+    return database
@@ -0,0 +1,273 @@
+import os
+import time
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+from script_runner import run_script, ScriptCancelled
+from log_pipeline import bind_context, log_context
+
+logger = logging.getLogger("OperaMonitor")
+
+# 配置文件中数据库目标节的前缀，例如 [Target:HOTEL01]
+TARGET_SECTION_PREFIX = 'Target:'
+
+# 目标执行状态
+STATUS_OK = 'ok'
+STATUS_TIMEOUT = 'timeout'
+STATUS_ERROR = 'error'
+STATUS_CANCELLED = 'cancelled'
+
+# 未配置时单个脚本的默认超时时间（秒），避免脚本挂起（例如等待输入）时一直阻塞计划
+DEFAULT_CHECK_STANDBY_TIMEOUT = 600
+DEFAULT_DAILY_REPORT_TIMEOUT = 1800
+
+
+class DatabaseTarget:
+    """机群模式下的单个监控目标（一对主库/备库）。
+
+    属性:
+        name (str): 目标名称
+        check_standby_bat (str): 检查备用数据库脚本路径
+        daily_report_bat (str): 每日报告脚本路径
+        report_path (str): 该目标生成的HTML报告路径
+        timeout (int): 该目标全部脚本的总超时时间（秒）
+        check_standby_timeout (int): check_standby 脚本的超时时间（秒），0 表示只受总超时限制
+        daily_report_timeout (int): daily_report 脚本的超时时间（秒），0 表示只受总超时限制
+        check_standby_args (list): 传给 check_standby 脚本的参数（如归档日志水位线）
+    """
+
+    def __init__(self, name: str, check_standby_bat: str, daily_report_bat: str,
+                 report_path: str, timeout: int, check_standby_timeout: int = 0,
+                 daily_report_timeout: int = 0, check_standby_args: Optional[List[str]] = None):
+        self.name = name
+        self.check_standby_bat = check_standby_bat
+        self.daily_report_bat = daily_report_bat
+        self.report_path = report_path
+        self.timeout = timeout
+        self.check_standby_timeout = check_standby_timeout
+        self.daily_report_timeout = daily_report_timeout
+        self.check_standby_args = check_standby_args or []
+
+
+class TargetResult:
+    """单个目标的执行结果。
+
+    属性:
+        name (str): 目标名称
+        status (str): 执行状态（ok / timeout / error / cancelled）
+        check_standby_output (str): check_standby 脚本输出
+        daily_report_output (str): daily_report 脚本输出
+        elapsed (float): 执行耗时（秒）
+        error (str): 错误信息
+    """
+
+    def __init__(self, target: DatabaseTarget):
+        self.target = target
+        self.name = target.name
+        self.status = STATUS_OK
+        self.check_standby_output = ""
+        self.daily_report_output = ""
+        self.elapsed = 0.0
+        self.error = ""
+
+
+def load_targets(config, default_timeout: int = 1800) -> List[DatabaseTarget]:
+    """从配置中读取所有 [Target:名称] 节。
+
+    每个目标节需要 check_standby_bat、daily_report_bat 和 report_path，
+    可选 timeout（秒），未设置时使用 default_timeout；可选
+    check_standby_timeout / daily_report_timeout（秒），未设置时使用 [Settings] 中的同名配置。
+
+    Args:
+        config: configparser.ConfigParser 对象
+        default_timeout: 默认的单目标超时时间（秒）
+
+    Returns:
+        List[DatabaseTarget]: 配置中定义的目标列表
+    """
+    targets = []
+    for section in config.sections():
+        if not section.startswith(TARGET_SECTION_PREFIX):
+            continue
+
+        name = section[len(TARGET_SECTION_PREFIX):].strip()
+        missing = [option for option in ('check_standby_bat', 'daily_report_bat', 'report_path')
+                   if not config.get(section, option, fallback='').strip()]
+        if not name or missing:
+            logger.warning(f"忽略配置不完整的监控目标 [{section}]，缺少: {', '.join(missing)}")
+            continue
+
+        targets.append(DatabaseTarget(
+            name=name,
+            check_standby_bat=config.get(section, 'check_standby_bat').strip(),
+            daily_report_bat=config.get(section, 'daily_report_bat').strip(),
+            report_path=config.get(section, 'report_path').strip(),
+            timeout=config.getint(section, 'timeout', fallback=default_timeout),
+            check_standby_timeout=config.getint(
+                section, 'check_standby_timeout',
+                fallback=config.getint('Settings', 'check_standby_timeout', fallback=DEFAULT_CHECK_STANDBY_TIMEOUT)),
+            daily_report_timeout=config.getint(
+                section, 'daily_report_timeout',
+                fallback=config.getint('Settings', 'daily_report_timeout', fallback=DEFAULT_DAILY_REPORT_TIMEOUT)),
+        ))
+    return targets
+
+
+class FleetExecutor:
+    """在有界线程池上并行执行多个数据库目标的检查脚本。
+
+    每个目标内部运行 check_standby 和 daily_report（默认依次运行，也可同时运行），
+    目标之间并行，因此一轮的总耗时由最慢的目标决定，而不是所有目标耗时之和。
+
+    属性:
+        max_workers (int): 最大并行目标数
+        runner (callable): 运行单个脚本的函数，签名为
+            runner(path, timeout, output_callback=None, cancel_event=None, args=None) -> str
+        log_callback (callable): 日志回调函数
+        output_callback (callable): 脚本输出回调，签名为 output_callback(label, source, lines)
+        concurrent_scripts (bool): 是否在目标内部同时运行两个脚本
+        cancel_event (threading.Event): 取消标志，被设置后结束所有正在运行的脚本
+        run_daily_report (bool): 是否运行 daily_report 脚本（为 False 时只检查备库）
+    """
+
+    def __init__(self, max_workers: int = 4,
+                 runner: Callable[..., str] = run_script,
+                 log_callback: Optional[Callable[[str], None]] = None,
+                 output_callback: Optional[Callable[[str, str, List[str]], None]] = None,
+                 concurrent_scripts: bool = False,
+                 cancel_event: Optional[threading.Event] = None,
+                 run_daily_report: bool = True):
+        self.max_workers = max(1, max_workers)
+        self.runner = runner
+        self.log_callback = log_callback
+        self.output_callback = output_callback
+        self.concurrent_scripts = concurrent_scripts
+        self.cancel_event = cancel_event or threading.Event()
+        self.run_daily_report = run_daily_report
+
+    def log_message(self, message: str) -> None:
+        if self.log_callback:
+            self.log_callback(message)
+        else:
+            logger.info(message)
+
+    def run_target(self, target: DatabaseTarget) -> TargetResult:
+        """在目标的超时预算内运行其两个脚本。
+
+        Args:
+            target: 监控目标
+
+        Returns:
+            TargetResult: 执行结果
+        """
+        result = TargetResult(target)
+        start = time.monotonic()
+        deadline = start + target.timeout
+
+        scripts = [
+            ('check_standby_output', target.check_standby_bat, target.check_standby_timeout, target.check_standby_args),
+            ('daily_report_output', target.daily_report_bat, target.daily_report_timeout, None),
+        ]
+        if not self.run_daily_report:
+            scripts = scripts[:1]
+        try:
+            missing = [batch_file for _, batch_file, _, _ in scripts if not os.path.exists(batch_file)]
+            if self.cancel_event.is_set():
+                raise ScriptCancelled(target.name)
+            if missing:
+                result.status = STATUS_ERROR
+                result.error = f"文件不存在 - {missing[0]}"
+            elif self.concurrent_scripts:
+                # 两个脚本查询不同的数据库，互不依赖，可以同时启动
+                with ThreadPoolExecutor(max_workers=len(scripts)) as executor:
+                    futures = [executor.submit(bind_context(self._run_into), result, attr, target, batch_file, deadline,
+                                               script_timeout, args)
+                               for attr, batch_file, script_timeout, args in scripts]
+                    # 每个脚本的输出都由 _run_into 保存；等两个脚本都结束后再按配置顺序报告第一个错误
+                    errors = []
+                    for future in futures:
+                        try:
+                            future.result()
+                        except Exception as e:
+                            errors.append(e)
+                    if errors:
+                        raise errors[0]
+            else:
+                for attr, batch_file, script_timeout, args in scripts:
+                    self._run_into(result, attr, target, batch_file, deadline, script_timeout, args)
+
+        except subprocess.TimeoutExpired as e:
+            result.status = STATUS_TIMEOUT
+            result.error = f"{os.path.basename(e.cmd)} 超过{e.timeout:.0f}秒未完成"
+        except ScriptCancelled:
+            result.status = STATUS_CANCELLED
+            result.error = "已取消"
+        except Exception as e:
+            result.status = STATUS_ERROR
+            result.error = str(e)
+            logger.error(f"执行监控目标 {target.name} 时出错", exc_info=True)
+
+        result.elapsed = time.monotonic() - start
+        if result.status != STATUS_OK:
+            self.log_message(f"[{target.name}] 执行失败: {result.error}")
+        return result
+
+    def _run_into(self, result: TargetResult, attr: str, target: DatabaseTarget, batch_file: str, deadline: float,
+                  script_timeout: int = 0, args: Optional[List[str]] = None) -> None:
+        """运行单个脚本并把输出保存到 result 的 attr；超时或取消时先保存已读取的部分输出再抛出。"""
+        try:
+            setattr(result, attr, self._run_script(target, batch_file, deadline, script_timeout, args))
+        except (subprocess.TimeoutExpired, ScriptCancelled) as e:
+            setattr(result, attr, e.output or "")
+            raise
+
+    def _run_script(self, target: DatabaseTarget, batch_file: str, deadline: float,
+                    script_timeout: int = 0, args: Optional[List[str]] = None) -> str:
+        """在脚本自身超时和目标剩余的超时预算内运行单个脚本。"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(batch_file, target.timeout)
+        if script_timeout > 0:
+            remaining = min(remaining, script_timeout)
+
+        script_name = os.path.basename(batch_file)
+        output_callback = None
+        if self.output_callback:
+            label = f"{target.name}/{os.path.splitext(script_name)[0]}"
+            output_callback = lambda source, lines: self.output_callback(label, source, lines)
+
+        with log_context(script=script_name):
+            self.log_message(f"[{target.name}] 开始执行 {script_name}...")
+            output = self.runner(batch_file, remaining, output_callback=output_callback,
+                                 cancel_event=self.cancel_event, args=args)
+            self.log_message(f"[{target.name}] {script_name} 执行完成")
+        return output
+
+    def run(self, targets: List[DatabaseTarget]) -> List[TargetResult]:
+        """并行执行所有目标。
+
+        Args:
+            targets: 监控目标列表
+
+        Returns:
+            List[TargetResult]: 按配置顺序排列的执行结果
+        """
+        if not targets:
+            return []
+
+        workers = min(self.max_workers, len(targets))
+        self.log_message(f"开始并行检查{len(targets)}个数据库目标（并发数: {workers}）")
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fleet") as executor:
+            futures = {executor.submit(bind_context(self.run_target, target=target.name), target): target
+                       for target in targets}
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.name] = result
+                self.log_message(f"[{result.name}] 完成，耗时 {result.elapsed:.1f} 秒")
+
+        return [results[target.name] for target in targets]
@@ -0,0 +1,183 @@
+import os
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+# 解析文件名的函数：文件路径 -> (供应商名称, 年月)
+NameParser = Callable[[str], Tuple[Optional[str], Optional[str]]]
+
+
+@dataclass
+class ScannedFile:
+    """扫描到的一个确认函文件，文件名只在新增或修改时解析一次。
+
+    属性:
+        path (str): 文件路径
+        size (int): 文件大小
+        mtime_ns (int): 修改时间（纳秒）
+        vendor_name (str): 供应商名称，无法解析时为 None
+        year_month (str): 年月（YYYY-MM），无法解析时为 None
+    """
+    path: str
+    size: int
+    mtime_ns: int
+    vendor_name: Optional[str] = None
+    year_month: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def signature(self) -> List:
+        return [self.name, self.size, self.mtime_ns]
+
+
+@dataclass
+class ScanResult:
+    """一次文件夹扫描的结果。
+
+    属性:
+        folder (str): 文件夹路径
+        files (list): 所有确认函文件（按文件名排序）
+        new (list): 上次扫描后新增的文件名
+        changed (list): 大小或修改时间变化的文件名
+        removed (list): 上次扫描后删除的文件名
+    """
+    folder: str
+    files: List[ScannedFile] = field(default_factory=list)
+    new: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def unparsed(self) -> List[ScannedFile]:
+        return [f for f in self.files if not f.vendor_name]
+
+    def group_by_vendor(self) -> Dict[str, List[ScannedFile]]:
+        """按供应商分组（保持文件名顺序），无法解析的文件不在其中。"""
+        groups: Dict[str, List[ScannedFile]] = {}
+        for scanned in self.files:
+            if scanned.vendor_name:
+                groups.setdefault(scanned.vendor_name, []).append(scanned)
+        return groups
+
+
+class FolderScanner:
+    """用 os.scandir 扫描确认函文件夹，并在清单文件中记录每个文件的状态。
+
+    清单按文件夹记录每个文件的大小、修改时间和解析结果，以及每个供应商
+    附件组的内容摘要。之后的扫描只解析新增或修改的文件；附件组没有变化时
+    直接复用摘要，不需要重新读取文件内容（网络共享上读取全部历史文件很慢）。
+
+    属性:
+        manifest_path (str): 清单文件路径（JSON）
+        parse_name (callable): 解析文件名的函数
+        keyword (str): 文件名中必须包含的关键字
+        suffix (str): 文件扩展名
+    """
+
+    def __init__(self, manifest_path: str, parse_name: NameParser, keyword: str = '', suffix: str = '.xlsx'):
+        self.manifest_path = manifest_path
+        self.parse_name = parse_name
+        self.keyword = keyword
+        self.suffix = suffix.lower()
+        self._lock = threading.Lock()
+        self._manifest = self._load()
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return {'version': MANIFEST_VERSION, 'folders': {}}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取文件夹清单时出错，将重新扫描全部文件: {e}")
+            return {'version': MANIFEST_VERSION, 'folders': {}}
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {'version': MANIFEST_VERSION, 'folders': {}}
+        return manifest
+
+    def save(self) -> None:
+        manifest_dir = os.path.dirname(self.manifest_path)
+        if manifest_dir and not os.path.exists(manifest_dir):
+            os.makedirs(manifest_dir)
+        # 先写临时文件再替换，避免中途退出时损坏清单
+        temp_path = self.manifest_path + '.tmp'
+        with self._lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._manifest, f, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+
+    def _folder_state(self, folder: str) -> Dict:
+        key = os.path.normcase(os.path.abspath(folder))
+        return self._manifest['folders'].setdefault(key, {'files': {}, 'groups': {}})
+
+    def scan(self, folder: str) -> ScanResult:
+        """扫描文件夹中的确认函文件，与清单比较并更新清单（需要调用 save() 保存）。
+
+        Raises:
+            FileNotFoundError: 文件夹不存在
+        """
+        result = ScanResult(folder)
+        with self._lock:
+            state = self._folder_state(folder)
+            known = state['files']
+            seen = {}
+            # scandir 在一次目录读取中返回文件名；Windows 上同时返回大小和修改时间
+            with os.scandir(folder) as it:
+                for entry in it:
+                    name = entry.name
+                    if not name.lower().endswith(self.suffix) or self.keyword not in name:
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        # 扫描过程中被删除
+                        continue
+
+                    record = known.get(name)
+                    if record is not None and record['size'] == stat.st_size and record['mtime_ns'] == stat.st_mtime_ns:
+                        vendor_name, year_month = record['vendor'], record['year_month']
+                    else:
+                        (result.changed if record is not None else result.new).append(name)
+                        vendor_name, year_month = self.parse_name(entry.path)
+                        record = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                  'vendor': vendor_name, 'year_month': year_month}
+                    seen[name] = record
+                    result.files.append(ScannedFile(entry.path, stat.st_size, stat.st_mtime_ns,
+                                                    vendor_name, year_month))
+
+            result.removed = sorted(set(known) - set(seen))
+            state['files'] = seen
+        result.files.sort(key=lambda f: f.name)
+        return result
+
+    def cached_digest(self, folder: str, vendor_name: str, files: List[ScannedFile]) -> Optional[str]:
+        """附件组（文件名、大小、修改时间）与清单记录相同时返回记录的内容摘要。"""
+        with self._lock:
+            group = self._folder_state(folder)['groups'].get(vendor_name)
+        if group is None or group['files'] != [f.signature() for f in files]:
+            return None
+        return group['digest']
+
+    def remember_digest(self, folder: str, vendor_name: str, files: List[ScannedFile], digest: str) -> None:
+        with self._lock:
+            self._folder_state(folder)['groups'][vendor_name] = {
+                'files': [f.signature() for f in files], 'digest': digest}
+
+    def prune_groups(self, folder: str, vendor_names) -> None:
+        """删除本次扫描中已不存在的供应商的附件组记录。"""
+        vendor_names = set(vendor_names)
+        with self._lock:
+            groups = self._folder_state(folder)['groups']
+            for vendor_name in list(groups):
+                if vendor_name not in vendor_names:
+                    del groups[vendor_name]
@@ -0,0 +1,257 @@
+import re
+from typing import Iterable, Iterator, List
+
+# 流式扫描文件时每次读取的字符数（会延伸到行尾）
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+DEFAULT_ERROR_PATTERNS = 'error,warning,danger,failed,ORA-,TNS-'
+
+
+class Issue:
+    """一条匹配到的问题。
+
+    属性:
+        line_no (int): 行号（从1开始）
+        pattern (str): 匹配到的错误模式
+        line (str): 匹配行
+        context (str): 匹配行及其前后各一行
+    """
+
+    def __init__(self, line_no: int, pattern: str, line: str, context: str):
+        self.line_no = line_no
+        self.pattern = pattern
+        self.line = line
+        self.context = context
+
+    def format(self) -> str:
+        return f"发现 '{self.pattern}': {self.context}"
+
+
+def _trie_regex(words: List[str], after_first: str = '') -> str:
+    """把一组字面量按公共前缀合并为正则表达式（等价于Aho-Corasick的前缀树）。
+
+    合并后每个位置只需比较一次首字符，正则引擎还能用首字符集合快速跳过
+    不可能匹配的位置，避免逐个尝试所有模式。
+
+    Args:
+        words: 字面量列表
+        after_first: 插入在首字符之后的断言
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node, suffix=''):
+        alternatives = [re.escape(char) + suffix + build(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ''
+        regex = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        if '' in node:
+            # 较短的模式已在此结束，后续字符可选
+            regex = '(?:' + regex + ')?'
+        return regex
+
+    return build(trie, after_first)
+
+
+def _is_word_char(char: str) -> bool:
+    return re.match(r"\w", char) is not None
+
+
+class IssueMatcher:
+    """预编译的多模式匹配器，一次扫描即可检查所有错误模式。
+
+    所有模式按公共前缀合并为一个正则表达式，由正则引擎在C层完成扫描，
+    只有命中的行才会在Python中处理。忽略大小写时按块转为小写后匹配，
+    不需要整份文本的小写副本。每行最多报告一个问题，多个模式同时命中时
+    按配置顺序取第一个。
+
+    属性:
+        patterns (list): 错误模式列表（已去除空白和空项）
+        ignore_case (bool): 是否忽略大小写
+        whole_word (bool): 是否只匹配完整的词
+    """
+
+    def __init__(self, patterns: Iterable[str], ignore_case: bool = True, whole_word: bool = False):
+        self.patterns = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if pattern and pattern not in self.patterns:
+                self.patterns.append(pattern)
+        self.ignore_case = ignore_case
+        self.whole_word = whole_word
+
+        # 实际参与匹配的键（忽略大小写时为小写形式）
+        self._keys = [self._fold(pattern) for pattern in self.patterns]
+        self._key_regexes = [re.compile(self._with_boundaries(re.escape(key), key)) for key in self._keys]
+        self._regex, self._fallback_regex = self._compile()
+
+    @classmethod
+    def from_string(cls, patterns_str: str, **kwargs) -> 'IssueMatcher':
+        """从逗号分隔的配置字符串创建匹配器。"""
+        return cls(patterns_str.split(','), **kwargs)
+
+    def _fold(self, text: str) -> str:
+        return text.lower() if self.ignore_case else text
+
+    def _with_boundaries(self, regex: str, key: str) -> str:
+        if not self.whole_word:
+            return regex
+        # 只在模式首尾是单词字符时加边界，"ORA-" 这类模式仍能匹配 "ORA-01555"
+        if _is_word_char(key[0]):
+            regex = rf"(?<!\w){regex}"
+        if _is_word_char(key[-1]):
+            regex = rf"{regex}(?!\w)"
+        return regex
+
+    def _compile(self):
+        if not self._keys:
+            return None, None
+
+        # 整词匹配时按首尾是否为单词字符分组，每组共用同样的边界条件
+        groups = {}
+        for key in self._keys:
+            edges = (self.whole_word and _is_word_char(key[0]), self.whole_word and _is_word_char(key[-1]))
+            groups.setdefault(edges, []).append(key)
+
+        alternatives = []
+        for (word_start, word_end), keys in sorted(groups.items()):
+            # 前边界放在首字符之后检查（首字符前不能是单词字符），
+            # 这样正则仍以字面量开头，保留首字符快速扫描
+            regex = _trie_regex(keys, after_first=r"(?<!\w[\s\S])" if word_start else '')
+            if word_end:
+                regex = rf"(?:{regex})(?!\w)"
+            alternatives.append(regex)
+        source = '|'.join(alternatives)
+
+        # 少数字符转小写后长度会变化，这类文本块改用 IGNORECASE 直接匹配原文
+        fallback = re.compile(source, re.IGNORECASE) if self.ignore_case else None
+        return re.compile(source), fallback
+
+    def _first_pattern(self, line: str) -> str:
+        """命中行中按配置顺序排在最前的模式。"""
+        folded = self._fold(line)
+        for pattern, key, key_regex in zip(self.patterns, self._keys, self._key_regexes):
+            if self.whole_word:
+                if key_regex.search(folded):
+                    return pattern
+            elif key in folded:
+                return pattern
+        return self.patterns[0]
+
+    def iter_issues(self, chunks: Iterable[str]) -> Iterator[Issue]:
+        """流式扫描文本块并逐个返回问题。
+
+        Args:
+            chunks: 文本块序列，除最后一块外每块都应在行尾结束
+
+        Yields:
+            Issue: 按行号顺序排列的问题
+        """
+        if self._regex is None:
+            return
+
+        line_no = 0          # 当前块之前已扫描的行数
+        previous_line = None  # 上一块的最后一行，用作上下文
+        pending = []          # 位于块末尾、等待下一块首行作为上下文的问题
+
+        for chunk in chunks:
+            if not chunk:
+                continue
+
+            if pending:
+                end = chunk.find('\n')
+                next_line = chunk[:end if end != -1 else len(chunk)].rstrip('\r')
+                for issue in pending:
+                    issue.context += '\n' + next_line
+                    yield issue
+                pending = []
+
+            # 在小写形式上查找，位置与原文一一对应
+            haystack, regex = chunk, self._regex
+            if self.ignore_case:
+                haystack = chunk.lower()
+                if len(haystack) != len(chunk):
+                    haystack, regex = chunk, self._fallback_regex
+
+            search_pos = 0
+            line_start_no = line_no
+            counted_pos = 0
+            while True:
+                match = regex.search(haystack, search_pos)
+                if match is None:
+                    break
+
+                start = chunk.rfind('\n', 0, match.start()) + 1
+                end = chunk.find('\n', match.end())
+                if end == -1:
+                    end = len(chunk)
+                line = chunk[start:end].rstrip('\r')
+
+                # 增量计算行号
+                line_start_no += chunk.count('\n', counted_pos, start)
+                counted_pos = start
+
+                if start > 0:
+                    before_start = chunk.rfind('\n', 0, start - 1) + 1
+                    before = chunk[before_start:start - 1].rstrip('\r')
+                else:
+                    before = previous_line
+
+                context_lines = [before, line] if before is not None else [line]
+                issue = Issue(line_start_no + 1, self._first_pattern(line), line, '\n'.join(context_lines))
+
+                if end < len(chunk) - 1:
+                    after_end = chunk.find('\n', end + 1)
+                    if after_end == -1:
+                        after_end = len(chunk)
+                    issue.context += '\n' + chunk[end + 1:after_end].rstrip('\r')
+                    yield issue
+                else:
+                    pending.append(issue)
+
+                search_pos = end + 1
+                if search_pos >= len(chunk):
+                    break
+
+            line_no += chunk.count('\n')
+            stripped = chunk[:-1] if chunk.endswith('\n') else chunk
+            previous_line = stripped[stripped.rfind('\n') + 1:].rstrip('\r')
+
+        # 最后一行之后没有上下文
+        for issue in pending:
+            yield issue
+
+    def find_issues(self, text: str, block_size: int = DEFAULT_BLOCK_SIZE) -> List[str]:
+        """检查一段文本，返回格式化后的问题列表。"""
+        return [issue.format() for issue in self.iter_issues(_split_line_blocks(text, block_size))]
+
+    def scan_file(self, file_path: str, encoding: str = 'utf-8',
+                  block_size: int = DEFAULT_BLOCK_SIZE) -> List[str]:
+        """流式检查文件，不需要把整个文件读入内存。"""
+        with open(file_path, 'r', encoding=encoding, errors='replace') as f:
+            return [issue.format() for issue in self.iter_issues(read_line_blocks(f, block_size))]
+
+
+def read_line_blocks(f, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[str]:
+    """按块读取文本文件，每块延伸到行尾。"""
+    while True:
+        block = f.read(block_size)
+        if not block:
+            return
+        if not block.endswith('\n'):
+            block += f.readline()
+        yield block
+
+
+def _split_line_blocks(text: str, block_size: int) -> Iterator[str]:
+    """把文本切分为在行尾结束的块。"""
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start + block_size)
+        end = len(text) if end == -1 else end + 1
+        yield text[start:end]
+        start = end
@@ -0,0 +1,96 @@
+import threading
+from collections import deque
+from itertools import islice
+from typing import Iterable, List
+
+# 日志缓冲区默认保留的行数
+DEFAULT_MAX_LINES = 20000
+
+
+class LogBuffer:
+    """保留最近若干行日志的环形缓冲区，线程安全。
+
+    工作线程直接追加日志行，界面只显示其中可见的部分；超过 max_lines 时
+    丢弃最早的行，长时间自动监控时内存和界面开销都不会增长。
+    每一行有递增的序号，mark_cycle() 记录一轮监控开始的位置，
+    cycle_text() 取出本轮的日志（用于邮件附件）。
+
+    属性:
+        max_lines (int): 最多保留的行数
+        total (int): 累计追加的行数（下一行的序号）
+    """
+
+    def __init__(self, max_lines: int = DEFAULT_MAX_LINES):
+        if max_lines <= 0:
+            raise ValueError(f"日志行数上限必须大于0: {max_lines}")
+        self.max_lines = max_lines
+        self.total = 0
+        self._lines = deque(maxlen=max_lines)
+        self._cycle_start = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._lines)
+
+    @property
+    def first_seq(self) -> int:
+        """缓冲区中第一行的序号。"""
+        with self._lock:
+            return self.total - len(self._lines)
+
+    def resize(self, max_lines: int) -> None:
+        if max_lines <= 0:
+            raise ValueError(f"日志行数上限必须大于0: {max_lines}")
+        with self._lock:
+            self.max_lines = max_lines
+            self._lines = deque(self._lines, maxlen=max_lines)
+
+    def append(self, line: str) -> None:
+        with self._lock:
+            self._lines.append(line)
+            self.total += 1
+
+    def extend(self, lines: Iterable[str]) -> None:
+        lines = list(lines)
+        with self._lock:
+            self._lines.extend(lines)
+            self.total += len(lines)
+
+    def lines(self, start: int, stop: int) -> List[str]:
+        """按缓冲区中的位置（0为最早保留的行）取出 [start, stop) 的行。"""
+        with self._lock:
+            count = len(self._lines)
+            start = max(0, min(start, count))
+            stop = max(start, min(stop, count))
+            # 靠近末尾时从右侧取，跟随最新日志时不需要遍历整个缓冲区
+            if start > count // 2:
+                tail = list(islice(reversed(self._lines), count - stop, count - start))
+                tail.reverse()
+                return tail
+            return list(islice(self._lines, start, stop))
+
+    def text(self) -> str:
+        with self._lock:
+            return "".join(f"{line}\n" for line in self._lines)
+
+    def mark_cycle(self) -> None:
+        """标记一轮监控的开始。"""
+        with self._lock:
+            self._cycle_start = self.total
+
+    def cycle_text(self) -> str:
+        """本轮监控开始后的日志；较早的行已被丢弃时在开头注明省略的行数。"""
+        with self._lock:
+            first = self.total - len(self._lines)
+            dropped = max(0, first - self._cycle_start)
+            skip = max(0, self._cycle_start - first)
+            lines = [f"... 本轮前 {dropped} 行日志超出缓冲区上限，已省略"] if dropped else []
+            lines.extend(islice(self._lines, skip, None))
+        return "".join(f"{line}\n" for line in lines)
+
+    def clear(self) -> None:
+        """清空显示的日志。本轮的起点随之移到当前位置。"""
+        with self._lock:
+            self._lines.clear()
+            self._cycle_start = self.total
@@ -0,0 +1,410 @@
+import os
+import re
+import copy
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
+import logging
+import datetime
+import functools
+import contextvars
+import logging.handlers
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+LOG_FORMAT_TEXT = 'text'
+LOG_FORMAT_JSON = 'json'
+
+DEFAULT_LOG_FILE = "opera_monitor.log"
+DEFAULT_MAX_SIZE_MB = 10
+DEFAULT_ROTATE_HOURS = 24
+DEFAULT_BACKUP_COUNT = 30
+
+# 每条日志附带的上下文字段，由 log_context() 设置
+CONTEXT_FIELDS = ('cycle_id', 'target', 'script')
+
+_TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(context)s%(message)s'
+_ARCHIVE_TIME_FORMAT = '%Y%m%d-%H%M%S'
+_RECORD_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_context: contextvars.ContextVar = contextvars.ContextVar('opera_log_context', default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """在 with 块中记录的日志附带 cycle_id / target / script 等字段。
+
+    上下文保存在 contextvars 中，交给其他线程运行的函数需要用
+    bind_context() 包装才能继承这些字段。
+    """
+    token = _context.set({**_context.get(), **{key: value for key, value in fields.items() if value}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def bind_context(func: Callable, **fields) -> Callable:
+    """返回在当前日志上下文（附加 fields）中调用 func 的函数，交给其他线程运行时使用。
+
+    每次交给线程时调用一次：返回的函数只能在一个线程中运行。
+    """
+    context = contextvars.copy_context()
+
+    def call(*args, **kwargs):
+        with log_context(**fields):
+            return func(*args, **kwargs)
+    return functools.partial(context.run, call)
+
+
+def new_cycle_id(now: Optional[datetime.datetime] = None) -> str:
+    """一轮监控的编号，按时间排序，如 20261017-060000-3f2a"""
+    return f"{(now or datetime.datetime.now()).strftime(_ARCHIVE_TIME_FORMAT)}-{os.urandom(2).hex()}"
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """在记录日志的线程中只做格式化消息和读取上下文，写文件交给监听线程。"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        context = _context.get()
+        record = copy.copy(record)
+        for key in CONTEXT_FIELDS:
+            if getattr(record, key, None) is None:
+                setattr(record, key, context.get(key))
+        # 合并参数和异常信息，记录可以安全地交给其他线程（异常对象不跨线程保存）
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    """原来的文本格式；有上下文时在消息前加上 [cycle_id target/script]。"""
+
+    def __init__(self):
+        super().__init__(_TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        parts = [getattr(record, 'cycle_id', None),
+                 '/'.join(filter(None, (getattr(record, 'target', None), getattr(record, 'script', None))))]
+        parts = [part for part in parts if part]
+        record.context = f"[{' '.join(parts)}] " if parts else ''
+        return super().format(record)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志一行JSON，便于按 cycle_id、target、script 筛选。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created).strftime(_RECORD_TIME_FORMAT)
+                    + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for key in CONTEXT_FIELDS:
+            entry[key] = getattr(record, key, None)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _archive_pattern(log_file: str) -> re.Pattern:
+    root, ext = os.path.splitext(os.path.basename(log_file))
+    return re.compile(rf"{re.escape(root)}\.(\d{{8}}-\d{{6}})(?:-(\d+))?{re.escape(ext)}(?:\.gz)?$")
+
+
+def list_archives(log_file: str) -> List[Tuple[datetime.datetime, str]]:
+    """已轮转的日志文件，按时间排序。文件名中的时间是该文件最后一条日志之后的轮转时间。"""
+    log_dir = os.path.dirname(os.path.abspath(log_file))
+    pattern = _archive_pattern(log_file)
+    archives = []
+    try:
+        names = os.listdir(log_dir)
+    except OSError:
+        return []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            # 同一秒内多次轮转的文件带有序号，按序号排在后面
+            archives.append((datetime.datetime.strptime(match.group(1), _ARCHIVE_TIME_FORMAT),
+                             int(match.group(2) or 0), os.path.join(log_dir, name)))
+    archives.sort()
+    return [(end, path) for end, _, path in archives]
+
+
+class RotatingLogHandler(logging.handlers.BaseRotatingHandler):
+    """按大小和时间轮转的日志文件，旧文件可压缩为 .gz 并只保留最近的若干个。
+
+    轮转后的文件名带有轮转时间，如 opera_monitor.20261017-000000.log.gz，
+    按时间查找历史日志时只需打开相关的几个文件。
+
+    属性:
+        max_bytes (int): 文件超过此大小时轮转，0 表示不按大小
+        rotate_seconds (float): 轮转间隔（从本地零点起对齐），0 表示不按时间
+        backup_count (int): 保留的旧文件数，0 表示全部保留
+        compress (bool): 是否压缩旧文件
+    """
+
+    def __init__(self, filename: str, max_bytes: int = DEFAULT_MAX_SIZE_MB * 1024 * 1024,
+                 rotate_hours: float = DEFAULT_ROTATE_HOURS, backup_count: int = DEFAULT_BACKUP_COUNT,
+                 compress: bool = True, encoding: str = 'utf-8'):
+        log_dir = os.path.dirname(os.path.abspath(filename))
+        if not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+        super().__init__(filename, 'a', encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_hours * 3600
+        self.backup_count = backup_count
+        self.compress = compress
+        if compress:
+            self.rotator = _gzip_rotator
+        # 已有的日志文件从最后一次写入时算起，程序停止期间跨过了轮转时间时，第一条日志之前先轮转
+        try:
+            started = os.path.getmtime(self.baseFilename)
+        except OSError:
+            started = time.time()
+        self.rollover_at = self._next_rollover(started)
+
+    def _next_rollover(self, now: float) -> Optional[float]:
+        if self.rotate_seconds <= 0:
+            return None
+        day_start = datetime.datetime.combine(datetime.date.fromtimestamp(now), datetime.time()).timestamp()
+        periods = int((now - day_start) // self.rotate_seconds) + 1
+        return day_start + periods * self.rotate_seconds
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            position = self.stream.tell()
+            if position and position + len(self.format(record)) + 1 >= self.max_bytes:
+                return True
+        return False
+
+    def _archive_name(self, now: float) -> str:
+        root, ext = os.path.splitext(self.baseFilename)
+        stamp = datetime.datetime.fromtimestamp(now).strftime(_ARCHIVE_TIME_FORMAT)
+        suffix = '.gz' if self.compress else ''
+        name, counter = f"{root}.{stamp}{ext}{suffix}", 0
+        while os.path.exists(name):
+            counter += 1
+            name = f"{root}.{stamp}-{counter}{ext}{suffix}"
+        return name
+
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        now = time.time()
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            self.rotate(self.baseFilename, self._archive_name(now))
+            if self.backup_count > 0:
+                for _, path in list_archives(self.baseFilename)[:-self.backup_count]:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        self.rollover_at = self._next_rollover(now)
+
+
+@dataclass
+class LogOptions:
+    """日志文件的设置。
+
+    属性:
+        log_file (str): 当前日志文件路径
+        json_lines (bool): 是否以JSON Lines格式写入
+        max_bytes (int): 按大小轮转的阈值，0 表示不按大小
+        rotate_hours (float): 按时间轮转的间隔（小时），0 表示不按时间
+        backup_count (int): 保留的旧文件数，0 表示全部保留
+        compress (bool): 是否压缩旧文件
+    """
+    log_file: str = DEFAULT_LOG_FILE
+    json_lines: bool = False
+    max_bytes: int = DEFAULT_MAX_SIZE_MB * 1024 * 1024
+    rotate_hours: float = DEFAULT_ROTATE_HOURS
+    backup_count: int = DEFAULT_BACKUP_COUNT
+    compress: bool = True
+
+    def create_handler(self) -> RotatingLogHandler:
+        handler = RotatingLogHandler(self.log_file, self.max_bytes, self.rotate_hours, self.backup_count, self.compress)
+        handler.setFormatter(JsonLinesFormatter() if self.json_lines else TextFormatter())
+        return handler
+
+
+class LogPipeline:
+    """异步日志：记录日志的线程只把记录放入队列，由监听线程写文件和控制台。
+
+    脚本输出的每一行都会记录日志，原来在读取线程中同步写文件；现在写文件、
+    轮转和压缩都在监听线程中进行，不会拖慢读取脚本输出和界面。
+    调用 configure() 之前的记录（例如加载配置文件时的日志）先保存在队列中，
+    读取配置后写入配置的日志文件。
+
+    属性:
+        console (logging.Handler): 控制台输出（可为 None）
+        options (LogOptions): 当前的日志文件设置，未设置时为 None
+    """
+
+    def __init__(self, console: Optional[logging.Handler] = None, level: int = logging.INFO):
+        self.console = console
+        if console is not None and console.formatter is None:
+            console.setFormatter(TextFormatter())
+        self.level = level
+        self.options = None
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = ContextQueueHandler(self.queue)
+        self.file_handler = None
+        self.listener = None
+        self.stopped = False
+
+    def start(self) -> 'LogPipeline':
+        root = logging.getLogger()
+        root.setLevel(self.level)
+        root.addHandler(self.queue_handler)
+        atexit.register(self.stop)
+        return self
+
+    def configure(self, options: LogOptions) -> None:
+        """按设置打开日志文件并开始写入；设置变化时之前队列中的记录仍写入原来的文件。"""
+        if self.stopped or options == self.options:
+            return
+        if self.listener is not None:
+            self.listener.stop()
+        try:
+            file_handler = options.create_handler()
+        except OSError as e:
+            # 新的路径无法写入时继续使用原来的文件
+            file_handler = None
+            logging.getLogger("OperaMonitor").error(f"打开日志文件 {options.log_file} 时出错: {e}")
+        if file_handler is not None:
+            if self.file_handler is not None:
+                self.file_handler.close()
+            self.file_handler = file_handler
+            self.options = options
+        handlers = [handler for handler in (self.file_handler, self.console) if handler is not None]
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self) -> None:
+        """写完队列中的记录并关闭文件（程序退出时自动调用）。"""
+        if self.stopped:
+            return
+        if self.listener is None:
+            # 还没有读取配置（例如加载配置文件时出错），写入默认的日志文件
+            self.configure(LogOptions())
+        self.stopped = True
+        logging.getLogger().removeHandler(self.queue_handler)
+        self.listener.stop()
+        self.listener = None
+        for handler in (self.file_handler, self.console):
+            if handler is not None:
+                handler.close()
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def setup_logging(console: Optional[logging.Handler] = None) -> LogPipeline:
+    """启动异步日志，代替 logging.basicConfig。读取配置后调用 configure_logging() 开始写入日志文件。
+
+    Args:
+        console: 控制台输出，没有设置格式时使用文本格式
+
+    Returns:
+        LogPipeline: 已启动的日志管道
+    """
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+    _pipeline = LogPipeline(console).start()
+    return _pipeline
+
+
+def configure_logging(options: LogOptions) -> None:
+    """按配置设置日志文件；没有调用 setup_logging()（例如作为模块导入）时不做任何事。"""
+    if _pipeline is not None:
+        _pipeline.configure(options)
+
+
+def _record_time(record: Dict) -> Optional[datetime.datetime]:
+    try:
+        return datetime.datetime.strptime(record.get('time', '')[:19], _RECORD_TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def _parse_line(line: str) -> Dict:
+    if line.startswith('{'):
+        try:
+            return json.loads(line)
+        except ValueError:
+            pass
+    # 文本格式：时间在行首
+    return {'time': line[:19].replace(',', '.'), 'message': line}
+
+
+def search_logs(log_file: str, since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None,
+                cycle_id: Optional[str] = None, target: Optional[str] = None,
+                text: Optional[str] = None) -> Iterator[Dict]:
+    """在当前日志和已轮转（包括压缩）的日志中查找记录。
+
+    只打开时间范围内的文件；每行先按字符串筛选，只解析可能匹配的行。
+    文本格式的日志只能按时间和 text 筛选。
+
+    Args:
+        log_file: 当前日志文件路径
+        since / until: 时间范围
+        cycle_id: 监控轮次编号
+        target: 监控目标
+        text: 消息中包含的文字
+
+    Returns:
+        Iterator[Dict]: 按时间顺序的记录（JSON格式的字段，或文本格式的 time / message）
+    """
+    files = []
+    previous_end = None
+    for end, path in list_archives(log_file):
+        # 文件中的记录在上一个文件的轮转时间和本文件的轮转时间之间
+        if (since is None or end >= since) and (until is None or previous_end is None or previous_end <= until):
+            files.append(path)
+        previous_end = end
+    if os.path.exists(log_file) and (until is None or previous_end is None or previous_end <= until):
+        files.append(log_file)
+
+    needles = [value for value in (cycle_id, target, text) if value]
+    for path in files:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if any(needle not in line for needle in needles):
+                    continue
+                record = _parse_line(line.rstrip('\n'))
+                if cycle_id and record.get('cycle_id') != cycle_id:
+                    continue
+                if target and record.get('target') != target:
+                    continue
+                if since is not None or until is not None:
+                    timestamp = _record_time(record)
+                    if timestamp is None or (since and timestamp < since) or (until and timestamp > until):
+                        continue
+                yield record
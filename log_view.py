@@ -0,0 +1,97 @@
+import tkinter as tk
+from tkinter import ttk
+from tkinter import font as tkfont
+
+from log_buffer import LogBuffer
+
+
+class LogView(ttk.Frame):
+    """只渲染可见行的日志视图。
+
+    文本框中始终只有一屏的内容，滚动条按 LogBuffer 中的总行数计算位置，
+    所以刷新的开销与日志总量无关。滚动到底部时自动跟随新日志；
+    向上滚动后停留在原来的内容上，直到再次滚动到底部。
+    """
+
+    def __init__(self, master, buffer: LogBuffer, **text_options):
+        super().__init__(master)
+        self.buffer = buffer
+        self.text = tk.Text(self, wrap=tk.NONE, state=tk.DISABLED, **text_options)
+        self.vbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.hbar = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.text.xview)
+        self.text.configure(xscrollcommand=self.hbar.set)
+
+        self.text.grid(row=0, column=0, sticky=tk.NSEW)
+        self.vbar.grid(row=0, column=1, sticky=tk.NS)
+        self.hbar.grid(row=1, column=0, sticky=tk.EW)
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self._linespace = max(1, tkfont.Font(font=self.text.cget('font')).metrics('linespace'))
+        self.follow = True
+        self._top_seq = 0        # 第一可见行的序号
+        self._rendered = None
+
+        self.text.bind('<Configure>', lambda event: self.refresh())
+        self.text.bind('<MouseWheel>', self._on_mousewheel)
+        self.text.bind('<Button-4>', lambda event: self.scroll(-3))
+        self.text.bind('<Button-5>', lambda event: self.scroll(3))
+
+    def _rows(self) -> int:
+        return max(1, self.text.winfo_height() // self._linespace)
+
+    def refresh(self, force: bool = False) -> None:
+        """按当前位置重新显示可见行，内容没有变化时不重绘。"""
+        first_seq = self.buffer.first_seq
+        count = self.buffer.total - first_seq
+        rows = self._rows()
+        max_top = max(0, count - rows)
+        if self.follow:
+            top = max_top
+        else:
+            # 较早的行被丢弃后仍停留在同一内容上
+            top = min(max(0, self._top_seq - first_seq), max_top)
+        self._top_seq = first_seq + top
+
+        key = (self._top_seq, min(rows, count - top))
+        if key != self._rendered or force:
+            lines = self.buffer.lines(top, top + rows)
+            self.text.configure(state=tk.NORMAL)
+            self.text.delete('1.0', tk.END)
+            self.text.insert('1.0', "\n".join(lines))
+            self.text.configure(state=tk.DISABLED)
+            self._rendered = key
+
+        if count > rows:
+            self.vbar.set(top / count, (top + rows) / count)
+        else:
+            self.vbar.set(0.0, 1.0)
+
+    def scroll(self, lines: int) -> None:
+        first_seq = self.buffer.first_seq
+        count = self.buffer.total - first_seq
+        max_top = max(0, count - self._rows())
+        top = min(max(0, self._top_seq - first_seq + lines), max_top)
+        self._top_seq = first_seq + top
+        self.follow = top >= max_top
+        self.refresh()
+
+    def scroll_to_end(self) -> None:
+        self.follow = True
+        self.refresh()
+
+    def _on_mousewheel(self, event) -> str:
+        # Windows 上每格为120，macOS 上为1
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll(-3 * delta)
+        return 'break'
+
+    def _on_scrollbar(self, action, value, unit=None) -> None:
+        if action == 'moveto':
+            first_seq = self.buffer.first_seq
+            count = self.buffer.total - first_seq
+            self._top_seq = first_seq + int(float(value) * count)
+            self.scroll(0)
+        elif action == 'scroll':
+            step = self._rows() - 1 if unit == 'pages' else 1
+            self.scroll(int(value) * max(1, step))
@@ -0,0 +1,227 @@
+import os
+import json
+import hashlib
+import sqlite3
+import logging
+import datetime
+import threading
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 发送状态
+STATE_PENDING = 'pending'
+STATE_SENDING = 'sending'   # 已开始发送但没有记录结果（进程中途退出），无法确认是否已送达
+STATE_SENT = 'sent'
+STATE_FAILED = 'failed'
+STATE_SKIPPED = 'skipped'
+
+# 失败重试的默认退避（秒）：base * 2^(attempts-1)，不超过上限
+DEFAULT_RETRY_BASE_SECONDS = 30
+DEFAULT_RETRY_MAX_SECONDS = 1800
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA_VERSION = 1
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def content_hash(vendor_name: str, file_paths: Iterable[str]) -> str:
+    """按供应商名称和附件（文件名及内容）计算摘要，同一组文件重新运行时摘要不变。"""
+    digest = hashlib.sha256(vendor_name.encode('utf-8'))
+    for file_path in sorted(file_paths, key=os.path.basename):
+        digest.update(b'\0' + os.path.basename(file_path).encode('utf-8') + b'\0')
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class OutboxEntry:
+    """发件箱中的一个供应商邮件。
+
+    属性:
+        vendor (str): 供应商名称
+        content_hash (str): 附件内容摘要
+        files (list): 附件路径
+        state (str): pending / sending / sent / failed / skipped
+        attempts (int): 已尝试发送的次数
+        last_error (str): 最近一次失败的原因
+        next_attempt (datetime): 下一次可以重试的时间
+        sent_at (datetime): 发送成功的时间
+    """
+    vendor: str
+    content_hash: str
+    files: List[str]
+    state: str = STATE_PENDING
+    attempts: int = 0
+    last_error: str = ''
+    next_attempt: Optional[datetime.datetime] = None
+    sent_at: Optional[datetime.datetime] = None
+
+    @property
+    def message_id(self) -> str:
+        """由内容摘要生成的固定 Message-ID，重复发送时收件方可以据此识别。"""
+        return f"<{self.content_hash[:32]}@reconciliation.outbox>"
+
+
+def _to_datetime(value: Optional[float]) -> Optional[datetime.datetime]:
+    return datetime.datetime.fromtimestamp(value) if value is not None else None
+
+
+class MailOutbox:
+    """持久化的发件箱，记录每个供应商/附件组的发送状态。
+
+    同一供应商的同一组附件（按内容摘要识别）只会发送一次：发送前先标记为
+    sending，成功后标记为 sent。进程在两者之间退出时状态停留在 sending，
+    重新运行时不会自动重发，需要确认后用 reset() 重新排队。
+
+    属性:
+        db_path (str): 数据库文件路径
+        retry_base_seconds (float): 失败重试的初始间隔
+        retry_max_seconds (float): 失败重试的最大间隔
+    """
+
+    def __init__(self, db_path: str, retry_base_seconds: float = DEFAULT_RETRY_BASE_SECONDS,
+                 retry_max_seconds: float = DEFAULT_RETRY_MAX_SECONDS):
+        self.db_path = db_path
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        # 多个发送线程共用一个连接并加锁
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    vendor TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    files TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT NOT NULL DEFAULT '',
+                    next_attempt REAL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    sent_at REAL,
+                    PRIMARY KEY (vendor, content_hash)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_state ON outbox (state)")
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _row_to_entry(self, row) -> OutboxEntry:
+        vendor, digest, files, state, attempts, last_error, next_attempt, sent_at = row
+        return OutboxEntry(vendor, digest, json.loads(files), state, attempts, last_error,
+                           _to_datetime(next_attempt), _to_datetime(sent_at))
+
+    def _get(self, vendor: str, digest: str) -> Optional[OutboxEntry]:
+        row = self._conn.execute(
+            "SELECT vendor, content_hash, files, state, attempts, last_error, next_attempt, sent_at "
+            "FROM outbox WHERE vendor = ? AND content_hash = ?", (vendor, digest)).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def enqueue(self, vendor: str, file_paths: List[str], digest: Optional[str] = None) -> OutboxEntry:
+        """登记一个供应商的邮件，已登记时返回现有记录（包括已发送的）。
+
+        Args:
+            vendor: 供应商名称
+            file_paths: 附件路径
+            digest: 内容摘要，默认按附件计算
+
+        Returns:
+            OutboxEntry: 发件箱记录
+        """
+        if digest is None:
+            digest = content_hash(vendor, file_paths)
+        now = datetime.datetime.now().timestamp()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (vendor, content_hash, files, state, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (vendor, digest, json.dumps([str(p) for p in file_paths], ensure_ascii=False),
+                 STATE_PENDING, now, now))
+            return self._get(vendor, digest)
+
+    def _update(self, entry: OutboxEntry, sql: str, params: tuple, expected_states: Iterable[str]) -> bool:
+        states = tuple(expected_states)
+        placeholders = ', '.join('?' * len(states))
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"UPDATE outbox SET {sql}, updated = ? WHERE vendor = ? AND content_hash = ? AND state IN ({placeholders})",
+                params + (datetime.datetime.now().timestamp(), entry.vendor, entry.content_hash) + states)
+            return cursor.rowcount == 1
+
+    def mark_sending(self, entry: OutboxEntry) -> bool:
+        """发送前调用。记录已被其他线程或进程取走、或已发送时返回 False，此时不能发送。"""
+        claimed = self._update(entry, "state = ?, attempts = attempts + 1", (STATE_SENDING,),
+                               (STATE_PENDING, STATE_FAILED, STATE_SKIPPED))
+        if claimed:
+            entry.state = STATE_SENDING
+            entry.attempts += 1
+        return claimed
+
+    def mark_sent(self, entry: OutboxEntry) -> None:
+        now = datetime.datetime.now()
+        self._update(entry, "state = ?, sent_at = ?, last_error = '', next_attempt = NULL",
+                     (STATE_SENT, now.timestamp()), (STATE_SENDING,))
+        entry.state = STATE_SENT
+        entry.sent_at = now
+
+    def mark_failed(self, entry: OutboxEntry, error: str, retry: bool = True) -> None:
+        """记录发送失败，按尝试次数计算下一次重试时间（指数退避）。
+
+        Args:
+            entry: 发件箱记录
+            error: 失败原因
+            retry: 是否可以重试；服务器明确拒绝时为 False，本次运行不再重试
+        """
+        next_attempt = None
+        if retry:
+            delay = min(self.retry_base_seconds * 2 ** max(0, entry.attempts - 1), self.retry_max_seconds)
+            next_attempt = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+        self._update(entry, "state = ?, last_error = ?, next_attempt = ?",
+                     (STATE_FAILED, error, next_attempt.timestamp() if next_attempt else None), (STATE_SENDING,))
+        entry.state = STATE_FAILED
+        entry.last_error = error
+        entry.next_attempt = next_attempt
+
+    def mark_skipped(self, entry: OutboxEntry, reason: str) -> None:
+        """记录未发送（例如没有邮箱配置），下次运行时重新检查。"""
+        self._update(entry, "state = ?, last_error = ?, next_attempt = NULL",
+                     (STATE_SKIPPED, reason), (STATE_SENDING, STATE_PENDING))
+        entry.state = STATE_SKIPPED
+        entry.last_error = reason
+
+    def reset(self, vendor: Optional[str] = None, states: Iterable[str] = (STATE_SENDING,)) -> int:
+        """把指定状态的记录重新排队（例如确认中断的邮件没有送达后），返回记录数。"""
+        states = tuple(states)
+        placeholders = ', '.join('?' * len(states))
+        sql = f"UPDATE outbox SET state = ?, next_attempt = NULL WHERE state IN ({placeholders})"
+        params = [STATE_PENDING] + list(states)
+        if vendor is not None:
+            sql += " AND vendor = ?"
+            params.append(vendor)
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    def entries(self, states: Optional[Iterable[str]] = None) -> List[OutboxEntry]:
+        sql = ("SELECT vendor, content_hash, files, state, attempts, last_error, next_attempt, sent_at "
+               "FROM outbox")
+        params = []
+        if states is not None:
+            states = list(states)
+            sql += f" WHERE state IN ({', '.join('?' * len(states))})"
+            params = states
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY created, vendor", params).fetchall()
+        return [self._row_to_entry(row) for row in rows]
@@ -0,0 +1,226 @@
+import os
+import json
+import math
+import logging
+import datetime
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from metrics_store import (MetricSample, METRIC_LABELS, METRIC_APPLY_LAG_MINUTES, METRIC_APPLY_LAG_SEQUENCES,
+                           METRIC_SESSIONS, METRIC_RMAN_DURATION, METRIC_TABLESPACE_USED_PCT)
+
+logger = logging.getLogger("OperaMonitor")
+
+# 由表空间使用率推算的指标：每天增长的百分点
+METRIC_TABLESPACE_GROWTH = 'tablespace_growth_pct_per_day'
+
+# 默认参数：平滑系数（约等于最近 2/alpha 个采样的加权平均）、偏离的标准差倍数、开始判断前需要的采样数
+DEFAULT_ALPHA = 0.1
+DEFAULT_SIGMA = 3.0
+DEFAULT_WARMUP = 10
+
+# 两次表空间采样间隔太短时增长率噪声很大，不参与计算
+MIN_GROWTH_INTERVAL_SECONDS = 3600
+
+DIRECTION_UP = 'up'
+DIRECTION_BOTH = 'both'
+
+
+@dataclass
+class BaselineRule:
+    """一个指标的偏离判断规则。
+
+    属性:
+        label (str): 显示名称
+        direction (str): up 只判断升高，both 升高和降低都判断
+        min_delta (float): 最小偏离量，历史值非常稳定（标准差接近0）时避免把微小变化当作异常
+    """
+    label: str
+    direction: str
+    min_delta: float
+
+
+BASELINE_RULES = {
+    METRIC_APPLY_LAG_MINUTES: BaselineRule(METRIC_LABELS[METRIC_APPLY_LAG_MINUTES], DIRECTION_UP, 5.0),
+    METRIC_APPLY_LAG_SEQUENCES: BaselineRule(METRIC_LABELS[METRIC_APPLY_LAG_SEQUENCES], DIRECTION_UP, 2.0),
+    METRIC_SESSIONS: BaselineRule(METRIC_LABELS[METRIC_SESSIONS], DIRECTION_BOTH, 10.0),
+    METRIC_RMAN_DURATION: BaselineRule(METRIC_LABELS[METRIC_RMAN_DURATION], DIRECTION_UP, 300.0),
+    METRIC_TABLESPACE_GROWTH: BaselineRule('表空间增长 (%/天)', DIRECTION_UP, 0.5),
+}
+
+
+@dataclass
+class Baseline:
+    """一个指标对象的指数加权均值和方差，每个采样 O(1) 更新。
+
+    属性:
+        mean (float): 加权均值
+        var (float): 加权方差
+        count (int): 已学习的采样数
+        last_value (float): 上一个采样值（用于计算增长率）
+        last_ts (float): 上一个采样的时间戳
+    """
+    mean: float = 0.0
+    var: float = 0.0
+    count: int = 0
+    last_value: Optional[float] = None
+    last_ts: float = 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(max(0.0, self.var))
+
+    def update(self, value: float, alpha: float) -> None:
+        if self.count == 0:
+            self.mean = value
+            self.var = 0.0
+        else:
+            diff = value - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.var = (1 - alpha) * (self.var + diff * increment)
+        self.count += 1
+
+    def to_dict(self) -> Dict:
+        return {'mean': self.mean, 'var': self.var, 'count': self.count,
+                'last_value': self.last_value, 'last_ts': self.last_ts}
+
+
+@dataclass
+class Deviation:
+    """偏离历史基线的采样。"""
+    metric: str
+    item: str
+    value: float
+    mean: float
+    std: float
+
+    def format(self) -> str:
+        rule = BASELINE_RULES[self.metric]
+        name = f"{rule.label} {self.item}" if self.item else rule.label
+        trend = "高于" if self.value > self.mean else "低于"
+        return f"{name}: {self.value:.1f}，{trend}基线 {self.mean:.1f} ± {self.std:.1f}"
+
+
+class BaselineTracker:
+    """按目标维护各指标的滚动基线，并找出明显偏离基线的采样。
+
+    固定阈值（运行超过60/90天、表空间超过80%/90%）在繁忙的酒店经常误报，
+    在空闲的酒店又发现不了缓慢的变化。这里为应用延迟、会话数、RMAN备份耗时和
+    表空间增长率分别维护指数加权均值和方差（EWMA），新采样与基线的差超过
+    sigma 倍标准差（且不小于规则中的最小偏离量）时视为偏离。每轮只更新本轮的
+    采样，耗时与历史长短无关；状态保存在很小的JSON文件中。
+
+    属性:
+        state_path (str): 保存基线的JSON文件路径
+        alpha (float): 平滑系数，越大越快适应新水平
+        sigma (float): 偏离的标准差倍数
+        warmup (int): 开始判断前需要学习的采样数
+    """
+
+    def __init__(self, state_path: str, alpha: float = DEFAULT_ALPHA, sigma: float = DEFAULT_SIGMA,
+                 warmup: int = DEFAULT_WARMUP):
+        self.state_path = state_path
+        self.alpha = alpha
+        self.sigma = sigma
+        self.warmup = warmup
+        self._lock = threading.Lock()
+        self._state = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, Baseline]]]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            return {target: {metric: {item: Baseline(**values) for item, values in items.items()}
+                             for metric, items in metrics.items()}
+                    for target, metrics in raw.items()}
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"读取指标基线时出错，将重新学习: {e}")
+            return {}
+
+    def _save(self) -> None:
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir and not os.path.exists(state_dir):
+            os.makedirs(state_dir)
+        raw = {target: {metric: {item: baseline.to_dict() for item, baseline in items.items()}
+                        for metric, items in metrics.items()}
+               for target, metrics in self._state.items()}
+        # 先写临时文件再替换，避免中途退出时损坏状态文件
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(raw, f, ensure_ascii=False)
+        os.replace(temp_path, self.state_path)
+
+    def baseline(self, target: str, metric: str, item: str = '') -> Optional[Baseline]:
+        with self._lock:
+            return self._state.get(target, {}).get(metric, {}).get(item)
+
+    def reset(self, target: str) -> None:
+        """清除目标的基线（例如硬件或业务量变化之后），重新学习。"""
+        with self._lock:
+            if self._state.pop(target, None) is not None:
+                self._save()
+
+    def _check(self, metric: str, item: str, baseline: Baseline, value: float) -> Optional[Deviation]:
+        if baseline.count < self.warmup:
+            return None
+        rule = BASELINE_RULES[metric]
+        tolerance = max(self.sigma * baseline.std, rule.min_delta)
+        delta = value - baseline.mean
+        if delta > tolerance or (rule.direction == DIRECTION_BOTH and -delta > tolerance):
+            return Deviation(metric, item, value, baseline.mean, baseline.std)
+        return None
+
+    def observe(self, target: str, samples: List[MetricSample],
+                timestamp: Optional[datetime.datetime] = None) -> List[Deviation]:
+        """用一轮监控的采样与基线比较，然后更新基线。
+
+        带有自身时间的采样（RMAN备份任务）在多轮报告中重复出现，只使用比上次更新的采样。
+
+        Args:
+            target: 监控目标名称
+            samples: 本轮的指标采样
+            timestamp: 本轮监控时间，默认为当前时间
+
+        Returns:
+            List[Deviation]: 偏离基线的采样
+        """
+        cycle_ts = (timestamp or datetime.datetime.now()).timestamp()
+        deviations = []
+        with self._lock:
+            metrics = self._state.setdefault(target, {})
+            for sample in samples:
+                ts = sample.timestamp.timestamp() if sample.timestamp else cycle_ts
+                if sample.metric == METRIC_TABLESPACE_USED_PCT:
+                    metric = METRIC_TABLESPACE_GROWTH
+                elif sample.metric in BASELINE_RULES:
+                    metric = sample.metric
+                else:
+                    continue
+
+                baseline = metrics.setdefault(metric, {}).setdefault(sample.item, Baseline())
+                if ts <= baseline.last_ts:
+                    continue
+
+                if metric == METRIC_TABLESPACE_GROWTH:
+                    # 由相邻两次使用率计算每天增长的百分点
+                    previous, previous_ts = baseline.last_value, baseline.last_ts
+                    if previous is not None and ts - previous_ts < MIN_GROWTH_INTERVAL_SECONDS:
+                        continue
+                    baseline.last_value, baseline.last_ts = float(sample.value), ts
+                    if previous is None:
+                        continue
+                    value = (sample.value - previous) / ((ts - previous_ts) / 86400)
+                else:
+                    value = float(sample.value)
+                    baseline.last_value, baseline.last_ts = value, ts
+
+                deviation = self._check(metric, sample.item, baseline, value)
+                if deviation is not None:
+                    deviations.append(deviation)
+                baseline.update(value, self.alpha)
+            self._save()
+        return deviations
@@ -0,0 +1,304 @@
+import time
+import sqlite3
+import logging
+import datetime
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+
+from report_parser import DailyReport
+from archive_tracker import ThreadStatus
+
+logger = logging.getLogger("OperaMonitor")
+
+# 单库模式下使用的目标名称
+DEFAULT_TARGET = 'default'
+
+# 指标名称
+METRIC_APPLIED_SEQUENCE = 'applied_sequence'
+METRIC_APPLY_LAG_SEQUENCES = 'apply_lag_sequences'
+METRIC_ARCHIVE_GAPS = 'archive_gaps'
+METRIC_APPLY_LAG_MINUTES = 'apply_lag_minutes'
+METRIC_TABLESPACE_USED_PCT = 'tablespace_used_pct'
+METRIC_SESSIONS = 'sessions'
+METRIC_INVALID_OBJECTS = 'invalid_objects'
+METRIC_RMAN_DURATION = 'rman_duration_seconds'
+
+# 界面中显示的指标名称
+METRIC_LABELS = {
+    METRIC_APPLIED_SEQUENCE: '已应用日志序列号',
+    METRIC_APPLY_LAG_SEQUENCES: '未应用日志数',
+    METRIC_ARCHIVE_GAPS: '归档日志缺口数',
+    METRIC_APPLY_LAG_MINUTES: '应用延迟 (分钟)',
+    METRIC_TABLESPACE_USED_PCT: '表空间使用率 (%)',
+    METRIC_SESSIONS: '会话数',
+    METRIC_INVALID_OBJECTS: '无效对象数',
+    METRIC_RMAN_DURATION: 'RMAN备份耗时 (秒)',
+}
+
+# 默认保留的历史天数
+DEFAULT_RETENTION_DAYS = 365
+
+SCHEMA_VERSION = 1
+
+
+@dataclass
+class MetricSample:
+    """一个指标采样值。
+
+    属性:
+        metric (str): 指标名称
+        value (float): 指标值
+        item (str): 指标对象（表空间、实例、用户等），没有时为空
+        timestamp (datetime): 采样时间，None 表示使用本轮监控的时间
+    """
+    metric: str
+    value: float
+    item: str = ''
+    timestamp: Optional[datetime.datetime] = None
+
+
+@dataclass
+class TrendPoint:
+    """降采样后的一个时间段。"""
+    item: str
+    start: datetime.datetime
+    avg: float
+    min: float
+    max: float
+    count: int
+
+
+@dataclass
+class Growth:
+    """按最小二乘拟合的增长趋势。
+
+    属性:
+        item (str): 指标对象
+        per_day (float): 每天的增长量
+        latest (float): 最近一次的值
+        days_to_threshold (float): 按当前增速到达阈值所需的天数，不会到达时为 None
+    """
+    item: str
+    per_day: float
+    latest: float
+    days_to_threshold: Optional[float] = None
+
+
+def extract_metrics(report: Optional[DailyReport] = None,
+                    archive_status: Optional[List[ThreadStatus]] = None) -> List[MetricSample]:
+    """从一轮监控的归档日志状态和解析后的报告中提取指标。
+
+    Args:
+        report: 解析后的每日报告
+        archive_status: 每个重做线程的归档日志应用状态
+
+    Returns:
+        List[MetricSample]: 指标采样列表
+    """
+    samples = []
+
+    for status in archive_status or []:
+        thread = str(status.thread)
+        samples.append(MetricSample(METRIC_APPLIED_SEQUENCE, status.applied, thread))
+        samples.append(MetricSample(METRIC_APPLY_LAG_SEQUENCES, status.lag, thread))
+        samples.append(MetricSample(METRIC_ARCHIVE_GAPS, len(status.gaps), thread))
+
+    if report is None:
+        return samples
+
+    if report.last_applied and report.last_received:
+        lag = (report.last_received - report.last_applied).total_seconds() / 60
+        samples.append(MetricSample(METRIC_APPLY_LAG_MINUTES, max(0.0, lag)))
+
+    for tablespace in report.tablespaces:
+        if tablespace.used_pct is not None:
+            samples.append(MetricSample(METRIC_TABLESPACE_USED_PCT, tablespace.used_pct,
+                                        f"{tablespace.database}/{tablespace.name}"))
+
+    for key, count in report.connections.items():
+        samples.append(MetricSample(METRIC_SESSIONS, count, key))
+
+    for owner, count in report.invalid_objects.items():
+        samples.append(MetricSample(METRIC_INVALID_OBJECTS, count, owner))
+
+    # 报告中包含最近3天的备份任务，按任务自身的时间记录，重复出现时覆盖
+    for job in report.rman_jobs:
+        if job.duration_seconds is not None and job.start_time is not None:
+            samples.append(MetricSample(METRIC_RMAN_DURATION, job.duration_seconds,
+                                        f"{job.database}/{job.input_type}", job.start_time))
+
+    return samples
+
+
+def _utc_offset() -> int:
+    """本地时区相对UTC的偏移（秒），用于按本地时间对齐降采样区间。"""
+    return time.localtime().tm_gmtoff
+
+
+class MetricsStore:
+    """基于SQLite的监控指标时间序列存储。
+
+    每轮监控的指标写入本地数据库，按 (target, metric, ts) 建索引，
+    范围查询和降采样都在SQLite中完成，不需要重新解析历史报告。
+
+    属性:
+        db_path (str): 数据库文件路径
+        retention_days (int): 保留的历史天数，0 表示不清理
+    """
+
+    def __init__(self, db_path: str, retention_days: int = DEFAULT_RETENTION_DAYS):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        # 监控线程写入、界面线程查询，共用一个连接并加锁
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS metrics (
+                    target TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    item TEXT NOT NULL DEFAULT '',
+                    ts REAL NOT NULL,
+                    value REAL NOT NULL,
+                    UNIQUE (target, metric, item, ts)
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_metrics_target_metric_ts ON metrics (target, metric, ts)")
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def record(self, target: str, samples: List[MetricSample],
+               timestamp: Optional[datetime.datetime] = None) -> int:
+        """写入一轮监控的指标。
+
+        Args:
+            target: 监控目标名称
+            samples: 指标采样列表
+            timestamp: 本轮监控时间，默认为当前时间
+
+        Returns:
+            int: 写入的采样数
+        """
+        if not samples:
+            return 0
+        cycle_ts = (timestamp or datetime.datetime.now()).timestamp()
+        rows = [(target, sample.metric, sample.item,
+                 sample.timestamp.timestamp() if sample.timestamp else cycle_ts, float(sample.value))
+                for sample in samples]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metrics (target, metric, item, ts, value) VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def prune(self, now: Optional[datetime.datetime] = None) -> int:
+        """删除超过保留天数的历史数据，返回删除的行数。"""
+        if self.retention_days <= 0:
+            return 0
+        cutoff = (now or datetime.datetime.now()) - datetime.timedelta(days=self.retention_days)
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM metrics WHERE ts < ?", (cutoff.timestamp(),))
+        return cursor.rowcount
+
+    def targets(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT target FROM metrics ORDER BY target").fetchall()
+        return [row[0] for row in rows]
+
+    def metrics(self, target: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT metric FROM metrics WHERE target = ? ORDER BY metric", (target,)).fetchall()
+        return [row[0] for row in rows]
+
+    def items(self, target: str, metric: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT item FROM metrics WHERE target = ? AND metric = ? ORDER BY item",
+                (target, metric)).fetchall()
+        return [row[0] for row in rows]
+
+    def _where(self, target: str, metric: str, start: datetime.datetime,
+               end: datetime.datetime, item: Optional[str]):
+        sql = "WHERE target = ? AND metric = ? AND ts >= ? AND ts <= ?"
+        params = [target, metric, start.timestamp(), end.timestamp()]
+        if item is not None:
+            sql += " AND item = ?"
+            params.append(item)
+        return sql, params
+
+    def query(self, target: str, metric: str, start: datetime.datetime, end: datetime.datetime,
+              item: Optional[str] = None) -> List[MetricSample]:
+        """查询时间范围内的原始采样，按时间排序。"""
+        where, params = self._where(target, metric, start, end, item)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT item, ts, value FROM metrics {where} ORDER BY ts, item", params).fetchall()
+        return [MetricSample(metric, value, item, datetime.datetime.fromtimestamp(ts)) for item, ts, value in rows]
+
+    def trend(self, target: str, metric: str, start: datetime.datetime, end: datetime.datetime,
+              bucket_seconds: int = 86400, item: Optional[str] = None) -> List[TrendPoint]:
+        """按固定时间段降采样（按本地时间对齐），返回每段的平均、最小和最大值。
+
+        Args:
+            target: 监控目标名称
+            metric: 指标名称
+            start: 开始时间
+            end: 结束时间
+            bucket_seconds: 每段的长度（秒）
+            item: 只查询指定对象，None 表示所有对象
+
+        Returns:
+            List[TrendPoint]: 按对象和时间排序的降采样结果
+        """
+        offset = _utc_offset()
+        where, params = self._where(target, metric, start, end, item)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT item, CAST((ts + ?) / ? AS INTEGER) AS bucket,
+                           AVG(value), MIN(value), MAX(value), COUNT(*)
+                    FROM metrics {where}
+                    GROUP BY item, bucket ORDER BY item, bucket""",
+                [offset, bucket_seconds] + params).fetchall()
+        return [TrendPoint(item, datetime.datetime.fromtimestamp(bucket * bucket_seconds - offset),
+                           avg, min_value, max_value, count)
+                for item, bucket, avg, min_value, max_value, count in rows]
+
+    def growth(self, target: str, metric: str, start: datetime.datetime, end: datetime.datetime,
+               threshold: Optional[float] = None, item: Optional[str] = None) -> List[Growth]:
+        """按最小二乘拟合每个对象的增长速度，并估算到达阈值的天数。
+
+        回归所需的求和在SQLite中完成，不需要取出所有采样。
+        """
+        where, params = self._where(target, metric, start, end, item)
+        origin = start.timestamp()
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT item, COUNT(*), SUM(x), SUM(value), SUM(x * x), SUM(x * value), MAX(ts)
+                    FROM (SELECT item, (ts - ?) / 86400.0 AS x, value, ts FROM metrics {where})
+                    GROUP BY item ORDER BY item""",
+                [origin] + params).fetchall()
+            latest = dict(self._conn.execute(
+                f"""SELECT m.item, m.value FROM metrics m
+                    JOIN (SELECT item, MAX(ts) AS ts FROM metrics {where} GROUP BY item) last
+                    ON m.item = last.item AND m.ts = last.ts
+                    WHERE m.target = ? AND m.metric = ?""",
+                params + [target, metric]).fetchall())
+
+        result = []
+        for item_name, n, sum_x, sum_y, sum_xx, sum_xy, _ in rows:
+            denominator = n * sum_xx - sum_x * sum_x
+            per_day = (n * sum_xy - sum_x * sum_y) / denominator if n > 1 and denominator > 1e-12 else 0.0
+            growth = Growth(item_name, per_day, latest.get(item_name, sum_y / n))
+            if threshold is not None and per_day > 0 and growth.latest < threshold:
+                growth.days_to_threshold = (threshold - growth.latest) / per_day
+            result.append(growth)
+        return result
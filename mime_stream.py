@@ -0,0 +1,351 @@
+import os
+import re
+import uuid
+import shutil
+import base64
+import hashlib
+import smtplib
+import tempfile
+import threading
+from collections import OrderedDict
+from email import policy
+from email.mime.text import MIMEText
+from email.mime.base import MIMEBase
+from email.generator import BytesGenerator
+from email.utils import formatdate, getaddresses
+from io import BytesIO
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# 每次编码的原始字节数：57的整数倍，编码后每行正好76个字符
+ENCODE_CHUNK_SIZE = 57 * 1024
+
+# 写入SMTP数据流时每次发送的字节数
+SEND_BUFFER_SIZE = 64 * 1024
+
+# 附件编码缓存默认最多占用的磁盘空间
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+_SMTP_POLICY = policy.SMTP
+_LEADING_DOT_RE = re.compile(rb"^\.", re.MULTILINE)
+
+
+def encode_base64_chunks(f: BinaryIO, digest=None) -> Iterator[bytes]:
+    """按块读取文件并编码为 base64（CRLF 换行），可同时计算摘要。"""
+    while True:
+        chunk = f.read(ENCODE_CHUNK_SIZE)
+        if not chunk:
+            return
+        if digest is not None:
+            digest.update(chunk)
+        yield base64.encodebytes(chunk).replace(b"\n", b"\r\n")
+
+
+def fold_headers(headers: Iterable[Tuple[str, str]]) -> bytes:
+    """把头部编码为 SMTP 格式（非 ASCII 内容按 RFC 2047/2231 编码），以空行结束。"""
+    return b"".join(_SMTP_POLICY.fold_binary(name, _SMTP_POLICY.header_factory(name, value))
+                    for name, value in headers) + b"\r\n"
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AttachmentCache:
+    """按文件内容摘要缓存编码后的附件，同一附件发给多个收件人时只编码一次。
+
+    编码结果写入临时目录中的文件，读取时每次单独打开，可在多个发送线程中共用。
+    超过 max_bytes 时淘汰最久未使用的条目。
+
+    属性:
+        max_bytes (int): 缓存最多占用的磁盘空间
+        hits (int): 命中次数
+        misses (int): 未命中（编码）次数
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._dir = tempfile.mkdtemp(prefix="mime_cache_")
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()  # 摘要 -> (编码文件, 大小)
+        self._digests: Dict[Tuple[str, int, int], str] = {}                  # (路径, 大小, 修改时间) -> 摘要
+        self._size = 0
+
+    def _digest_for(self, path: str) -> str:
+        stat = os.stat(path)
+        key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            digest = file_digest(path)
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def encoded_path(self, path: str) -> str:
+        """返回附件编码结果所在的文件，没有缓存时先编码。"""
+        digest = self._digest_for(path)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry[0]
+
+        # 在锁外编码，写入临时文件后再登记
+        fd, spool_path = tempfile.mkstemp(dir=self._dir, suffix=".b64")
+        with os.fdopen(fd, 'wb') as out, open(path, 'rb') as f:
+            for chunk in encode_base64_chunks(f):
+                out.write(chunk)
+        size = os.path.getsize(spool_path)
+
+        with self._lock:
+            existing = self._entries.get(digest)
+            if existing is not None:
+                # 其他线程已编码同一内容
+                os.remove(spool_path)
+                self.hits += 1
+                return existing[0]
+            self.misses += 1
+            self._entries[digest] = (spool_path, size)
+            self._size += size
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, (old_path, old_size) = self._entries.popitem(last=False)
+                self._size -= old_size
+                # Windows 上正在读取的文件无法删除，留给 close() 清理
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        return spool_path
+
+    def close(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+            self._size = 0
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def __enter__(self) -> 'AttachmentCache':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class _FilePart:
+    """流式编码的文件附件。"""
+
+    def __init__(self, path: str, filename: str, maintype: str, subtype: str):
+        self.path = path
+        self.filename = filename
+        self.maintype = maintype
+        self.subtype = subtype
+
+    def headers(self) -> bytes:
+        part = MIMEBase(self.maintype, self.subtype)
+        part['Content-Transfer-Encoding'] = 'base64'
+        part.add_header('Content-Disposition', 'attachment', filename=self.filename)
+        return fold_headers(part.items())
+
+
+class StreamingMessage:
+    """流式生成的 multipart/mixed 邮件。
+
+    正文等小的部分用 email 包生成；附件在发送时按块读取、编码并直接写入
+    SMTP 数据流（或文件），不会把整个附件或整封邮件放在内存中。
+    提供 AttachmentCache 时，附件的编码结果按内容摘要缓存复用。
+
+    用法:
+        msg = StreamingMessage(cache)
+        msg['From'] = ...
+        msg.attach_text(body)
+        msg.attach_file(path)
+        msg.send(smtp)
+    """
+
+    def __init__(self, cache: Optional[AttachmentCache] = None):
+        self.cache = cache
+        self.boundary = f"=_{uuid.uuid4().hex}"
+        self._headers: List[Tuple[str, str]] = []
+        self._parts: list = []
+
+    def __setitem__(self, name: str, value: str) -> None:
+        self._headers.append((name, value))
+
+    def __getitem__(self, name: str) -> Optional[str]:
+        return next((value for key, value in self._headers if key.lower() == name.lower()), None)
+
+    def get_all(self, name: str) -> List[str]:
+        return [value for key, value in self._headers if key.lower() == name.lower()]
+
+    def attach_text(self, text: str, subtype: str = 'plain', charset: str = 'utf-8',
+                    filename: Optional[str] = None) -> None:
+        part = MIMEText(text, subtype, charset)
+        if filename:
+            part.add_header('Content-Disposition', 'attachment', filename=filename)
+        self._parts.append(part)
+
+    def attach_file(self, path: str, filename: Optional[str] = None,
+                    maintype: str = 'application', subtype: str = 'octet-stream') -> None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"附件文件不存在：{path}")
+        self._parts.append(_FilePart(path, filename or os.path.basename(path), maintype, subtype))
+
+    def _header_bytes(self) -> bytes:
+        headers = list(self._headers)
+        names = {name.lower() for name, _ in headers}
+        if 'date' not in names:
+            headers.append(('Date', formatdate(localtime=True)))
+        headers.append(('MIME-Version', '1.0'))
+        headers.append(('Content-Type', f'multipart/mixed; boundary="{self.boundary}"'))
+        return fold_headers(headers)
+
+    def iter_chunks(self) -> Iterator[Tuple[bytes, bool]]:
+        """按顺序生成邮件内容，返回 (数据, 是否可能包含以 '.' 开头的行)。
+
+        每块都从行首开始、以 CRLF 结束。base64 编码的内容不会以 '.' 开头，
+        发送时不需要转义。
+        """
+        delimiter = b"--" + self.boundary.encode('ascii')
+        yield self._header_bytes(), True
+        for part in self._parts:
+            yield delimiter + b"\r\n", False
+            if isinstance(part, _FilePart):
+                yield part.headers(), True
+                if self.cache is not None:
+                    source = self.cache.encoded_path(part.path)
+                    with open(source, 'rb') as f:
+                        # 按整行（76字符+CRLF）读取缓存的编码结果
+                        for block in iter(lambda: f.read(78 * 1024), b''):
+                            yield block, False
+                else:
+                    with open(part.path, 'rb') as f:
+                        for chunk in encode_base64_chunks(f):
+                            yield chunk, False
+            else:
+                buffer = BytesIO()
+                BytesGenerator(buffer, policy=_SMTP_POLICY).flatten(part)
+                data = buffer.getvalue()
+                yield data if data.endswith(b"\r\n") else data + b"\r\n", True
+        yield delimiter + b"--\r\n", False
+
+    def write_to(self, fp: BinaryIO) -> None:
+        """把完整邮件写入二进制文件（例如用于保存或调试）。"""
+        for data, _ in self.iter_chunks():
+            fp.write(data)
+
+    def as_bytes(self) -> bytes:
+        buffer = BytesIO()
+        self.write_to(buffer)
+        return buffer.getvalue()
+
+    def _addresses(self, from_addr: Optional[str], to_addrs: Optional[Sequence[str]]) -> Tuple[str, List[str]]:
+        if from_addr is None:
+            from_addr = getaddresses(self.get_all('Sender') or self.get_all('From'))[0][1]
+        if to_addrs is None:
+            to_addrs = [addr for _, addr in getaddresses(self.get_all('To') + self.get_all('Cc') + self.get_all('Bcc'))
+                        if addr]
+        return from_addr, list(to_addrs)
+
+    def send(self, smtp: smtplib.SMTP, from_addr: Optional[str] = None,
+             to_addrs: Optional[Sequence[str]] = None,
+             on_data: Optional[Callable[[], None]] = None) -> Dict[str, Tuple[int, bytes]]:
+        """通过已连接的SMTP会话发送，内容按块直接写入数据流。
+
+        错误处理与 smtplib.SMTP.sendmail 相同。
+
+        Args:
+            on_data: 服务器接受 DATA 命令、开始写入邮件内容前调用
+
+        Returns:
+            Dict[str, Tuple[int, bytes]]: 被拒绝的收件人（部分收件人被拒绝时）
+
+        Raises:
+            SMTPSenderRefused: 发件人被拒绝
+            SMTPRecipientsRefused: 所有收件人都被拒绝
+            SMTPDataError: 服务器拒绝邮件内容
+        """
+        from_addr, to_addrs = self._addresses(from_addr, to_addrs)
+        return send_chunks(smtp, from_addr, to_addrs, self.iter_chunks(), on_data)
+
+
+def send_chunks(smtp: smtplib.SMTP, from_addr: str, to_addrs: Sequence[str],
+                chunks: Iterable[Tuple[bytes, bool]],
+                on_data: Optional[Callable[[], None]] = None) -> Dict[str, Tuple[int, bytes]]:
+    """依次发送 MAIL、RCPT、DATA 命令，再把按块生成的内容写入数据流。
+
+    Args:
+        smtp: 已连接的SMTP会话
+        from_addr: 发件人
+        to_addrs: 收件人列表
+        chunks: (数据, 是否可能包含以 '.' 开头的行)，每块从行首开始、以 CRLF 结束
+        on_data: 服务器接受 DATA 命令、开始写入邮件内容前调用
+
+    Returns:
+        Dict[str, Tuple[int, bytes]]: 被拒绝的收件人（部分收件人被拒绝时）
+    """
+    smtp.ehlo_or_helo_if_needed()
+
+    code, resp = smtp.mail(from_addr)
+    if code != 250:
+        if code == 421:
+            smtp.close()
+        else:
+            _reset(smtp)
+        raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+
+    refused = {}
+    for addr in to_addrs:
+        code, resp = smtp.rcpt(addr)
+        if code not in (250, 251):
+            refused[addr] = (code, resp)
+        if code == 421:
+            smtp.close()
+            raise smtplib.SMTPRecipientsRefused(refused)
+    if len(refused) == len(to_addrs):
+        _reset(smtp)
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    smtp.putcmd("data")
+    code, resp = smtp.getreply()
+    if code != 354:
+        _reset(smtp)
+        raise smtplib.SMTPDataError(code, resp)
+    if on_data is not None:
+        on_data()
+
+    buffer = []
+    buffered = 0
+    for data, may_have_dots in chunks:
+        if may_have_dots:
+            data = _LEADING_DOT_RE.sub(b"..", data)
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= SEND_BUFFER_SIZE:
+            smtp.send(b"".join(buffer))
+            buffer, buffered = [], 0
+    buffer.append(b".\r\n")
+    smtp.send(b"".join(buffer))
+
+    code, resp = smtp.getreply()
+    if code != 250:
+        if code == 421:
+            smtp.close()
+        else:
+            _reset(smtp)
+        raise smtplib.SMTPDataError(code, resp)
+    return refused
+
+
+def _reset(smtp: smtplib.SMTP) -> None:
+    """发送失败后重置会话，服务器已断开时关闭连接。"""
+    try:
+        smtp.rset()
+    except smtplib.SMTPServerDisconnected:
+        pass
@@ -0,0 +1,1109 @@
+import os
+import html
+import time
+import smtplib
+import logging
+import datetime
+import threading
+import subprocess
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fleet_executor import FleetExecutor, STATUS_OK, STATUS_TIMEOUT, STATUS_ERROR, STATUS_CANCELLED
+from script_runner import run_script, ScriptCancelled
+from issue_matcher import IssueMatcher, read_line_blocks
+from report_parser import ReportParser, DailyReport, parse_report_file
+from archive_tracker import (ArchiveLogTracker, ArchivedLog, ThreadStatus, RECENT_LOGS, parse_archived_logs,
+                             parse_resetlogs)
+from scheduler import Scheduler, IntervalSchedule, parse_schedule
+from mime_stream import StreamingMessage
+from metrics_store import MetricsStore, extract_metrics, DEFAULT_TARGET
+from alert_state import Alert, AlertChanges, AlertTracker, make_alert, SEVERITY_WARNING, SEVERITY_CRITICAL
+from report_diff import ReportDiff, SnapshotStore, take_snapshot
+from metric_baseline import BaselineTracker, Deviation
+from log_pipeline import bind_context, log_context, new_cycle_id
+from oracle_backend import (OracleBackend, DatabaseSettings, BACKEND_ORACLEDB, DATABASE_SECTION,
+                            DEFAULT_POOL_MIN, DEFAULT_POOL_MAX, format_daily_report, load_database_settings,
+                            load_database_targets, load_driver)
+
+logger = logging.getLogger("OperaMonitor")
+
+# 一轮监控的结果状态
+CYCLE_OK = 'ok'
+CYCLE_TIMEOUT = 'timeout'
+CYCLE_CANCELLED = 'cancelled'
+CYCLE_ERROR = 'error'
+
+# 命令行退出码
+EXIT_OK = 0
+EXIT_ISSUES = 1
+EXIT_ERROR = 2
+EXIT_TIMEOUT = 3
+EXIT_CANCELLED = 4
+
+# 邮件正文中需要着色的检查项及状态
+_EMAIL_STATUS_STYLES = {
+    "✅ 正常": "<span style='color: green; font-weight: bold;'>✓ 正常</span>",
+    "❌ 异常": "<span style='color: red; font-weight: bold;'>⚠️ 异常</span>",
+    "🔴 危险": "<span style='color: red; font-weight: bold;'>⚠️ 危险</span>",
+    "🟡 警告": "<span style='color: orange; font-weight: bold;'>⚠️ 警告</span>",
+}
+_EMAIL_UPTIME_STYLES = {
+    "🔴 警告": "<span style='color: red; font-weight: bold;'>⚠️ 警告</span>",
+    "🟡 注意": "<span style='color: orange; font-weight: bold;'>⚠️ 注意</span>",
+    "✅ 正常": "<span style='color: green; font-weight: bold;'>✓ 正常</span>",
+    "❓ 无法解析": "<span style='color: gray; font-weight: bold;'>❓ 无法解析</span>",
+}
+_EMAIL_STATUS_CHECKS = ("数据库角色检查", "归档日志间隙检查", "未应用日志检查", "表空间使用检查", "备份检查", "无效对象检查",
+                        "基线偏离检查")
+
+
+class EmailReportError(Exception):
+    """邮件报告无法发送（设置不完整或报告文件不存在）。
+
+    属性:
+        title (str): 错误标题
+    """
+
+    def __init__(self, title: str, message: str):
+        super().__init__(message)
+        self.title = title
+
+
+@dataclass
+class StatusCheck:
+    """一项数据库状态检查的结果。"""
+    name: str
+    state: str
+    detail: str = ''
+    abnormal: bool = False
+
+    def format(self) -> str:
+        return f"   {self.name}: {self.state}" + (f" {self.detail}" if self.detail else "")
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'state': self.state, 'detail': self.detail, 'abnormal': self.abnormal}
+
+
+@dataclass
+class TargetAnalysis:
+    """单个目标一轮检查的分析结果。"""
+    target: str
+    include_report: bool = True
+    check_errors: bool = True
+    script_status: str = STATUS_OK
+    script_error: str = ''
+    elapsed: float = 0.0
+    standby_issues: List[str] = field(default_factory=list)
+    archive_status: List[ThreadStatus] = field(default_factory=list)
+    recent_logs: List[ArchivedLog] = field(default_factory=list)
+    report_path: str = ''
+    report_found: bool = False
+    report_reused: bool = False
+    report_error: str = ''
+    html_issues: List[str] = field(default_factory=list)
+    status_checks: List[StatusCheck] = field(default_factory=list)
+    baseline_checks: List[StatusCheck] = field(default_factory=list)
+    report_diff: Optional[ReportDiff] = None
+
+    @property
+    def archive_issues(self) -> bool:
+        return any(status.gaps for status in self.archive_status)
+
+    @property
+    def has_issues(self) -> bool:
+        if self.script_status != STATUS_OK:
+            return True
+        if not self.check_errors:
+            return False
+        return bool(self.standby_issues or self.archive_issues or self.html_issues
+                    or any(check.abnormal for check in self.status_checks + self.baseline_checks))
+
+    def format(self, fleet: bool = False) -> str:
+        """按界面中的格式输出分析结果。"""
+        if fleet:
+            lines = [f"===== 分析结果: {self.target} =====\n\n"]
+        else:
+            lines = ["===== 分析结果 =====\n\n"]
+
+        if not self.check_errors:
+            lines.append("错误检查已禁用，跳过分析。\n")
+            return "".join(lines)
+
+        # 先列出与上一轮相比的变化，只有变化的部分
+        if self.report_diff is not None:
+            lines.append("0. 与上一轮相比的变化:\n")
+            lines.append(self.report_diff.format())
+            lines.append("\n")
+
+        lines.append("1. Check Standby 分析:\n")
+        if self.standby_issues:
+            lines.append("   发现以下问题:\n")
+            lines.extend(f"   - {issue}\n" for issue in self.standby_issues)
+        else:
+            lines.append("   未发现问题\n")
+
+        # 归档日志应用状态（按线程的水位线增量计算）
+        if self.archive_status:
+            lines.append("\n   归档日志应用状态:\n")
+            for status in self.archive_status:
+                lines.append(f"   线程{status.thread}: 已接收至 SEQUENCE# {status.received}，"
+                             f"连续应用至 SEQUENCE# {status.applied}，未应用 {status.lag} 个\n")
+                if status.gaps:
+                    shown = ", ".join(str(seq) for seq in status.gaps[:20])
+                    more = f" 等{len(status.gaps)}个" if len(status.gaps) > 20 else ""
+                    lines.append(f"   线程{status.thread}: ❌ 缺失归档日志 SEQUENCE# {shown}{more}\n")
+
+        # 最近的10条SEQUENCE# APPLIED记录
+        if self.recent_logs:
+            lines.append("\n   最后10条 SEQUENCE# APPLIED:\n")
+            lines.extend(f"   THREAD#: {log.thread}, SEQUENCE#: {log.sequence}, APPLIED: {log.applied}\n"
+                         for log in self.recent_logs)
+
+        lines.append("\n2. HTML报告分析:\n")
+        if not self.include_report:
+            lines.append("   本轮只检查备库，跳过HTML报告分析\n")
+        elif not self.report_found:
+            lines.append(f"   HTML报告文件不存在: {self.report_path}\n")
+        elif self.report_error:
+            lines.append(f"   读取HTML报告时出错: {self.report_error}\n")
+        else:
+            if self.report_reused:
+                lines.append("   HTML报告自上一轮以来没有变化，沿用上一轮的结果\n")
+            if self.html_issues:
+                lines.append("   HTML报告中发现以下问题:\n")
+                lines.extend(f"   - {issue}\n" for issue in self.html_issues)
+            else:
+                lines.append("   HTML报告中未发现问题\n")
+            lines.extend(check.format() + "\n" for check in self.status_checks)
+
+        # 与该目标历史基线相比明显变化的指标
+        if self.baseline_checks:
+            lines.append("\n   与历史基线比较:\n")
+            lines.extend(check.format() + "\n" for check in self.baseline_checks)
+
+        lines.append("\n3. 总结:\n")
+        if self.has_issues:
+            lines.append("   监控发现异常情况，建议检查系统状态\n")
+        else:
+            lines.append("   所有检查正常\n")
+        if fleet:
+            lines.append("\n")
+        return "".join(lines)
+
+    def to_dict(self) -> Dict:
+        return {
+            'target': self.target,
+            'script_status': self.script_status,
+            'script_error': self.script_error,
+            'elapsed': round(self.elapsed, 3),
+            'has_issues': self.has_issues,
+            'check_errors': self.check_errors,
+            'standby_issues': self.standby_issues,
+            'archive_status': [
+                {'thread': status.thread, 'applied': status.applied, 'received': status.received,
+                 'lag': status.lag, 'gaps': status.gaps, 'not_applied': status.not_applied}
+                for status in self.archive_status
+            ],
+            'report_path': self.report_path if self.include_report else None,
+            'report_found': self.report_found,
+            'report_reused': self.report_reused,
+            'report_error': self.report_error,
+            'html_issues': self.html_issues,
+            'status_checks': [check.to_dict() for check in self.status_checks],
+            'baseline_checks': [check.to_dict() for check in self.baseline_checks],
+            'report_diff': self.report_diff.to_dict() if self.report_diff is not None else None,
+        }
+
+    def alerts(self) -> List[Alert]:
+        """本轮发现的问题，用于判断是否需要发送邮件（见 AlertTracker）。"""
+        if self.script_status != STATUS_OK:
+            return [make_alert(self.target, 'script', self.script_status,
+                               f"脚本执行{'超时' if self.script_status == STATUS_TIMEOUT else '失败'}: {self.script_error}")]
+        if not self.check_errors:
+            return []
+
+        alerts = [make_alert(self.target, 'standby', issue) for issue in self.standby_issues]
+        alerts.extend(make_alert(self.target, 'report', issue) for issue in self.html_issues)
+        alerts.extend(make_alert(self.target, 'archive_gap', f"thread {status.thread}",
+                                 f"线程{status.thread}缺失{len(status.gaps)}个归档日志")
+                      for status in self.archive_status if status.gaps)
+        # 检查项按名称区分，状态变化（如表空间从警告变为危险）视为同一问题的升级
+        for check in self.status_checks:
+            if check.abnormal or check.state.startswith(("🟡", "🔴")):
+                alerts.append(make_alert(self.target, 'check', check.name, check.format().strip(),
+                                         severity=SEVERITY_CRITICAL if check.abnormal else SEVERITY_WARNING))
+        for check in self.baseline_checks:
+            # 同一指标对象持续偏离时视为同一问题
+            alerts.append(make_alert(self.target, 'baseline', check.detail.split(':')[0], check.format().strip(),
+                                     severity=SEVERITY_WARNING))
+        return alerts
+
+
+@dataclass
+class CycleResult:
+    """一轮监控的结果。
+
+    属性:
+        fleet (bool): 是否为机群模式
+        include_daily_report (bool): 是否运行了 daily_report（否则只检查备库）
+        started (datetime): 开始时间
+        elapsed (float): 耗时（秒）
+        status (str): ok / timeout / cancelled / error
+        error (str): 出错时的错误信息
+        targets (list): 每个目标的分析结果
+        interruptions (list): 被超时或取消中断的脚本 (脚本名, 状态, 原因)
+        cycle_id (str): 本轮编号，本轮的日志都带有此编号
+    """
+    fleet: bool = False
+    include_daily_report: bool = True
+    started: datetime.datetime = field(default_factory=datetime.datetime.now)
+    elapsed: float = 0.0
+    status: str = CYCLE_OK
+    error: str = ''
+    targets: List[TargetAnalysis] = field(default_factory=list)
+    interruptions: List[Tuple[str, str, str]] = field(default_factory=list)
+    cycle_id: str = field(default_factory=new_cycle_id)
+
+    @property
+    def has_issues(self) -> bool:
+        return any(target.has_issues for target in self.targets)
+
+    def alerts(self) -> List[Alert]:
+        alerts = [alert for target in self.targets for alert in target.alerts()]
+        if not self.fleet:
+            # 单库模式下脚本超时记录在 interruptions 中
+            alerts.extend(make_alert(DEFAULT_TARGET, 'script', name, f"{name} {state} ({reason})")
+                          for name, state, reason in self.interruptions)
+        return alerts
+
+    def checked_targets(self) -> List[str]:
+        """完整检查过的目标，这些目标中没有再出现的问题视为已恢复。"""
+        if self.status not in (CYCLE_OK, CYCLE_TIMEOUT) or not self.include_daily_report:
+            return []
+        return [target.target for target in self.targets
+                if target.script_status == STATUS_OK and target.check_errors
+                and (self.fleet or not self.interruptions)]
+
+    @property
+    def exit_code(self) -> int:
+        if self.status == CYCLE_ERROR:
+            return EXIT_ERROR
+        if self.status == CYCLE_CANCELLED:
+            return EXIT_CANCELLED
+        if self.status == CYCLE_TIMEOUT:
+            return EXIT_TIMEOUT
+        return EXIT_ISSUES if self.has_issues else EXIT_OK
+
+    def format(self) -> str:
+        """按界面中的格式输出本轮的分析结果。"""
+        if self.status == CYCLE_ERROR and not self.targets:
+            return f"执行监控时出错: {self.error}\n"
+
+        if not self.fleet:
+            text = "".join(target.format() for target in self.targets)
+            if self.interruptions:
+                text += "\n4. 执行状态:\n"
+                text += "".join(f"   {name}: {state} ({reason})\n" for name, state, reason in self.interruptions)
+            return text
+
+        lines = [f"===== 机群分析结果 ({len(self.targets)}个目标，耗时 {self.elapsed:.1f} 秒) =====\n\n"]
+        lines.extend(target.format(fleet=True) for target in self.targets if target.script_status == STATUS_OK)
+        lines.append("===== 机群汇总 =====\n")
+        for target in self.targets:
+            if target.script_status == STATUS_OK:
+                state = "❌ 异常" if target.has_issues else "✅ 正常"
+            elif target.script_status == STATUS_TIMEOUT:
+                state = f"⏱ 超时 ({target.script_error})"
+            elif target.script_status == STATUS_CANCELLED:
+                state = "⛔ 已取消"
+            else:
+                state = f"❌ 出错 ({target.script_error})"
+            lines.append(f"   {target.target}: {state}，耗时 {target.elapsed:.1f} 秒\n")
+        return "".join(lines)
+
+    def to_dict(self) -> Dict:
+        return {
+            'cycle_id': self.cycle_id,
+            'started': self.started.strftime("%Y-%m-%d %H:%M:%S"),
+            'elapsed': round(self.elapsed, 3),
+            'mode': 'fleet' if self.fleet else 'single',
+            'include_daily_report': self.include_daily_report,
+            'status': self.status,
+            'error': self.error,
+            'has_issues': self.has_issues,
+            'exit_code': self.exit_code,
+            'interruptions': [{'script': name, 'state': state, 'reason': reason}
+                              for name, state, reason in self.interruptions],
+            'targets': [target.to_dict() for target in self.targets],
+        }
+
+
+def email_intro(with_attachments: bool = True) -> str:
+    """邮件正文的第一句；只通知变化或定期摘要的邮件没有附件。"""
+    if with_attachments:
+        return "这是自动生成的Opera数据库监控报告，请查看附件。"
+    return "这是自动生成的Opera数据库监控报告。"
+
+
+def format_email_html(analysis_text: str, summary: str = '', with_attachments: bool = True) -> str:
+    """把分析文本转换为HTML邮件正文，检查项状态按颜色显示；summary 为问题变化的摘要，显示在最前面。"""
+    html_body = "<html><body>"
+    html_body += f"<p>{email_intro(with_attachments)}</p>"
+    if summary:
+        html_body += "<h3>问题变化:</h3>"
+        html_body += "<pre>" + html.escape(summary).replace('\n', '<br>') + "</pre>"
+    html_body += "<h3>分析结果:</h3>"
+    html_body += "<pre>"
+    for line in analysis_text.split('\n'):
+        if "服务器运行时间分析" in line:
+            styles = _EMAIL_UPTIME_STYLES
+        elif any(name in line for name in _EMAIL_STATUS_CHECKS):
+            styles = _EMAIL_STATUS_STYLES
+        else:
+            styles = {}
+        for state, styled in styles.items():
+            if state in line:
+                line = line.replace(state, styled)
+                break
+        html_body += line + "<br>"
+    html_body += "</pre>"
+    html_body += "</body></html>"
+    return html_body
+
+
+class MonitorEngine:
+    """监控引擎：运行检查脚本、分析结果、保存指标和发送报告，不依赖任何界面。
+
+    图形界面和命令行都是这个引擎的前端。日志和脚本输出通过回调交给前端显示。
+
+    属性:
+        config_manager (ConfigManager): 配置管理器
+        log_callback (callable): 日志回调函数，签名为 log_callback(message)
+        output_callback (callable): 脚本输出回调，签名为 output_callback(label, source, lines)
+        cancel_event (threading.Event): 取消标志
+        is_running (bool): 是否有一轮监控正在运行
+    """
+
+    def __init__(self, config_manager,
+                 log_callback: Optional[Callable[[str], None]] = None,
+                 output_callback: Optional[Callable[[Optional[str], str, List[str]], None]] = None):
+        self.config_manager = config_manager
+        self.log_callback = log_callback
+        self.output_callback = output_callback
+        self.cancel_event = threading.Event()
+        self.is_running = False
+        self.cycle_interruptions = []  # 本轮被超时或取消中断的脚本
+        self.metrics_store = None
+        self.archive_tracker = None
+        self.baseline_tracker = None
+        self.alert_tracker = None
+        self.snapshot_store = None
+        self._report_cache = {}  # 报告路径 -> (文件状态和匹配设置, 解析结果, 发现的问题)
+        self.oracle_backend = None
+        self._oracle_backend_key = None
+
+    def log_message(self, message: str) -> None:
+        if self.log_callback:
+            self.log_callback(message)
+        else:
+            logger.info(message)
+
+    def _on_output(self, label: Optional[str], source: str, lines: List[str]) -> None:
+        if self.output_callback:
+            self.output_callback(label, source, lines)
+        else:
+            logger.info("\n".join(lines))
+
+    def cancel(self) -> None:
+        """结束正在运行的脚本（连同子进程）。"""
+        self.cancel_event.set()
+
+    # ---------- 运行 ----------
+
+    def run_cycle(self, include_daily_report: bool = True) -> CycleResult:
+        """运行一轮监控。
+
+        Args:
+            include_daily_report: 是否运行 daily_report；为 False 时只检查备库
+
+        Returns:
+            CycleResult: 本轮结果
+        """
+        self.is_running = True
+        self.cancel_event.clear()
+        self.cycle_interruptions = []
+        result = CycleResult(fleet=self.config_manager.is_fleet_mode(), include_daily_report=include_daily_report)
+        start = time.monotonic()
+
+        # 本轮（包括脚本输出）的日志都带有轮次编号
+        with log_context(cycle_id=result.cycle_id):
+            try:
+                if self.uses_oracledb():
+                    self._run_oracledb(result)
+                elif result.fleet:
+                    self._run_fleet(result)
+                else:
+                    self._run_single(result)
+
+                # 超时的一轮照常记录，取消的一轮由前端决定是否发送
+                if result.status == CYCLE_OK:
+                    if self.cancel_event.is_set():
+                        result.status = CYCLE_CANCELLED
+                        self.log_message("监控任务已取消")
+                    elif self.cycle_interruptions:
+                        result.status = CYCLE_TIMEOUT
+                        self.log_message("监控任务完成（部分脚本超时）")
+                    else:
+                        self.log_message("监控任务完成")
+
+            except Exception as e:
+                result.status = CYCLE_ERROR
+                result.error = str(e)
+                self.log_message(f"执行监控时出错: {str(e)}")
+                logger.error(f"执行监控时出错: {str(e)}", exc_info=True)
+
+            finally:
+                result.elapsed = time.monotonic() - start
+                if not result.fleet:
+                    for target in result.targets:
+                        target.elapsed = result.elapsed
+                result.interruptions = list(self.cycle_interruptions)
+                self.is_running = False
+        return result
+
+    def _fail(self, result: CycleResult, message: str) -> None:
+        result.status = CYCLE_ERROR
+        result.error = message
+        self.log_message(f"错误: {message}")
+
+    def _run_single(self, result: CycleResult) -> None:
+        # 获取批处理文件路径
+        check_standby_bat = self.config_manager.get('Paths', 'check_standby_bat')
+        daily_report_bat = self.config_manager.get('Paths', 'daily_report_bat')
+
+        # 检查文件是否存在
+        if not os.path.exists(check_standby_bat):
+            self._fail(result, f"文件不存在 - {check_standby_bat}")
+            return
+        if result.include_daily_report and not os.path.exists(daily_report_bat):
+            self._fail(result, f"文件不存在 - {daily_report_bat}")
+            return
+
+        settings = self.config_manager.settings()
+        check_standby_timeout = settings.check_standby_timeout
+        daily_report_timeout = settings.daily_report_timeout
+        # 只查询上次应用水位线之后的归档日志
+        check_standby_args = [self.get_archive_tracker().watermark_arg(DEFAULT_TARGET)]
+
+        if not result.include_daily_report:
+            # 计划中的备库检查只运行check_standby.bat
+            self.log_message("开始执行 check_standby.bat（备库检查）...")
+            check_standby_output = self.run_batch_file(check_standby_bat, timeout=check_standby_timeout, args=check_standby_args)
+            self.log_message("check_standby.bat 执行完成")
+        elif settings.concurrent_scripts:
+            # 两个脚本分别查询备库和主库，互不依赖，同时启动
+            self.log_message("同时执行 check_standby.bat 和 daily_report.bat...")
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                check_standby_future = executor.submit(bind_context(self.run_batch_file), check_standby_bat, "check_standby", check_standby_timeout, check_standby_args)
+                daily_report_future = executor.submit(bind_context(self.run_batch_file), daily_report_bat, "daily_report", daily_report_timeout)
+                check_standby_output = check_standby_future.result()
+                daily_report_future.result()
+            self.log_message("check_standby.bat 和 daily_report.bat 执行完成")
+        else:
+            # 运行check_standby.bat
+            self.log_message("开始执行 check_standby.bat...")
+            check_standby_output = self.run_batch_file(check_standby_bat, timeout=check_standby_timeout, args=check_standby_args)
+            self.log_message("check_standby.bat 执行完成")
+
+            # 运行daily_report.bat（已取消时不再启动）
+            if not self.cancel_event.is_set():
+                self.log_message("开始执行 daily_report.bat...")
+                self.run_batch_file(daily_report_bat, timeout=daily_report_timeout)
+                self.log_message("daily_report.bat 执行完成")
+
+        result.targets.append(self.analyze(check_standby_output, include_report=result.include_daily_report))
+
+    def _run_fleet(self, result: CycleResult) -> None:
+        targets = self.config_manager.get_targets()
+        if not targets:
+            self._fail(result, "机群模式已启用，但配置文件中没有定义 [Target:名称] 监控目标")
+            return
+
+        # 每个目标只查询各自应用水位线之后的归档日志
+        tracker = self.get_archive_tracker()
+        for target in targets:
+            target.check_standby_args = [tracker.watermark_arg(target.name)]
+
+        # 在线程池中并行运行所有目标的脚本
+        settings = self.config_manager.settings()
+        max_output_size = settings.max_output_size
+        executor = FleetExecutor(
+            max_workers=settings.fleet_max_workers,
+            runner=lambda batch_file, timeout, output_callback=None, cancel_event=None, args=None: run_script(
+                batch_file, timeout, output_callback=output_callback,
+                max_output_size=max_output_size, cancel_event=cancel_event, args=args),
+            log_callback=self.log_message,
+            output_callback=self._on_output,
+            concurrent_scripts=settings.concurrent_scripts,
+            cancel_event=self.cancel_event,
+            run_daily_report=result.include_daily_report
+        )
+
+        # 合并分析所有目标的结果
+        for target_result in executor.run(targets):
+            if target_result.status == STATUS_OK:
+                analysis = self.analyze(
+                    target_result.check_standby_output,
+                    report_path=target_result.target.report_path,
+                    target_name=target_result.name,
+                    include_report=result.include_daily_report
+                )
+            else:
+                analysis = TargetAnalysis(target_result.name, include_report=result.include_daily_report)
+                if target_result.status == STATUS_TIMEOUT:
+                    self.cycle_interruptions.append((target_result.name, "⏱ 超时", target_result.error))
+            analysis.script_status = target_result.status
+            analysis.script_error = target_result.error
+            analysis.elapsed = target_result.elapsed
+            result.targets.append(analysis)
+
+    def uses_oracledb(self) -> bool:
+        """是否用 oracledb 直接查询数据库（[Settings] db_backend = oracledb）"""
+        return self.config_manager.settings().db_backend == BACKEND_ORACLEDB
+
+    def _run_oracledb(self, result: CycleResult) -> None:
+        # 直接查询数据库，代替运行 sqlplus 脚本；机群模式下各目标在线程池中并行查询
+        if result.fleet:
+            targets = load_database_targets(self.config_manager.config)
+            if not targets:
+                self._fail(result, "机群模式已启用，但配置文件中没有设置了 standby_dsn 的 [Target:名称] 监控目标")
+                return
+            max_workers = self.config_manager.settings().fleet_max_workers
+        else:
+            targets = [load_database_settings(self.config_manager.config)]
+            max_workers = 1
+
+        backend = self.get_oracle_backend()
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [executor.submit(bind_context(self._query_target, target=settings.name), backend, settings, result)
+                       for settings in targets]
+            result.targets.extend(future.result() for future in futures)
+
+    def _query_target(self, backend: OracleBackend, settings: DatabaseSettings, result: CycleResult) -> TargetAnalysis:
+        """查询一个目标的备库状态和每日报告，并分析结果。机群模式下出错只影响该目标。"""
+        label = settings.name if result.fleet else None
+        prefix = f"[{label}] " if label else ""
+        target_name = settings.name or None
+        check_standby_timeout = self.config_manager.settings().check_standby_timeout
+        daily_report_timeout = self.config_manager.settings().daily_report_timeout
+        start = time.monotonic()
+
+        try:
+            self.log_message(f"{prefix}查询备库状态 ({settings.standby.dsn})...")
+            # 只查询上次应用水位线之后的归档日志
+            watermarks = self.get_archive_tracker().watermarks(target_name or DEFAULT_TARGET)
+            check = backend.check_standby(settings.standby, watermarks, check_standby_timeout)
+            check_standby_output = check.format()
+            self._on_output(label, 'stdout', check_standby_output.splitlines())
+
+            report = None
+            if result.include_daily_report and not self.cancel_event.is_set():
+                self.log_message(f"{prefix}查询每日报告...")
+                report = backend.daily_report(settings, daily_report_timeout)
+                self._on_output(label, 'stdout', format_daily_report(report).splitlines())
+                # HTML报告附件和删除已应用的归档日志仍由脚本完成
+                if settings.daily_report_bat and not self.cancel_event.is_set():
+                    self.log_message(f"{prefix}开始执行 {os.path.basename(settings.daily_report_bat)}...")
+                    self.run_batch_file(settings.daily_report_bat, label, daily_report_timeout)
+            self.log_message(f"{prefix}数据库查询完成")
+
+        except Exception as e:
+            if not result.fleet:
+                raise
+            self.log_message(f"{prefix}查询数据库时出错: {e}")
+            logger.error(f"{prefix}查询数据库时出错: {e}", exc_info=True)
+            analysis = TargetAnalysis(settings.name, include_report=result.include_daily_report,
+                                      script_status=STATUS_ERROR, script_error=str(e))
+            analysis.elapsed = time.monotonic() - start
+            return analysis
+
+        analysis = self.analyze(
+            check_standby_output,
+            report_path=settings.report_path or settings.label,
+            target_name=target_name,
+            include_report=result.include_daily_report,
+            archived_logs=check.archived_logs,
+            report=report
+        )
+        analysis.elapsed = time.monotonic() - start
+        return analysis
+
+    def run_batch_file(self, batch_file: str, label: Optional[str] = None, timeout: Optional[int] = None,
+                       args: Optional[List[str]] = None) -> str:
+        """运行单个批处理文件，超时或取消时返回已读取的输出。"""
+        # 并行执行时为每行输出加上来源标签，便于在日志中区分
+        prefix = f"[{label}] " if label else ""
+        script_name = os.path.basename(batch_file)
+        with log_context(script=script_name):
+            try:
+                # 两个管道同时读取，输出经回调交给前端；超时或取消时结束整个进程树
+                max_output_size = self.config_manager.settings().max_output_size
+                return run_script(
+                    batch_file,
+                    timeout=timeout,
+                    output_callback=lambda source, lines: self._on_output(label, source, lines),
+                    max_output_size=max_output_size,
+                    cancel_event=self.cancel_event,
+                    args=args
+                )
+
+            except subprocess.TimeoutExpired as e:
+                reason = f"超过{e.timeout:.0f}秒未完成，已结束进程"
+                self.log_message(f"{prefix}{script_name} {reason}")
+                self.cycle_interruptions.append((script_name, "⏱ 超时", reason))
+                return e.output or ""
+
+            except ScriptCancelled as e:
+                self.log_message(f"{prefix}{script_name} 已取消")
+                self.cycle_interruptions.append((script_name, "⛔ 已取消", "用户取消"))
+                return e.output
+
+            except Exception as e:
+                error_msg = f"{prefix}运行批处理文件时出错: {str(e)}"
+                self.log_message(error_msg)
+                logger.error(error_msg, exc_info=True)
+                return error_msg
+
+    # ---------- 分析 ----------
+
+    def create_matcher(self) -> IssueMatcher:
+        # 所有模式在读取配置时预编译为一个匹配器，一次扫描完成检查；配置不变时每轮复用
+        return self.config_manager.settings().matcher
+
+    def analyze(self, check_standby_output: str, report_path: Optional[str] = None,
+                target_name: Optional[str] = None, include_report: bool = True,
+                archived_logs: Optional[List[ArchivedLog]] = None,
+                report: Optional[DailyReport] = None) -> TargetAnalysis:
+        """分析一个目标的脚本输出和HTML报告，并保存指标。
+
+        Args:
+            check_standby_output: check_standby 脚本输出
+            report_path: HTML报告路径，默认为 [Paths] 中的 report_path
+            target_name: 机群模式下的目标名称
+            include_report: 是否分析HTML报告
+            archived_logs: oracledb 后端查询到的归档日志，默认从 check_standby 输出中解析
+            report: oracledb 后端查询到的每日报告，默认解析 report_path 中的HTML报告
+
+        Returns:
+            TargetAnalysis: 分析结果
+        """
+        if report_path is None:
+            report_path = self.config_manager.get('Paths', 'report_path')
+        analysis = TargetAnalysis(target_name or DEFAULT_TARGET, include_report=include_report, report_path=report_path)
+
+        # 更新归档日志水位线（无论是否启用错误检查，下一轮都只查询增量）
+        if archived_logs is None:
+            archived_logs = parse_archived_logs(check_standby_output)
+        analysis.archive_status = self.track_archive_logs(check_standby_output, target_name, archived_logs)
+        # 增量查询没有新日志时，显示水位线记录中保存的最近几行
+        analysis.recent_logs = (self.get_archive_tracker().recent_logs(target_name or DEFAULT_TARGET)
+                                or archived_logs)[-RECENT_LOGS:]
+        if report is not None:
+            analysis.report_found = include_report
+        else:
+            analysis.report_found = include_report and os.path.exists(report_path)
+
+        # 检查是否启用错误检查
+        if not self.config_manager.settings().check_errors:
+            analysis.check_errors = False
+            # 指标照常记录
+            if report is None and analysis.report_found:
+                try:
+                    report = parse_report_file(report_path)
+                except Exception as e:
+                    logger.error(f"解析HTML报告时出错: {e}")
+            self.record_metrics(report, analysis.archive_status, target_name)
+            self.observe_baselines(report, analysis.archive_status, target_name)
+            return analysis
+
+        matcher = self.create_matcher()
+        analysis.standby_issues = matcher.find_issues(check_standby_output)
+
+        if report is not None:
+            # 查询结果已是结构化记录，按报告内容排成的文本检查错误模式
+            if analysis.report_found:
+                analysis.html_issues = matcher.find_issues(format_daily_report(report))
+                analysis.status_checks = self.check_database_status(report)
+        elif analysis.report_found:
+            try:
+                # 报告文件自上一轮以来没有变化（例如 daily_report 没有重新生成）时不再读取
+                stat = os.stat(report_path)
+                cache_key = (stat.st_size, stat.st_mtime_ns, tuple(matcher.patterns), matcher.ignore_case, matcher.whole_word)
+                cached = self._report_cache.get(report_path)
+                if cached is not None and cached[0] == cache_key:
+                    self.log_message(f"HTML报告自上一轮以来没有变化，沿用上一轮的解析结果: {report_path}")
+                    report, analysis.html_issues = cached[1], list(cached[2])
+                    analysis.report_reused = True
+                else:
+                    # 一次流式读取报告：边解析结构化记录边检查错误模式
+                    parser = ReportParser()
+                    with open(report_path, 'r', encoding='utf-8', errors='replace') as f:
+                        analysis.html_issues = [issue.format() for issue in matcher.iter_issues(parser.feed_blocks(read_line_blocks(f)))]
+                    report = parser.result()
+                    self._report_cache[report_path] = (cache_key, report, list(analysis.html_issues))
+
+                # 检查特定的数据库状态
+                analysis.status_checks = self.check_database_status(report)
+
+            except Exception as e:
+                analysis.report_error = str(e)
+
+        # 与上一轮的报告快照比较
+        if report is not None and analysis.report_found:
+            analysis.report_diff = self.compare_report(report, analysis.archive_status, target_name)
+
+        # 保存本轮指标，并与历史基线比较；沿用上一轮的报告只记录归档日志指标，
+        # 否则同一份报告的指标会被重复计入时间序列和基线
+        metrics_report = None if analysis.report_reused else report
+        self.record_metrics(metrics_report, analysis.archive_status, target_name)
+        analysis.baseline_checks = [StatusCheck("基线偏离检查", "🟡 警告", f"({deviation.format()})", True)
+                                    for deviation in self.observe_baselines(metrics_report, analysis.archive_status, target_name)]
+        return analysis
+
+    def check_database_status(self, report: DailyReport) -> List[StatusCheck]:
+        """根据解析后的报告记录检查数据库状态"""
+        checks = []
+
+        # 检查数据库角色
+        if report.has_role("PRIMARY") and report.has_role("PHYSICAL STANDBY"):
+            checks.append(StatusCheck("数据库角色检查", "✅ 正常", "(主库和备库都存在)"))
+        else:
+            checks.append(StatusCheck("数据库角色检查", "❌ 异常", "(可能缺少主库或备库)", True))
+
+        # 检查归档日志间隙
+        if report.gaps == 0:
+            checks.append(StatusCheck("归档日志间隙检查", "✅ 正常", "(无间隙)"))
+        elif report.gaps is not None:
+            checks.append(StatusCheck("归档日志间隙检查", "❌ 异常", f"(存在{report.gaps}个间隙)", True))
+
+        # 检查未应用的日志
+        if report.not_applied == 0:
+            checks.append(StatusCheck("未应用日志检查", "✅ 正常", "(无未应用日志)"))
+        elif report.not_applied is not None:
+            checks.append(StatusCheck("未应用日志检查", "❌ 异常", f"(存在{report.not_applied}个未应用日志)", True))
+
+        # 检查表空间使用情况
+        danger = [ts for ts in report.tablespaces if ts.status == "DANGER" or (ts.used_pct or 0) > 90]
+        warning = [ts for ts in report.tablespaces
+                   if ts not in danger and (ts.status == "WARNING" or (ts.used_pct or 0) > 80)]
+        if danger:
+            names = ", ".join(f"{ts.name} {ts.used_pct:.1f}%" for ts in danger if ts.used_pct is not None)
+            checks.append(StatusCheck("表空间使用检查", "🔴 危险", f"(使用率超过90%: {names})", True))
+        elif warning:
+            names = ", ".join(f"{ts.name} {ts.used_pct:.1f}%" for ts in warning if ts.used_pct is not None)
+            checks.append(StatusCheck("表空间使用检查", "🟡 警告", f"(使用率超过80%: {names})"))
+        elif report.tablespaces:
+            checks.append(StatusCheck("表空间使用检查", "✅ 正常"))
+
+        # 检查RMAN备份
+        failed_jobs = [job for job in report.rman_jobs if "FAILED" in job.status]
+        if report.no_backup_found:
+            checks.append(StatusCheck("备份检查", "❌ 异常", "(最近3天没有备份记录)", True))
+        elif failed_jobs:
+            checks.append(StatusCheck("备份检查", "❌ 异常", f"(最近3天有{len(failed_jobs)}个备份任务失败)", True))
+        elif report.rman_jobs:
+            checks.append(StatusCheck("备份检查", "✅ 正常", f"(最近3天{len(report.rman_jobs)}个备份任务)"))
+
+        # 检查无效对象
+        if report.invalid_objects:
+            details = ", ".join(f"{owner}: {count}" for owner, count in report.invalid_objects.items())
+            checks.append(StatusCheck("无效对象检查", "🟡 警告", f"({details})"))
+
+        # 服务器运行时间分析（每个实例）
+        for instance in report.instances:
+            # 主库和备库的实例名通常相同（如都是 OPERA），加上所属数据库以区分，告警指纹也因此不同
+            instance_name = instance.instance_name or instance.database_name
+            label = "/".join(filter(None, (instance.database, instance_name)))
+            name = f"服务器运行时间分析 ({label})"
+            uptime_days = instance.uptime_days(datetime.datetime.now())
+            if uptime_days is None:
+                checks.append(StatusCheck(name, "❓ 无法解析"))
+            elif uptime_days > 90:
+                checks.append(StatusCheck(name, "🔴 警告", f"(已运行{uptime_days}天，建议重启)"))
+            elif uptime_days > 60:
+                checks.append(StatusCheck(name, "🟡 注意", f"(已运行{uptime_days}天)"))
+            else:
+                checks.append(StatusCheck(name, "✅ 正常", f"(已运行{uptime_days}天)"))
+
+        return checks
+
+    # ---------- 状态存储 ----------
+
+    def get_metrics_store(self) -> Optional[MetricsStore]:
+        """打开（或在路径变化后重新打开）指标数据库"""
+        # 旧配置文件中没有此项时使用默认路径；设置为空表示不记录指标
+        db_path = self.config_manager.get('Paths', 'metrics_db',
+                                          fallback=os.path.join(self.config_manager.get_app_dir(), 'logs', 'opera_metrics.db'))
+        if not db_path:
+            return None
+        if self.metrics_store is None or self.metrics_store.db_path != db_path:
+            if self.metrics_store is not None:
+                self.metrics_store.close()
+            db_dir = os.path.dirname(db_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+            self.metrics_store = MetricsStore(db_path)
+        self.metrics_store.retention_days = self.config_manager.settings().metrics_retention_days
+        return self.metrics_store
+
+    def get_archive_tracker(self) -> ArchiveLogTracker:
+        """打开（或在路径变化后重新打开）归档日志水位线"""
+        state_path = self.config_manager.get('Paths', 'archive_state',
+                                             fallback=os.path.join(self.config_manager.get_app_dir(), 'logs', 'archive_watermark.json'))
+        if self.archive_tracker is None or self.archive_tracker.state_path != state_path:
+            self.archive_tracker = ArchiveLogTracker(state_path)
+        return self.archive_tracker
+
+    def track_archive_logs(self, check_standby_output: str, target_name: Optional[str] = None,
+                           logs: Optional[List[ArchivedLog]] = None) -> List[ThreadStatus]:
+        """用本轮查询到的归档日志增量更新水位线，返回每个线程的状态"""
+        try:
+            if logs is None:
+                logs = parse_archived_logs(check_standby_output)
+            return self.get_archive_tracker().update(target_name or DEFAULT_TARGET, logs,
+                                                     parse_resetlogs(check_standby_output))
+        except Exception as e:
+            logger.error(f"更新归档日志水位线时出错: {e}", exc_info=True)
+            return []
+
+    def get_baseline_tracker(self) -> BaselineTracker:
+        """打开（或在路径变化后重新打开）指标基线，并应用当前的基线设置"""
+        state_path = self.config_manager.get('Paths', 'baseline_state',
+                                             fallback=os.path.join(self.config_manager.get_app_dir(), 'logs', 'metric_baselines.json'))
+        if self.baseline_tracker is None or self.baseline_tracker.state_path != state_path:
+            self.baseline_tracker = BaselineTracker(state_path)
+        settings = self.config_manager.settings()
+        self.baseline_tracker.alpha = settings.baseline_alpha
+        self.baseline_tracker.sigma = settings.baseline_sigma
+        self.baseline_tracker.warmup = settings.baseline_warmup
+        return self.baseline_tracker
+
+    def observe_baselines(self, report: Optional[DailyReport], archive_status: List[ThreadStatus],
+                          target_name: Optional[str] = None) -> List[Deviation]:
+        """用本轮指标更新滚动基线，返回明显偏离基线的指标，出错时只记录日志"""
+        try:
+            return self.get_baseline_tracker().observe(target_name or DEFAULT_TARGET,
+                                                       extract_metrics(report, archive_status))
+        except Exception as e:
+            logger.error(f"更新指标基线时出错: {e}", exc_info=True)
+            return []
+
+    def get_snapshot_store(self) -> SnapshotStore:
+        """打开（或在路径变化后重新打开）报告快照"""
+        state_path = self.config_manager.get('Paths', 'report_snapshots',
+                                             fallback=os.path.join(self.config_manager.get_app_dir(), 'logs', 'report_snapshots.json'))
+        if self.snapshot_store is None or self.snapshot_store.state_path != state_path:
+            self.snapshot_store = SnapshotStore(state_path)
+        return self.snapshot_store
+
+    def compare_report(self, report: DailyReport, archive_status: List[ThreadStatus],
+                       target_name: Optional[str] = None) -> Optional[ReportDiff]:
+        """保存本轮的报告快照并返回与上一轮的差异，没有上一轮或出错时返回 None"""
+        try:
+            return self.get_snapshot_store().compare(target_name or DEFAULT_TARGET, take_snapshot(report, archive_status))
+        except Exception as e:
+            logger.error(f"比较报告快照时出错: {e}", exc_info=True)
+            return None
+
+    def get_oracle_backend(self) -> OracleBackend:
+        """创建（或在驱动和会话池设置变化后重新创建）oracledb 后端，会话池在多轮检查之间保留"""
+        driver = self.config_manager.get(DATABASE_SECTION, 'driver', fallback='oracledb')
+        pool_min = self.config_manager.getint(DATABASE_SECTION, 'pool_min', fallback=DEFAULT_POOL_MIN)
+        pool_max = self.config_manager.getint(DATABASE_SECTION, 'pool_max', fallback=DEFAULT_POOL_MAX)
+        key = (driver, pool_min, pool_max)
+        if self.oracle_backend is None or self._oracle_backend_key != key:
+            if self.oracle_backend is not None:
+                self.oracle_backend.close()
+            self.oracle_backend = OracleBackend(load_driver(driver), pool_min, pool_max)
+            self._oracle_backend_key = key
+        return self.oracle_backend
+
+    def record_metrics(self, report: Optional[DailyReport], archive_status: List[ThreadStatus],
+                       target_name: Optional[str] = None) -> None:
+        """把本轮监控的指标写入时间序列存储，出错时只记录日志"""
+        try:
+            store = self.get_metrics_store()
+            if store is None:
+                return
+            count = store.record(target_name or DEFAULT_TARGET, extract_metrics(report, archive_status))
+            store.prune()
+            logger.info(f"已保存{count}个监控指标: {target_name or DEFAULT_TARGET}")
+        except Exception as e:
+            logger.error(f"保存监控指标时出错: {e}", exc_info=True)
+
+    # ---------- 计划 ----------
+
+    def create_scheduler(self, run_cycle: Callable[[bool], None], run_immediately: bool = True) -> Scheduler:
+        """根据设置创建计划：完整检查（两个脚本）和可选的单独备库检查
+
+        Args:
+            run_cycle: 到期时调用，参数为是否运行 daily_report
+            run_immediately: 未设置完整检查计划（按固定间隔运行）时，是否启动后立即运行一次
+
+        Raises:
+            ValueError: 计划设置无效
+        """
+        settings = self.config_manager.settings()
+        scheduler = Scheduler(
+            run_missed=settings.run_missed_schedules,
+            log_callback=self.log_message
+        )
+
+        report_schedule = parse_schedule(self.config_manager.get('Settings', 'daily_report_schedule', fallback=''))
+        if report_schedule is None:
+            # 未设置计划时按固定间隔运行
+            interval = settings.auto_run_interval
+            scheduler.add_job("完整检查", IntervalSchedule(interval), lambda: run_cycle(True),
+                              supersedes=("备库检查",), run_immediately=run_immediately)
+        else:
+            scheduler.add_job("完整检查", report_schedule, lambda: run_cycle(True), supersedes=("备库检查",))
+
+        standby_schedule = parse_schedule(self.config_manager.get('Settings', 'standby_check_schedule', fallback=''))
+        if standby_schedule is not None:
+            scheduler.add_job("备库检查", standby_schedule, lambda: run_cycle(False))
+        return scheduler
+
+    # ---------- 邮件 ----------
+
+    def report_files(self) -> List[Tuple[str, str]]:
+        """需要附加到邮件的HTML报告 (路径, 附件名)，机群模式下为每个目标的报告。
+
+        使用 oracledb 后端时报告内容已在分析结果中，只附加仍由脚本生成（run_report_script）的HTML报告。
+
+        Raises:
+            EmailReportError: 没有找到报告文件
+        """
+        if self.uses_oracledb():
+            if self.config_manager.is_fleet_mode():
+                targets = load_database_targets(self.config_manager.config)
+            else:
+                targets = [load_database_settings(self.config_manager.config)]
+            return [(target.report_path, f"{target.name}_{os.path.basename(target.report_path)}"
+                     if target.name else os.path.basename(target.report_path))
+                    for target in targets
+                    if target.daily_report_bat and target.report_path and os.path.exists(target.report_path)]
+
+        if self.config_manager.is_fleet_mode():
+            report_files = [(target.report_path, f"{target.name}_{os.path.basename(target.report_path)}")
+                            for target in self.config_manager.get_targets()
+                            if os.path.exists(target.report_path)]
+            if not report_files:
+                raise EmailReportError("文件错误", "没有找到任何监控目标的HTML报告文件")
+            return report_files
+
+        report_path = self.config_manager.get('Paths', 'report_path')
+        if not os.path.exists(report_path):
+            raise EmailReportError("文件错误", f"HTML报告文件不存在: {report_path}")
+        return [(report_path, os.path.basename(report_path))]
+
+    def send_email_report(self, analysis_text: str, log_content: str,
+                          changes: Optional[AlertChanges] = None) -> None:
+        """发送监控报告邮件，附带HTML报告和执行日志。
+
+        Args:
+            analysis_text: 分析结果文本
+            log_content: 执行日志
+            changes: 自动发送时的问题变化，显示在正文最前面；只是定期摘要时不带附件
+
+        Raises:
+            EmailReportError: 邮件设置不完整或报告文件不存在
+            Exception: 连接或发送失败
+        """
+        # 获取邮件设置
+        smtp_server = self.config_manager.get('Email', 'smtp_server')
+        smtp_port = self.config_manager.getint('Email', 'smtp_port')
+        sender_email = self.config_manager.get('Email', 'sender_email')
+        sender_password = self.config_manager.get('Email', 'sender_password')
+        recipient_emails_str = self.config_manager.get('Email', 'recipient_emails')
+        use_tls = self.config_manager.getboolean('Email', 'use_tls')
+
+        # 检查必要的设置
+        if not smtp_server or not sender_email or not recipient_emails_str:
+            raise EmailReportError("邮件设置错误", "请先完成邮件设置")
+
+        # 解析收件人列表
+        recipient_emails = [email.strip() for email in recipient_emails_str.split(',')]
+        summary = changes.format() if changes is not None else ''
+        with_attachments = changes is None or changes.has_changes
+        report_files = self.report_files() if with_attachments else []
+
+        # 创建邮件：HTML报告在发送时按块编码写入数据流，不整体读入内存
+        msg = StreamingMessage()
+        msg['From'] = sender_email
+        msg['To'] = ", ".join(recipient_emails)
+        tag = f" [{changes.title()}]" if changes is not None else ""
+        msg['Subject'] = f"Opera数据库监控报告{tag} - {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"
+
+        # 添加纯文本和HTML格式的邮件正文
+        body = email_intro(with_attachments) + "\n\n"
+        if summary:
+            body += "问题变化:\n" + summary + "\n"
+        body += "分析结果:\n" + analysis_text
+        msg.attach_text(body, 'plain')
+        msg.attach_text(format_email_html(analysis_text, summary, with_attachments), 'html')
+
+        # 添加HTML报告附件
+        for report_path, filename in report_files:
+            msg.attach_file(report_path, filename, subtype='html')
+
+        # 添加日志附件
+        if with_attachments:
+            msg.attach_text(log_content, 'plain', filename='execution_log.txt')
+
+        # 连接到SMTP服务器并发送邮件
+        with smtplib.SMTP(smtp_server, smtp_port) as server:
+            if use_tls:
+                server.starttls()
+            if sender_password:  # 只有在提供密码时才尝试登录
+                server.login(sender_email, sender_password)
+            msg.send(server)
+        self.log_message("邮件已成功发送")
+
+    def get_alert_tracker(self) -> AlertTracker:
+        """打开（或在路径变化后重新打开）告警状态"""
+        state_path = self.config_manager.get('Paths', 'alert_state',
+                                             fallback=os.path.join(self.config_manager.get_app_dir(), 'logs', 'alert_state.json'))
+        if self.alert_tracker is None or self.alert_tracker.state_path != state_path:
+            self.alert_tracker = AlertTracker(state_path)
+        self.alert_tracker.digest_interval = self.config_manager.settings().alert_digest_hours * 3600
+        return self.alert_tracker
+
+    def send_cycle_report(self, result: CycleResult, log_content: str) -> bool:
+        """自动发送一轮的报告：只在出现新问题、问题升级或恢复时发送，持续的问题合并到定期摘要中。
+
+        [Settings] alert_dedup = False 时每轮都发送完整报告。
+
+        Returns:
+            bool: 是否发送了邮件
+
+        Raises:
+            EmailReportError: 邮件设置不完整或报告文件不存在
+            Exception: 连接或发送失败
+        """
+        analysis_text = result.format()
+        if not self.config_manager.settings().alert_dedup:
+            self.send_email_report(analysis_text, log_content)
+            return True
+
+        tracker = self.get_alert_tracker()
+        changes = tracker.update(result.alerts(), result.checked_targets())
+        if not changes.should_notify:
+            self.log_message(f"没有新出现、升级或恢复的问题，本轮不发送邮件（{len(changes.ongoing)}个持续存在的问题将在定期摘要中汇总）")
+            return False
+        # 发送失败时不清除变化，下一轮仍会通知
+        self.send_email_report(analysis_text, log_content, changes)
+        tracker.mark_sent()
+        return True
+
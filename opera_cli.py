@@ -0,0 +1,190 @@
+"""Opera数据库监控工具的命令行入口，不需要图形界面。
+
+用法:
+    python opera_cli.py run                 运行一轮完整检查，输出分析结果
+    python opera_cli.py run --standby-only  只运行备库检查
+    python opera_cli.py run --json          以JSON格式输出结果
+    python opera_cli.py daemon              按配置中的计划持续运行，每轮输出一行JSON
+    python opera_cli.py logs --cycle ID     查找一轮监控的日志（包括已轮转和压缩的日志）
+
+退出码:
+    0 所有检查正常，1 发现异常，2 运行出错，3 部分脚本超时，4 已取消
+"""
+import sys
+import json
+import datetime
+import signal
+import logging
+import argparse
+import threading
+
+from config_manager import ConfigManager
+from monitor_engine import MonitorEngine, EXIT_OK, EXIT_ERROR, CYCLE_OK, CYCLE_TIMEOUT
+from log_pipeline import setup_logging, configure_logging, search_logs
+
+logger = logging.getLogger("OperaMonitor")
+
+
+def setup_cli_logging(verbose: bool = False) -> None:
+    """日志写入文件，同时输出到标准错误（标准输出留给监控结果）。"""
+    stderr_handler = logging.StreamHandler(sys.stderr)
+    stderr_handler.setLevel(logging.INFO if verbose else logging.WARNING)
+    setup_logging(stderr_handler)
+
+
+def print_stderr(label, source, lines):
+    """脚本输出写到标准错误，不混入标准输出中的结果。"""
+    prefix = f"[{label}] " if label else ""
+    if source == 'stderr':
+        prefix += "错误输出: "
+    sys.stderr.write("".join(f"{prefix}{line}\n" for line in lines))
+    sys.stderr.flush()
+    logger.debug("\n".join(lines))
+
+
+def create_engine(args) -> MonitorEngine:
+    config_manager = ConfigManager(args.config)
+    configure_logging(config_manager.get_log_options())
+    output_callback = print_stderr if args.verbose else (lambda label, source, lines: logger.debug("\n".join(lines)))
+    return MonitorEngine(config_manager, log_callback=logger.info, output_callback=output_callback)
+
+
+def emit_result(result, as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(result.to_dict(), ensure_ascii=False), flush=True)
+    else:
+        print(result.format(), flush=True)
+
+
+def send_email(engine: MonitorEngine, result, only_changes: bool = False) -> bool:
+    """发送本轮的邮件报告，失败时只记录日志。
+
+    only_changes 为 True 时（自动发送）只在问题有变化或到了摘要时间时发送。
+    """
+    try:
+        if only_changes:
+            engine.send_cycle_report(result, "")
+        else:
+            engine.send_email_report(result.format(), "")
+        return True
+    except Exception as e:
+        logger.error(f"发送邮件时出错: {str(e)}")
+        return False
+
+
+def command_run(args) -> int:
+    engine = create_engine(args)
+
+    # Ctrl+C 或 SIGTERM 时结束正在运行的脚本，本轮以“已取消”返回
+    def handle_signal(signum, frame):
+        logger.warning("收到终止信号，正在取消监控...")
+        engine.cancel()
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    result = engine.run_cycle(include_daily_report=not args.standby_only)
+    emit_result(result, args.json)
+
+    # --email 总是发送完整报告；auto_send_email 只通知问题的变化
+    auto_send = not args.standby_only and engine.config_manager.settings().auto_send_email
+    if (args.email or auto_send) and result.status in (CYCLE_OK, CYCLE_TIMEOUT):
+        if not send_email(engine, result, only_changes=not args.email) and args.email:
+            return EXIT_ERROR
+    return result.exit_code
+
+
+def command_daemon(args) -> int:
+    engine = create_engine(args)
+    stopped = threading.Event()
+    cycle_lock = threading.Lock()
+
+    def run_cycle(include_daily_report):
+        # 计划线程中串行运行，不会出现重叠的两轮
+        with cycle_lock:
+            if stopped.is_set():
+                return
+            result = engine.run_cycle(include_daily_report)
+            emit_result(result, args.json)
+            if (include_daily_report and result.status in (CYCLE_OK, CYCLE_TIMEOUT)
+                    and engine.config_manager.settings().auto_send_email):
+                send_email(engine, result, only_changes=True)
+
+    try:
+        scheduler = engine.create_scheduler(run_cycle, run_immediately=True)
+    except ValueError as e:
+        logger.error(f"计划设置无效: {str(e)}")
+        return EXIT_ERROR
+
+    def handle_signal(signum, frame):
+        logger.warning("收到终止信号，正在停止自动监控...")
+        stopped.set()
+        engine.cancel()
+        scheduler.stop()
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    logger.info("自动监控已启动")
+    scheduler.start()
+    # 主线程等待信号；Event.wait 带超时以便在Windows上也能及时响应Ctrl+C
+    while not stopped.wait(1):
+        pass
+    scheduler.stop(timeout=30)
+    logger.info("自动监控已停止")
+    return EXIT_OK
+
+
+def parse_time(value: str) -> datetime.datetime:
+    for time_format in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value, time_format)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"无效的时间: {value}（格式: YYYY-MM-DD [HH:MM[:SS]]）")
+
+
+def command_logs(args) -> int:
+    config_manager = ConfigManager(args.config)
+    options = config_manager.get_log_options()
+    configure_logging(options)
+    for record in search_logs(options.log_file, since=args.since, until=args.until,
+                              cycle_id=args.cycle, target=args.target, text=args.grep):
+        # JSON格式的记录原样输出一行JSON，文本格式的记录输出原来的行
+        print(json.dumps(record, ensure_ascii=False) if 'level' in record else record['message'])
+    return EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Opera数据库监控工具（命令行）")
+    parser.add_argument('--config', default="opera_monitor.ini", help="配置文件路径（默认: 程序目录下的 opera_monitor.ini）")
+    parser.add_argument('-v', '--verbose', action='store_true', help="在标准错误中显示日志和脚本输出")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser('run', help="运行一轮监控并输出结果")
+    run_parser.add_argument('--standby-only', action='store_true', help="只运行备库检查（不运行 daily_report）")
+    run_parser.add_argument('--json', action='store_true', help="以JSON格式输出结果")
+    run_parser.add_argument('--email', action='store_true', help="运行后发送邮件报告")
+    run_parser.set_defaults(func=command_run)
+
+    daemon_parser = subparsers.add_parser('daemon', help="按配置中的计划持续运行")
+    daemon_parser.add_argument('--json', action='store_true', help="每轮输出一行JSON（默认输出分析文本）")
+    daemon_parser.set_defaults(func=command_daemon)
+
+    logs_parser = subparsers.add_parser('logs', help="查找日志（按轮次和目标查找需要 log_format = json）")
+    logs_parser.add_argument('--cycle', help="监控轮次编号（见 run --json 输出中的 cycle_id）")
+    logs_parser.add_argument('--target', help="监控目标名称")
+    logs_parser.add_argument('--grep', help="消息中包含的文字")
+    logs_parser.add_argument('--since', type=parse_time, help="开始时间，如 2026-10-17 06:00")
+    logs_parser.add_argument('--until', type=parse_time, help="结束时间")
+    logs_parser.set_defaults(func=command_logs)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    setup_cli_logging(args.verbose)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,121 +2,36 @@ import os
 import sys
 import subprocess
 import smtplib
-import re
-import time
 import logging
 import datetime
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
 import tkinter as tk
 from tkinter import scrolledtext, messagebox, simpledialog, filedialog
 from tkinter import ttk
 import threading
-import configparser
+from config_manager import ConfigManager
+from monitor_engine import MonitorEngine, EmailReportError, CYCLE_OK, CYCLE_TIMEOUT, CYCLE_CANCELLED, CYCLE_ERROR
+from scheduler import parse_schedule
+from metrics_store import DEFAULT_TARGET, METRIC_LABELS, METRIC_TABLESPACE_USED_PCT
+from log_buffer import LogBuffer
+from log_view import LogView
+from ui_events import UIEventQueue, StatusChanged, MonitorStateChanged, AnalysisReplaced, ShowMessage
+from log_pipeline import setup_logging, configure_logging
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("opera_monitor.log", encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger("OperaMonitor")
 
-class ConfigManager:
-    def get_app_dir(self):
-        """获取应用程序根目录"""
-        if getattr(sys, 'frozen', False):
-            # 如果是打包后的可执行文件
-            return os.path.dirname(sys.executable)
-        else:
-            # 如果是开发环境
-            return os.path.dirname(os.path.abspath(__file__))
-            
-    def __init__(self, config_file="opera_monitor.ini"):
-        # 如果配置文件路径不是绝对路径，则使用应用程序目录
-        if not os.path.isabs(config_file):
-            app_dir = self.get_app_dir()
-            self.config_file = os.path.join(app_dir, config_file)
-        else:
-            self.config_file = config_file
-        self.config = configparser.ConfigParser()
-        self.load_config()
-    
-    def load_config(self):
-        # 获取应用程序根目录
-        app_dir = self.get_app_dir()
-            
-        # 默认配置
-        default_config = {
-            'Email': {
-                'smtp_server': 'smtp.example.com',
-                'smtp_port': '587',
-                'sender_email': 'your_email@example.com',
-                'sender_password': '',
-                'recipient_emails': 'recipient1@example.com,recipient2@example.com',
-                'use_tls': 'True'
-            },
-            'Paths': {
-                'check_standby_bat': os.path.join(app_dir, 'check_standby.bat'),
-                'daily_report_bat': os.path.join(app_dir, 'daily_report.bat'),
-                'report_path': os.path.join(app_dir, 'logs', 'daily_report.html')
-            },
-            'Settings': {
-                'auto_run_interval': '86400',  # 24小时，单位：秒
-                'check_errors': 'True',
-                'error_patterns': 'error,warning,danger,failed,ORA-,TNS-',
-            }
-        }
-        
-        # 检查配置文件是否存在
-        if os.path.exists(self.config_file):
-            try:
-                self.config.read(self.config_file, encoding='utf-8')
-                logger.info(f"配置文件已加载: {self.config_file}")
-            except Exception as e:
-                logger.error(f"加载配置文件时出错: {e}")
-                self.create_default_config(default_config)
-        else:
-            logger.info(f"配置文件不存在，创建默认配置: {self.config_file}")
-            self.create_default_config(default_config)
-    
-    def create_default_config(self, default_config):
-        for section, options in default_config.items():
-            if not self.config.has_section(section):
-                self.config.add_section(section)
-            for option, value in options.items():
-                if not self.config.has_option(section, option):
-                    self.config.set(section, option, value)
-        
-        # 确保logs目录存在
-        app_dir = self.get_app_dir()
-        logs_dir = os.path.join(app_dir, 'logs')
-        if not os.path.exists(logs_dir):
-            os.makedirs(logs_dir)
-            
-        # 保存配置
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            self.config.write(f)
-    
-    def get(self, section, option, fallback=None):
-        return self.config.get(section, option, fallback=fallback)
-    
-    def getboolean(self, section, option, fallback=None):
-        return self.config.getboolean(section, option, fallback=fallback)
-    
-    def getint(self, section, option, fallback=None):
-        return self.config.getint(section, option, fallback=fallback)
-    
-    def set(self, section, option, value):
-        if not self.config.has_section(section):
-            self.config.add_section(section)
-        self.config.set(section, option, value)
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            self.config.write(f)
+# 界面处理工作线程事件和刷新日志的间隔（毫秒），以及每次最多处理的事件数
+OUTPUT_POLL_INTERVAL = 100
+UI_MAX_EVENTS_PER_FRAME = 200
+
+# 每轮监控结束后状态栏显示的文字
+CYCLE_STATUS_TEXT = {
+    CYCLE_OK: "监控完成",
+    CYCLE_TIMEOUT: "监控超时",
+    CYCLE_CANCELLED: "监控已取消",
+    CYCLE_ERROR: "监控出错",
+}
 
 class OperaMonitor:
     def __init__(self, root):
@@ -127,13 +42,31 @@ class OperaMonitor:
         
         # 加载配置
         self.config_manager = ConfigManager()
+        configure_logging(self.config_manager.get_log_options())
+        
+        # 监控引擎：运行脚本和分析结果，日志和输出经队列交给界面线程
+        self.engine = MonitorEngine(self.config_manager, log_callback=self.log_message,
+                                    output_callback=self.queue_output)
+        
+        # 日志和脚本输出由工作线程写入缓冲区，界面线程定时只刷新可见的部分
+        self.log_buffer = LogBuffer(self.config_manager.settings().log_max_lines)
+        
+        # 工作线程不直接操作界面组件，而是发送事件由界面线程处理
+        self.ui_events = UIEventQueue()
+        self._ui_handlers = {
+            StatusChanged: lambda event: self.status_var.set(event.text),
+            MonitorStateChanged: self._apply_monitor_state,
+            AnalysisReplaced: self._replace_analysis,
+            ShowMessage: self._show_message,
+        }
         
         # 创建UI组件
         self.create_widgets()
+        self.root.after(OUTPUT_POLL_INTERVAL, self._poll_ui_events)
         
         # 初始化变量
         self.is_running = False
-        self.auto_run_thread = None
+        self.scheduler = None
         self.auto_run_active = False
         
         # 检查路径是否存在
@@ -190,6 +123,9 @@ class OperaMonitor:
         self.run_button = ttk.Button(button_frame, text="运行监控", command=self.run_monitor)
         self.run_button.pack(side=tk.LEFT, padx=5)
         
+        self.cancel_button = ttk.Button(button_frame, text="取消监控", command=self.cancel_monitor, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        
         self.auto_run_button = ttk.Button(button_frame, text="启动自动监控", command=self.toggle_auto_run)
         self.auto_run_button.pack(side=tk.LEFT, padx=5)
         
@@ -199,6 +135,9 @@ class OperaMonitor:
         self.view_report_button = ttk.Button(button_frame, text="查看HTML报告", command=self.view_html_report)
         self.view_report_button.pack(side=tk.LEFT, padx=5)
         
+        self.trend_button = ttk.Button(button_frame, text="指标趋势", command=self.open_trend_view)
+        self.trend_button.pack(side=tk.LEFT, padx=5)
+        
         self.clear_button = ttk.Button(button_frame, text="清除日志", command=self.clear_log)
         self.clear_button.pack(side=tk.LEFT, padx=5)
         
@@ -216,9 +155,9 @@ class OperaMonitor:
         log_frame = ttk.Frame(notebook)
         notebook.add(log_frame, text="执行日志")
         
-        # 日志文本框
-        self.log_text = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD)
-        self.log_text.pack(fill=tk.BOTH, expand=True)
+        # 日志视图（只显示可见的行）
+        self.log_view = LogView(log_frame, self.log_buffer)
+        self.log_view.pack(fill=tk.BOTH, expand=True)
         
         # 分析选项卡
         analysis_frame = ttk.Frame(notebook)
@@ -227,9 +166,6 @@ class OperaMonitor:
         # 分析文本框
         self.analysis_text = scrolledtext.ScrolledText(analysis_frame, wrap=tk.WORD)
         self.analysis_text.pack(fill=tk.BOTH, expand=True)
-        
-        # 自动滚动日志
-        self.log_text.see(tk.END)
     
     def run_monitor(self):
         if self.is_running:
@@ -239,334 +175,224 @@ class OperaMonitor:
         # 在新线程中运行监控任务
         threading.Thread(target=self._run_monitor_thread, daemon=True).start()
     
-    def _run_monitor_thread(self):
+    def _run_monitor_thread(self, include_daily_report=True):
+        """在工作线程中运行一轮监控，界面更新都通过事件队列交给界面线程"""
         self.is_running = True
-        self.status_var.set("正在运行监控...")
-        self.run_button.config(state=tk.DISABLED)
+        self.ui_events.post(MonitorStateChanged(True))
+        self.ui_events.post(StatusChanged("正在运行监控..."))
         
         try:
-            # 清除分析结果
-            self.analysis_text.delete(1.0, tk.END)
+            # 清除分析结果，邮件附件只包含本轮的日志
+            self.ui_events.post(AnalysisReplaced(""))
+            self.log_buffer.mark_cycle()
             
-            # 获取批处理文件路径
-            check_standby_bat = self.config_manager.get('Paths', 'check_standby_bat')
-            daily_report_bat = self.config_manager.get('Paths', 'daily_report_bat')
+            result = self.engine.run_cycle(include_daily_report)
+            analysis_text = result.format()
+            self.ui_events.post(AnalysisReplaced(analysis_text))
             
-            # 检查文件是否存在
-            if not os.path.exists(check_standby_bat):
-                self.log_message(f"错误: 文件不存在 - {check_standby_bat}")
-                return
-            if not os.path.exists(daily_report_bat):
-                self.log_message(f"错误: 文件不存在 - {daily_report_bat}")
+            # 更新状态（超时的一轮照常记录和发送报告，取消的一轮不发送）
+            self.ui_events.post(StatusChanged(CYCLE_STATUS_TEXT[result.status]))
+            if result.status not in (CYCLE_OK, CYCLE_TIMEOUT):
                 return
             
-            # 运行check_standby.bat
-            self.log_message("开始执行 check_standby.bat...")
-            check_standby_output = self.run_batch_file(check_standby_bat)
-            self.log_message("check_standby.bat 执行完成")
-            self.log_message("输出:\n" + check_standby_output)
-            
-            # 运行daily_report.bat
-            self.log_message("开始执行 daily_report.bat...")
-            daily_report_output = self.run_batch_file(daily_report_bat)
-            self.log_message("daily_report.bat 执行完成")
-            self.log_message("输出:\n" + daily_report_output)
-            
-            # 分析结果
-            self.analyze_results(check_standby_output, daily_report_output)
-            
-            # 更新状态
-            self.status_var.set("监控完成")
-            self.log_message("监控任务完成")
-            
-            # 如果设置了自动发送邮件，则发送
-            if self.config_manager.getboolean('Settings', 'auto_send_email', fallback=False):
-                self.send_email_report()
+            # 如果设置了自动发送邮件，则在完整检查后发送（只通知问题的变化）
+            if include_daily_report and self.config_manager.settings().auto_send_email:
+                self._send_cycle_report(result)
         
         except Exception as e:
             self.log_message(f"执行监控时出错: {str(e)}")
-            self.status_var.set("监控出错")
+            self.ui_events.post(StatusChanged("监控出错"))
             logger.error(f"执行监控时出错: {str(e)}", exc_info=True)
         
         finally:
             self.is_running = False
-            self.run_button.config(state=tk.NORMAL)
+            self.ui_events.post(MonitorStateChanged(False))
     
-    def run_batch_file(self, batch_file):
-        try:
-            # 使用subprocess运行批处理文件并捕获输出
-            process = subprocess.Popen(
-                batch_file, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                shell=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace'
-            )
-            
-            # 实时获取输出
-            output = ""
-            while True:
-                line = process.stdout.readline()
-                if not line and process.poll() is not None:
-                    break
-                if line:
-                    output += line
-                    self.log_message(line.strip())
-                    self.root.update_idletasks()
-            
-            # 获取剩余输出和错误
-            stdout, stderr = process.communicate()
-            output += stdout
-            
-            if stderr:
-                self.log_message("错误输出:\n" + stderr)
-                output += "\n错误输出:\n" + stderr
-            
-            return output
-        
-        except Exception as e:
-            error_msg = f"运行批处理文件时出错: {str(e)}"
-            self.log_message(error_msg)
-            logger.error(error_msg, exc_info=True)
-            return error_msg
+    def _apply_monitor_state(self, event):
+        self.run_button.config(state=tk.DISABLED if event.running else tk.NORMAL)
+        self.cancel_button.config(state=tk.NORMAL if event.running else tk.DISABLED)
     
-    def analyze_results(self, check_standby_output, daily_report_output):
+    def _replace_analysis(self, event):
         self.analysis_text.delete(1.0, tk.END)
-        self.analysis_text.insert(tk.END, "===== 分析结果 =====\n\n")
-        
-        # 检查是否启用错误检查
-        if not self.config_manager.getboolean('Settings', 'check_errors', fallback=True):
-            self.analysis_text.insert(tk.END, "错误检查已禁用，跳过分析。\n")
+        if event.text:
+            self.analysis_text.insert(tk.END, event.text)
+    
+    def _show_message(self, event):
+        show = {'info': messagebox.showinfo, 'warning': messagebox.showwarning}.get(event.kind, messagebox.showerror)
+        show(event.title, event.message)
+    
+    def cancel_monitor(self):
+        if not self.is_running:
             return
+        # 设置取消标志，正在运行的脚本连同子进程会被立即结束
+        self.engine.cancel()
+        self.ui_events.post(StatusChanged("正在取消监控..."))
+        self.log_message("正在取消监控，结束正在运行的脚本...")
+    
+    def queue_output(self, label, source, lines):
+        """在读取线程中调用：把一批输出行写入日志缓冲区"""
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        prefix = f"[{label}] " if label else ""
+        if source == 'stderr':
+            prefix += "错误输出: "
+        self.log_buffer.extend(f"[{timestamp}] {prefix}{line}" for line in lines)
+        logger.info("\n".join(lines))
+    
+    def _poll_ui_events(self):
+        """在界面线程中定时处理工作线程发来的事件，并刷新日志视图（只重绘可见的行）"""
+        for event in self.ui_events.drain(UI_MAX_EVENTS_PER_FRAME):
+            try:
+                self._ui_handlers[type(event)](event)
+            except Exception as e:
+                logger.error(f"处理界面事件 {event!r} 时出错: {str(e)}", exc_info=True)
+        self.log_view.refresh()
         
-        # 获取错误模式
-        error_patterns_str = self.config_manager.get('Settings', 'error_patterns', 
-                                                 fallback='error,warning,danger,failed,ORA-,TNS-')
-        error_patterns = [pattern.strip().lower() for pattern in error_patterns_str.split(',')]
-        
-        # 分析check_standby输出
-        self.analysis_text.insert(tk.END, "1. Check Standby 分析:\n")
-        standby_issues = self.check_for_issues(check_standby_output, error_patterns)
-        
-        if standby_issues:
-            self.analysis_text.insert(tk.END, "   发现以下问题:\n")
-            for issue in standby_issues:
-                self.analysis_text.insert(tk.END, f"   - {issue}\n")
-        else:
-            self.analysis_text.insert(tk.END, "   未发现问题\n")
-        
-        # 提取最后10条SEQUENCE# APPLIED记录
-        sequence_applied_pattern = r"\s*(\d+)\s+(YES|NO)\s*"
-        sequence_applied_matches = re.findall(sequence_applied_pattern, check_standby_output)
-        
-        if sequence_applied_matches:
-            self.analysis_text.insert(tk.END, "\n   最后10条 SEQUENCE# APPLIED:\n")
-            # 取最后10条记录
-            last_ten = sequence_applied_matches[-10:] if len(sequence_applied_matches) >= 10 else sequence_applied_matches
-            for seq, applied in last_ten:
-                self.analysis_text.insert(tk.END, f"   SEQUENCE#: {seq}, APPLIED: {applied}\n")
+        # 还有未处理的事件时尽快继续，否则按固定间隔
+        self.root.after(1 if self.ui_events.pending() else OUTPUT_POLL_INTERVAL, self._poll_ui_events)
+    
+    def open_trend_view(self):
+        try:
+            store = self.engine.get_metrics_store()
+        except Exception as e:
+            messagebox.showerror("错误", f"打开指标数据库时出错: {str(e)}")
+            return
+        if store is None:
+            messagebox.showwarning("警告", "未配置指标数据库路径 (Paths/metrics_db)")
+            return
         
-        # 分析HTML报告
-        self.analysis_text.insert(tk.END, "\n2. HTML报告分析:\n")
+        trend_window = tk.Toplevel(self.root)
+        trend_window.title("指标趋势")
+        trend_window.geometry("800x560")
+        trend_window.transient(self.root)
         
-        # 获取HTML报告路径
-        report_path = self.config_manager.get('Paths', 'report_path')
+        frame = ttk.Frame(trend_window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
         
-        if os.path.exists(report_path):
+        query_frame = ttk.Frame(frame)
+        query_frame.pack(fill=tk.X)
+        
+        # 目标、指标和对象
+        ttk.Label(query_frame, text="目标:").grid(row=0, column=0, sticky=tk.W, pady=5)
+        targets = store.targets() or [DEFAULT_TARGET]
+        target_var = tk.StringVar(value=targets[0])
+        target_box = ttk.Combobox(query_frame, textvariable=target_var, values=targets, state="readonly", width=15)
+        target_box.grid(row=0, column=1, sticky=tk.W, pady=5, padx=5)
+        
+        ttk.Label(query_frame, text="指标:").grid(row=0, column=2, sticky=tk.W, pady=5)
+        metric_names = {label: metric for metric, label in METRIC_LABELS.items()}
+        metric_var = tk.StringVar(value=METRIC_LABELS[METRIC_TABLESPACE_USED_PCT])
+        metric_box = ttk.Combobox(query_frame, textvariable=metric_var, values=list(metric_names), state="readonly", width=20)
+        metric_box.grid(row=0, column=3, sticky=tk.W, pady=5, padx=5)
+        
+        ttk.Label(query_frame, text="对象:").grid(row=0, column=4, sticky=tk.W, pady=5)
+        all_items = "全部"
+        item_var = tk.StringVar(value=all_items)
+        item_box = ttk.Combobox(query_frame, textvariable=item_var, state="readonly", width=20)
+        item_box.grid(row=0, column=5, sticky=tk.W, pady=5, padx=5)
+        
+        # 时间范围和降采样间隔
+        ranges = {"最近7天": 7, "最近30天": 30, "最近90天": 90, "最近365天": 365}
+        ttk.Label(query_frame, text="时间范围:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        range_var = tk.StringVar(value="最近30天")
+        ttk.Combobox(query_frame, textvariable=range_var, values=list(ranges), state="readonly",
+                     width=15).grid(row=1, column=1, sticky=tk.W, pady=5, padx=5)
+        
+        buckets = {"每小时": 3600, "每天": 86400, "每周": 7 * 86400}
+        ttk.Label(query_frame, text="间隔:").grid(row=1, column=2, sticky=tk.W, pady=5)
+        bucket_var = tk.StringVar(value="每天")
+        ttk.Combobox(query_frame, textvariable=bucket_var, values=list(buckets), state="readonly",
+                     width=20).grid(row=1, column=3, sticky=tk.W, pady=5, padx=5)
+        
+        ttk.Label(query_frame, text="阈值:").grid(row=1, column=4, sticky=tk.W, pady=5)
+        threshold_var = tk.StringVar(value="90")
+        ttk.Entry(query_frame, textvariable=threshold_var, width=10).grid(row=1, column=5, sticky=tk.W, pady=5, padx=5)
+        
+        result_text = scrolledtext.ScrolledText(frame, wrap=tk.NONE)
+        result_text.pack(fill=tk.BOTH, expand=True, pady=5)
+        
+        def update_items(*_):
+            metric = metric_names.get(metric_var.get())
+            item_box.config(values=[all_items] + store.items(target_var.get(), metric))
+            item_var.set(all_items)
+        
+        def show_trend():
+            metric = metric_names.get(metric_var.get())
+            item = None if item_var.get() == all_items else item_var.get()
+            end = datetime.datetime.now()
+            start = end - datetime.timedelta(days=ranges[range_var.get()])
             try:
-                with open(report_path, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                
-                # 检查HTML报告中的问题
-                html_issues = self.check_for_issues(html_content, error_patterns)
-                
-                if html_issues:
-                    self.analysis_text.insert(tk.END, "   HTML报告中发现以下问题:\n")
-                    for issue in html_issues:
-                        self.analysis_text.insert(tk.END, f"   - {issue}\n")
-                else:
-                    self.analysis_text.insert(tk.END, "   HTML报告中未发现问题\n")
-                
-                # 检查特定的数据库状态
-                self.check_database_status(html_content)
-                
-            except Exception as e:
-                self.analysis_text.insert(tk.END, f"   读取HTML报告时出错: {str(e)}\n")
-        else:
-            self.analysis_text.insert(tk.END, f"   HTML报告文件不存在: {report_path}\n")
-        
-        # 总结
-        self.analysis_text.insert(tk.END, "\n3. 总结:\n")
-        if standby_issues or (os.path.exists(report_path) and html_issues):
-            self.analysis_text.insert(tk.END, "   监控发现异常情况，建议检查系统状态\n")
-        else:
-            self.analysis_text.insert(tk.END, "   所有检查正常\n")
-    
-    def check_for_issues(self, text, error_patterns):
-        issues = []
-        lines = text.lower().split('\n')
-        
-        for i, line in enumerate(lines):
-            for pattern in error_patterns:
-                if pattern in line:
-                    # 获取上下文（前后各1行）
-                    start = max(0, i - 1)
-                    end = min(len(lines), i + 2)
-                    context = '\n'.join(lines[start:end])
-                    issues.append(f"发现 '{pattern}': {context}")
-                    break
-        
-        return issues
-    
-    def check_database_status(self, html_content):
-        # 检查数据库角色
-        if "PRIMARY" in html_content and "PHYSICAL STANDBY" in html_content:
-            self.analysis_text.insert(tk.END, "   数据库角色检查: ✅ 正常 (主库和备库都存在)\n")
-        else:
-            self.analysis_text.insert(tk.END, "   数据库角色检查: ❌ 异常 (可能缺少主库或备库)\n")
-        
-        # 检查归档日志间隙
-        if "GAPS" in html_content and re.search(r'"GAPS"[^0-9]*0', html_content):
-            self.analysis_text.insert(tk.END, "   归档日志间隙检查: ✅ 正常 (无间隙)\n")
-        elif "GAPS" in html_content:
-            self.analysis_text.insert(tk.END, "   归档日志间隙检查: ❌ 异常 (存在间隙)\n")
-        
-        # 检查未应用的日志
-        if "NOT APPLIED" in html_content and re.search(r'"NOT APPLIED"[^0-9]*0', html_content):
-            self.analysis_text.insert(tk.END, "   未应用日志检查: ✅ 正常 (无未应用日志)\n")
-        elif "NOT APPLIED" in html_content:
-            self.analysis_text.insert(tk.END, "   未应用日志检查: ❌ 异常 (存在未应用日志)\n")
-        
-        # 检查表空间使用情况
-        if "DANGER" in html_content:
-            self.analysis_text.insert(tk.END, "   表空间使用检查: 🔴 危险 (有表空间使用率超过90%)\n")
-        elif "WARNING" in html_content:
-            self.analysis_text.insert(tk.END, "   表空间使用检查: 🟡 警告 (有表空间使用率超过80%)\n")
-        else:
-            self.analysis_text.insert(tk.END, "   表空间使用检查: ✅ 正常\n")
+                threshold = float(threshold_var.get()) if threshold_var.get().strip() else None
+            except ValueError:
+                messagebox.showerror("错误", "阈值必须是数字")
+                return
             
-        # 服务器运行时间分析
-        uptime_pattern = r'START TIME[^\n]*([\d-]+\s+[\d:]+)'
-        uptime_match = re.search(uptime_pattern, html_content)
-        
-        if uptime_match:
-            start_time_str = uptime_match.group(1).strip()
             try:
-                start_time = datetime.datetime.strptime(start_time_str, '%d-%b-%Y %H:%M')
-                current_time = datetime.datetime.now()
-                uptime_days = (current_time - start_time).days
-                
-                if uptime_days > 90:
-                    self.analysis_text.insert(tk.END, f"   服务器运行时间分析: 🔴 警告 (已运行{uptime_days}天，建议重启)\n")
-                elif uptime_days > 60:
-                    self.analysis_text.insert(tk.END, f"   服务器运行时间分析: 🟡 注意 (已运行{uptime_days}天)\n")
-                else:
-                    self.analysis_text.insert(tk.END, f"   服务器运行时间分析: ✅ 正常 (已运行{uptime_days}天)\n")
+                points = store.trend(target_var.get(), metric, start, end, buckets[bucket_var.get()], item)
+                growth = store.growth(target_var.get(), metric, start, end, threshold, item)
             except Exception as e:
-                self.analysis_text.insert(tk.END, f"   服务器运行时间分析: ❓ 无法解析 ({start_time_str})\n")
-    
-    def send_email_report(self):
-        try:
-            # 获取邮件设置
-            smtp_server = self.config_manager.get('Email', 'smtp_server')
-            smtp_port = self.config_manager.getint('Email', 'smtp_port')
-            sender_email = self.config_manager.get('Email', 'sender_email')
-            sender_password = self.config_manager.get('Email', 'sender_password')
-            recipient_emails_str = self.config_manager.get('Email', 'recipient_emails')
-            use_tls = self.config_manager.getboolean('Email', 'use_tls')
-            
-            # 检查必要的设置
-            if not smtp_server or not sender_email or not recipient_emails_str:
-                messagebox.showerror("邮件设置错误", "请先完成邮件设置")
+                messagebox.showerror("错误", f"查询指标时出错: {str(e)}")
                 return
             
-            # 解析收件人列表
-            recipient_emails = [email.strip() for email in recipient_emails_str.split(',')]
-            
-            # 获取报告路径
-            report_path = self.config_manager.get('Paths', 'report_path')
-            if not os.path.exists(report_path):
-                messagebox.showerror("文件错误", f"HTML报告文件不存在: {report_path}")
+            result_text.delete(1.0, tk.END)
+            result_text.insert(tk.END, f"===== {target_var.get()} - {metric_var.get()} ({range_var.get()}，{bucket_var.get()}) =====\n\n")
+            if not points:
+                result_text.insert(tk.END, "该时间范围内没有数据\n")
                 return
             
-            # 创建邮件
-            msg = MIMEMultipart()
-            msg['From'] = sender_email
-            msg['To'] = ", ".join(recipient_emails)
-            msg['Subject'] = f"Opera数据库监控报告 - {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"
-            
-            # 添加邮件正文
-            body = "这是自动生成的Opera数据库监控报告，请查看附件。\n\n"
-            
-            # 添加分析结果
-            analysis_text = self.analysis_text.get(1.0, tk.END)
-            body += "分析结果:\n" + analysis_text
-            
-            # 创建HTML格式的邮件正文
-            html_body = "<html><body>"
-            html_body += "<p>这是自动生成的Opera数据库监控报告，请查看附件。</p>"
-            html_body += "<h3>分析结果:</h3>"
-            html_body += "<pre>"
-            
-            # 将分析文本中的表情符号转换为HTML格式
-            analysis_lines = analysis_text.split('\n')
-            for line in analysis_lines:
-                if "服务器运行时间分析" in line:
-                    if "🔴 警告" in line:
-                        line = line.replace("🔴 警告", "<span style='color: red; font-weight: bold;'>⚠️ 警告</span>")
-                    elif "🟡 注意" in line:
-                        line = line.replace("🟡 注意", "<span style='color: orange; font-weight: bold;'>⚠️ 注意</span>")
-                    elif "✅ 正常" in line:
-                        line = line.replace("✅ 正常", "<span style='color: green; font-weight: bold;'>✓ 正常</span>")
-                    elif "❓ 无法解析" in line:
-                        line = line.replace("❓ 无法解析", "<span style='color: gray; font-weight: bold;'>❓ 无法解析</span>")
-                elif "数据库角色检查" in line or "归档日志间隙检查" in line or "未应用日志检查" in line or "表空间使用检查" in line:
-                    if "✅ 正常" in line:
-                        line = line.replace("✅ 正常", "<span style='color: green; font-weight: bold;'>✓ 正常</span>")
-                    elif "❌ 异常" in line:
-                        line = line.replace("❌ 异常", "<span style='color: red; font-weight: bold;'>⚠️ 异常</span>")
-                    elif "🔴 危险" in line:
-                        line = line.replace("🔴 危险", "<span style='color: red; font-weight: bold;'>⚠️ 危险</span>")
-                    elif "🟡 警告" in line:
-                        line = line.replace("🟡 警告", "<span style='color: orange; font-weight: bold;'>⚠️ 警告</span>")
-                
-                html_body += line + "<br>"
-            
-            html_body += "</pre>"
-            html_body += "</body></html>"
-            
-            # 添加纯文本和HTML格式的邮件正文
-            msg.attach(MIMEText(body, 'plain'))
-            msg.attach(MIMEText(html_body, 'html'))
-            
-            # 添加HTML报告附件
-            with open(report_path, 'rb') as f:
-                attachment = MIMEApplication(f.read(), _subtype='html')
-                attachment.add_header('Content-Disposition', 'attachment', filename=os.path.basename(report_path))
-                msg.attach(attachment)
-            
-            # 添加日志附件
-            log_content = self.log_text.get(1.0, tk.END)
-            log_attachment = MIMEText(log_content, 'plain')
-            log_attachment.add_header('Content-Disposition', 'attachment', filename='execution_log.txt')
-            msg.attach(log_attachment)
-            
-            # 连接到SMTP服务器并发送邮件
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                if use_tls:
-                    server.starttls()
-                if sender_password:  # 只有在提供密码时才尝试登录
-                    server.login(sender_email, sender_password)
-                server.send_message(msg)
-            
-            messagebox.showinfo("成功", "邮件已成功发送")
-            self.log_message("邮件已成功发送")
+            # 增长趋势
+            result_text.insert(tk.END, "增长趋势:\n")
+            for g in growth:
+                line = f"   {g.item or '-'}: 最新 {g.latest:.2f}，每天 {g.per_day:+.3f}"
+                if g.days_to_threshold is not None:
+                    line += f"，约 {g.days_to_threshold:.0f} 天后达到 {threshold:g}"
+                result_text.insert(tk.END, line + "\n")
+            
+            # 降采样明细
+            time_format = "%Y-%m-%d %H:%M" if buckets[bucket_var.get()] < 86400 else "%Y-%m-%d"
+            current_item = None
+            for point in points:
+                if point.item != current_item:
+                    current_item = point.item
+                    result_text.insert(tk.END, f"\n[{point.item or '-'}]\n   {'时间':<16} {'平均':>12} {'最小':>12} {'最大':>12} {'次数':>6}\n")
+                result_text.insert(tk.END, f"   {point.start.strftime(time_format):<16} {point.avg:>12.2f} "
+                                           f"{point.min:>12.2f} {point.max:>12.2f} {point.count:>6}\n")
+        
+        target_box.bind("<<ComboboxSelected>>", update_items)
+        metric_box.bind("<<ComboboxSelected>>", update_items)
+        update_items()
+        
+        ttk.Button(query_frame, text="查询", command=show_trend).grid(row=0, column=6, rowspan=2, padx=10)
+        show_trend()
+    
+    def send_email_report(self):
+        # 分析结果取自界面，在后台线程中发送，不阻塞界面
+        analysis_text = self.analysis_text.get(1.0, tk.END)
+        threading.Thread(target=self._send_email_report, args=(analysis_text,), daemon=True).start()
+    
+    def _send_email_report(self, analysis_text):
+        """在工作线程中发送邮件报告，结果通过事件队列提示"""
+        try:
+            # 执行日志只附带本轮的部分
+            self.engine.send_email_report(analysis_text, self.log_buffer.cycle_text())
+            self.ui_events.post(ShowMessage('info', "成功", "邮件已成功发送"))
+        
+        except EmailReportError as e:
+            self.ui_events.post(ShowMessage('error', e.title, str(e)))
+        
+        except Exception as e:
+            error_msg = f"发送邮件时出错: {str(e)}"
+            self.ui_events.post(ShowMessage('error', "错误", error_msg))
+            self.log_message(error_msg)
+            logger.error(error_msg, exc_info=True)
+    
+    def _send_cycle_report(self, result):
+        """自动发送本轮报告，没有需要通知的变化时不发送"""
+        try:
+            if self.engine.send_cycle_report(result, self.log_buffer.cycle_text()):
+                self.ui_events.post(StatusChanged("监控完成，邮件已发送"))
         
         except Exception as e:
             error_msg = f"发送邮件时出错: {str(e)}"
-            messagebox.showerror("错误", error_msg)
             self.log_message(error_msg)
             logger.error(error_msg, exc_info=True)
     
@@ -585,50 +411,51 @@ class OperaMonitor:
     
     def toggle_auto_run(self):
         if self.auto_run_active:
-            # 停止自动运行
+            # 停止自动运行，等待中的计划线程立即退出
             self.auto_run_active = False
+            if self.scheduler is not None:
+                self.scheduler.stop()
+                self.scheduler = None
             self.auto_run_button.config(text="启动自动监控")
             self.status_var.set("自动监控已停止")
             self.log_message("自动监控已停止")
         else:
+            try:
+                scheduler = self.create_scheduler()
+            except ValueError as e:
+                messagebox.showerror("错误", f"计划设置无效: {str(e)}")
+                return
+            
             # 启动自动运行
             self.auto_run_active = True
             self.auto_run_button.config(text="停止自动监控")
             self.status_var.set("自动监控已启动")
             self.log_message("自动监控已启动")
-            
-            # 在新线程中运行自动监控
-            if self.auto_run_thread is None or not self.auto_run_thread.is_alive():
-                self.auto_run_thread = threading.Thread(target=self._auto_run_thread, daemon=True)
-                self.auto_run_thread.start()
+            self.scheduler = scheduler
+            self.scheduler.start()
     
-    def _auto_run_thread(self):
-        while self.auto_run_active:
-            if not self.is_running:
-                self._run_monitor_thread()
-            
-            # 获取自动运行间隔（秒）
-            interval = self.config_manager.getint('Settings', 'auto_run_interval', fallback=86400)
-            
-            # 等待指定的时间，但每秒检查一次是否应该停止
-            for _ in range(interval):
-                if not self.auto_run_active:
-                    break
-                time.sleep(1)
+    def create_scheduler(self, run_immediately=True):
+        """根据设置创建计划：完整检查（两个脚本）和可选的单独备库检查"""
+        return self.engine.create_scheduler(self._run_scheduled_monitor, run_immediately=run_immediately)
+    
+    def _run_scheduled_monitor(self, include_daily_report):
+        if self.is_running:
+            self.log_message("上一轮监控仍在运行，跳过本次自动监控")
+            return
+        self._run_monitor_thread(include_daily_report)
     
     def log_message(self, message):
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\n"
         
-        # 在UI中显示日志
-        self.log_text.insert(tk.END, log_entry)
-        self.log_text.see(tk.END)
+        # 与脚本输出写入同一个缓冲区，由界面线程按顺序显示
+        self.log_buffer.extend(f"[{timestamp}] {line}" for line in message.split('\n'))
         
         # 同时记录到日志文件
         logger.info(message)
     
     def clear_log(self):
-        self.log_text.delete(1.0, tk.END)
+        self.log_buffer.clear()
+        self.log_view.scroll_to_end()
     
     def save_log(self):
         file_path = filedialog.asksaveasfilename(
@@ -639,7 +466,7 @@ class OperaMonitor:
         if file_path:
             try:
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(self.log_text.get(1.0, tk.END))
+                    f.write(self.log_buffer.text())
                 messagebox.showinfo("成功", f"日志已保存到: {file_path}")
             except Exception as e:
                 messagebox.showerror("错误", f"保存日志时出错: {str(e)}")
@@ -745,14 +572,15 @@ class OperaMonitor:
     
     def save_email_settings(self, smtp_server, smtp_port, sender_email, sender_password, recipient_emails, use_tls, auto_send, window):
         try:
-            # 保存设置
-            self.config_manager.set('Email', 'smtp_server', smtp_server)
-            self.config_manager.set('Email', 'smtp_port', smtp_port)
-            self.config_manager.set('Email', 'sender_email', sender_email)
-            self.config_manager.set('Email', 'sender_password', sender_password)
-            self.config_manager.set('Email', 'recipient_emails', recipient_emails)
-            self.config_manager.set('Email', 'use_tls', str(use_tls))
-            self.config_manager.set('Settings', 'auto_send_email', str(auto_send))
+            # 保存设置（所有选项一次写入配置文件）
+            with self.config_manager.batch():
+                self.config_manager.set('Email', 'smtp_server', smtp_server)
+                self.config_manager.set('Email', 'smtp_port', smtp_port)
+                self.config_manager.set('Email', 'sender_email', sender_email)
+                self.config_manager.set('Email', 'sender_password', sender_password)
+                self.config_manager.set('Email', 'recipient_emails', recipient_emails)
+                self.config_manager.set('Email', 'use_tls', str(use_tls))
+                self.config_manager.set('Settings', 'auto_send_email', str(auto_send))
             
             messagebox.showinfo("成功", "邮件设置已保存")
             window.destroy()
@@ -806,10 +634,11 @@ class OperaMonitor:
     
     def save_path_settings(self, check_standby_bat, daily_report_bat, report_path, window):
         try:
-            # 保存设置
-            self.config_manager.set('Paths', 'check_standby_bat', check_standby_bat)
-            self.config_manager.set('Paths', 'daily_report_bat', daily_report_bat)
-            self.config_manager.set('Paths', 'report_path', report_path)
+            # 保存设置（所有选项一次写入配置文件）
+            with self.config_manager.batch():
+                self.config_manager.set('Paths', 'check_standby_bat', check_standby_bat)
+                self.config_manager.set('Paths', 'daily_report_bat', daily_report_bat)
+                self.config_manager.set('Paths', 'report_path', report_path)
             
             messagebox.showinfo("成功", "路径设置已保存")
             window.destroy()
@@ -823,7 +652,7 @@ class OperaMonitor:
     def open_monitor_settings(self):
         settings_window = tk.Toplevel(self.root)
         settings_window.title("监控设置")
-        settings_window.geometry("500x300")
+        settings_window.geometry("520x640")
         settings_window.transient(self.root)
         settings_window.grab_set()
         
@@ -846,23 +675,100 @@ class OperaMonitor:
         error_patterns_var = tk.StringVar(value=self.config_manager.get('Settings', 'error_patterns', fallback='error,warning,danger,failed,ORA-,TNS-'))
         ttk.Entry(frame, textvariable=error_patterns_var, width=40).grid(row=2, column=1, rowspan=2, sticky=tk.W, pady=5)
         
+        # 匹配选项
+        match_ignore_case_var = tk.BooleanVar(value=self.config_manager.getboolean('Settings', 'match_ignore_case', fallback=True))
+        ttk.Checkbutton(frame, text="忽略大小写", variable=match_ignore_case_var).grid(row=4, column=0, sticky=tk.W, pady=5)
+        match_whole_word_var = tk.BooleanVar(value=self.config_manager.getboolean('Settings', 'match_whole_word', fallback=False))
+        ttk.Checkbutton(frame, text="整词匹配", variable=match_whole_word_var).grid(row=4, column=1, sticky=tk.W, pady=5)
+        
+        # 同时运行两个脚本
+        concurrent_var = tk.BooleanVar(value=self.config_manager.getboolean('Settings', 'concurrent_scripts', fallback=False))
+        ttk.Checkbutton(frame, text="同时运行 check_standby 和 daily_report", variable=concurrent_var).grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        # 机群模式
+        fleet_mode_var = tk.BooleanVar(value=self.config_manager.is_fleet_mode())
+        ttk.Checkbutton(frame, text="启用机群模式 (并行检查所有 [Target:名称] 目标)", variable=fleet_mode_var).grid(row=6, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        # 机群并发数
+        ttk.Label(frame, text="机群并发数:").grid(row=7, column=0, sticky=tk.W, pady=5)
+        fleet_workers_var = tk.IntVar(value=self.config_manager.getint('Settings', 'fleet_max_workers', fallback=4))
+        ttk.Spinbox(frame, from_=1, to=64, increment=1, textvariable=fleet_workers_var, width=10).grid(row=7, column=1, sticky=tk.W, pady=5)
+        
+        # 脚本超时时间
+        ttk.Label(frame, text="check_standby超时 (秒, 0不限制):").grid(row=8, column=0, sticky=tk.W, pady=5)
+        check_standby_timeout_var = tk.IntVar(value=self.config_manager.settings().check_standby_timeout)
+        ttk.Spinbox(frame, from_=0, to=86400, increment=60, textvariable=check_standby_timeout_var, width=10).grid(row=8, column=1, sticky=tk.W, pady=5)
+        
+        ttk.Label(frame, text="daily_report超时 (秒, 0不限制):").grid(row=9, column=0, sticky=tk.W, pady=5)
+        daily_report_timeout_var = tk.IntVar(value=self.config_manager.settings().daily_report_timeout)
+        ttk.Spinbox(frame, from_=0, to=86400, increment=60, textvariable=daily_report_timeout_var, width=10).grid(row=9, column=1, sticky=tk.W, pady=5)
+        
+        # 计划（间隔如 5m、2h，或cron表达式如 0 6 * * *）
+        ttk.Label(frame, text="完整检查计划 (空则按间隔):").grid(row=10, column=0, sticky=tk.W, pady=5)
+        daily_report_schedule_var = tk.StringVar(value=self.config_manager.get('Settings', 'daily_report_schedule', fallback=''))
+        ttk.Entry(frame, textvariable=daily_report_schedule_var, width=20).grid(row=10, column=1, sticky=tk.W, pady=5)
+        
+        ttk.Label(frame, text="备库检查计划 (空则不单独检查):").grid(row=11, column=0, sticky=tk.W, pady=5)
+        standby_check_schedule_var = tk.StringVar(value=self.config_manager.get('Settings', 'standby_check_schedule', fallback=''))
+        ttk.Entry(frame, textvariable=standby_check_schedule_var, width=20).grid(row=11, column=1, sticky=tk.W, pady=5)
+        
+        run_missed_var = tk.BooleanVar(value=self.config_manager.getboolean('Settings', 'run_missed_schedules', fallback=True))
+        ttk.Checkbutton(frame, text="立即补跑错过的计划", variable=run_missed_var).grid(row=12, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
         # 保存按钮
         ttk.Button(frame, text="保存设置", command=lambda: self.save_monitor_settings(
             interval_var.get(),
             check_errors_var.get(),
             error_patterns_var.get(),
+            match_ignore_case_var.get(),
+            match_whole_word_var.get(),
+            concurrent_var.get(),
+            fleet_mode_var.get(),
+            fleet_workers_var.get(),
+            check_standby_timeout_var.get(),
+            daily_report_timeout_var.get(),
+            daily_report_schedule_var.get(),
+            standby_check_schedule_var.get(),
+            run_missed_var.get(),
             settings_window
-        )).grid(row=4, column=0, columnspan=2, pady=10)
+        )).grid(row=13, column=0, columnspan=2, pady=10)
     
-    def save_monitor_settings(self, interval_hours, check_errors, error_patterns, window):
+    def save_monitor_settings(self, interval_hours, check_errors, error_patterns, match_ignore_case, match_whole_word,
+                              concurrent_scripts, fleet_mode, fleet_workers, check_standby_timeout, daily_report_timeout,
+                              daily_report_schedule, standby_check_schedule, run_missed, window):
         try:
+            # 先检查计划格式
+            for schedule in (daily_report_schedule, standby_check_schedule):
+                try:
+                    parse_schedule(schedule)
+                except ValueError as e:
+                    messagebox.showerror("错误", f"计划设置无效: {str(e)}")
+                    return
+            
             # 将小时转换为秒
             interval_seconds = int(interval_hours * 3600)
             
-            # 保存设置
-            self.config_manager.set('Settings', 'auto_run_interval', str(interval_seconds))
-            self.config_manager.set('Settings', 'check_errors', str(check_errors))
-            self.config_manager.set('Settings', 'error_patterns', error_patterns)
+            # 保存设置（所有选项一次写入配置文件）
+            with self.config_manager.batch():
+                self.config_manager.set('Settings', 'auto_run_interval', str(interval_seconds))
+                self.config_manager.set('Settings', 'check_errors', str(check_errors))
+                self.config_manager.set('Settings', 'error_patterns', error_patterns)
+                self.config_manager.set('Settings', 'match_ignore_case', str(match_ignore_case))
+                self.config_manager.set('Settings', 'match_whole_word', str(match_whole_word))
+                self.config_manager.set('Settings', 'concurrent_scripts', str(concurrent_scripts))
+                self.config_manager.set('Settings', 'fleet_mode', str(fleet_mode))
+                self.config_manager.set('Settings', 'fleet_max_workers', str(fleet_workers))
+                self.config_manager.set('Settings', 'check_standby_timeout', str(check_standby_timeout))
+                self.config_manager.set('Settings', 'daily_report_timeout', str(daily_report_timeout))
+                self.config_manager.set('Settings', 'daily_report_schedule', daily_report_schedule.strip())
+                self.config_manager.set('Settings', 'standby_check_schedule', standby_check_schedule.strip())
+                self.config_manager.set('Settings', 'run_missed_schedules', str(run_missed))
+            
+            # 自动监控运行中时按新设置重新计划
+            if self.auto_run_active and self.scheduler is not None:
+                self.scheduler.stop()
+                self.scheduler = self.create_scheduler(run_immediately=False)
+                self.scheduler.start()
             
             messagebox.showinfo("成功", "监控设置已保存")
             window.destroy()
@@ -882,13 +788,18 @@ class OperaMonitor:
     
     def on_closing(self):
         if self.auto_run_active:
-            if messagebox.askyesno("确认", "自动监控正在运行中，确定要退出吗？"):
-                self.auto_run_active = False
-                self.root.destroy()
-        else:
-            self.root.destroy()
+            if not messagebox.askyesno("确认", "自动监控正在运行中，确定要退出吗？"):
+                return
+            self.auto_run_active = False
+            if self.scheduler is not None:
+                self.scheduler.stop()
+        # 退出时结束仍在运行的脚本，避免遗留sqlplus进程
+        self.engine.cancel()
+        self.root.destroy()
 
 def main():
+    # 配置日志：写文件在后台线程中进行，读取配置后按设置的路径和格式写入
+    setup_logging(logging.StreamHandler())
     root = tk.Tk()
     app = OperaMonitor(root)
     root.mainloop()
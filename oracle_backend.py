@@ -0,0 +1,490 @@
+import logging
+import datetime
+import importlib
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from archive_tracker import ArchivedLog
+from report_parser import (DailyReport, InstanceInfo, TablespaceUsage, RmanJob,
+                           DATABASE_STANDBY, DATABASE_PRODUCTION, REPORT_TIME_FORMAT)
+from fleet_executor import TARGET_SECTION_PREFIX
+
+try:
+    import oracledb
+except ImportError:
+    oracledb = None
+
+logger = logging.getLogger("OperaMonitor")
+
+# [Settings] db_backend 的取值
+BACKEND_SQLPLUS = 'sqlplus'
+BACKEND_ORACLEDB = 'oracledb'
+
+# 数据库连接设置所在的节
+DATABASE_SECTION = 'Database'
+
+DEFAULT_POOL_MIN = 1
+DEFAULT_POOL_MAX = 2
+
+# ---------- check_standby.sql 中的查询 ----------
+
+STANDBY_PROCESSES_SQL = "select process, status, sequence# from v$managed_standby"
+
+STANDBY_DATABASE_SQL = ("select database_role, controlfile_type, open_mode, protection_mode, resetlogs_change# "
+                        "from v$database")
+
+ARCHIVED_LOGS_SQL = ("select thread#, sequence#, applied from v$archived_log"
+                     " where resetlogs_change# = (select resetlogs_change# from v$database){where}"
+                     " order by thread#, sequence#")
+
+# ---------- daily_report_dg.sql / daily_report_prod.sql 中的查询 ----------
+
+INSTANCES_SQL = """
+select a.inst_id, a.name, upper(c.instance_name), c.status, c.host_name, a.database_role,
+       (select protection_mode from v$database), c.startup_time, sysdate
+  from gv$database a, gv$instance c
+ where a.inst_id = c.inst_id
+ order by a.inst_id"""
+
+INSTANCE_STATUS_SQL = "select status from v$instance"
+
+APPLIED_LOGS_SQL = """
+select (select max(next_time) from v$archived_log
+         where sequence# = (select max(sequence#) from v$archived_log where applied = 'YES')),
+       (select max(next_time) from v$archived_log
+         where sequence# = (select max(sequence#) from v$archived_log))
+  from dual"""
+
+# 所有线程的间隙之和（daily_report_dg.sql 只统计线程1，其他线程需要手工添加）
+ARCHIVE_GAPS_SQL = """
+select nvl(sum(high - low), 0)
+  from (select nvl(max(high_sequence#), 0) high, nvl(max(low_sequence#), 0) low
+          from v$archive_gap group by thread#)"""
+
+NOT_APPLIED_SQL = """
+select count(*) from v$archived_log
+ where applied = 'NO' and registrar = 'RFS' and creator = 'ARCH'"""
+
+DELETED_ARCHIVE_LOGS_SQL = """
+select count(*) from v$archived_log
+ where applied = 'YES' and deleted = 'NO' and trunc(completion_time) <= trunc(sysdate) - 2"""
+
+TABLESPACE_SQL = """
+select c.tablespace_name,
+       round(a.bytes / 1048576, 4),
+       round(maxbytes / 1048576, 4),
+       round((a.bytes - b.bytes) / maxbytes, 4) * 100,
+       c.contents
+  from (select tablespace_name, sum(a.bytes) bytes,
+               sum(decode(a.autoextensible, 'YES', a.maxbytes, 'NO', a.bytes)) maxbytes
+          from dba_data_files a group by tablespace_name
+        union all
+        select tablespace_name, sum(a.bytes) bytes,
+               sum(decode(a.autoextensible, 'YES', a.maxbytes, 'NO', a.bytes)) maxbytes
+          from dba_temp_files a group by tablespace_name) a,
+       (select a.tablespace_name, nvl(sum(b.bytes), 0) bytes
+          from dba_data_files a
+          left outer join dba_free_space b
+            on (a.tablespace_name = b.tablespace_name and a.file_id = b.file_id)
+         group by a.tablespace_name) b,
+       dba_tablespaces c
+ where a.tablespace_name = b.tablespace_name(+)
+   and a.tablespace_name = c.tablespace_name
+ order by 1, 3"""
+
+CONNECTIONS_SQL = """
+select inst_id, count(*) - 1
+  from gv$session
+ where username is not null and program not like '%ORACLE.EXE%'
+ group by inst_id
+ order by inst_id"""
+
+INVALID_OBJECTS_SQL = """
+select owner, count(*)
+  from dba_objects
+ where status != 'VALID' and object_type != 'NEXT OBJECT'
+ group by owner
+ order by owner"""
+
+BACKUP_COUNT_SQL = "select count(*) from v$rman_backup_job_details where start_time > trunc(sysdate - 3)"
+
+RMAN_JOBS_SQL = """
+select session_recid, start_time, end_time, output_bytes / 1024 / 1024, status, input_type, time_taken_display
+  from v$rman_backup_job_details
+ where start_time > trunc(sysdate) - 3
+ order by start_time"""
+
+# 与 daily_report_*.sql 中的提示相同，便于按同样的错误模式检查
+ALERT_NOT_MOUNTED = "(STANDBY database must be in MOUNTED state, please run d:\\scripts\\start_standby.bat)"
+ALERT_NOT_IN_SYNC = "(Databases are not in sync, Please contact SHIJI support-4000211988.)"
+ALERT_NOT_APPLIED = "(Some archive logs are not applied, Please contact SHIJI support-4000211988.)"
+ALERT_INVALID_OBJECTS = "Please contact SHIJI support-4000211988."
+ALERT_NO_BACKUP = "No backup information found. Please check backup logs."
+
+
+@dataclass
+class ConnectionSettings:
+    """一个数据库的连接设置。
+
+    属性:
+        user (str): 用户名
+        password (str): 密码
+        dsn (str): 连接串，如 host:1521/service_name 或 tnsnames 中的别名
+        sysdba (bool): 是否以 SYSDBA 身份连接（备库处于 MOUNTED 状态时必须）
+    """
+    user: str
+    password: str
+    dsn: str
+    sysdba: bool = True
+
+
+@dataclass
+class DatabaseSettings:
+    """一个监控目标（一对备库/主库）的连接设置。
+
+    属性:
+        name (str): 目标名称
+        standby (ConnectionSettings): 备库
+        production (ConnectionSettings): 主库，未设置时每日报告只包含备库部分
+        daily_report_bat (str): 仍需运行的 daily_report 脚本（生成HTML附件、删除已应用的归档日志），可为空
+        report_path (str): 该脚本生成的HTML报告路径
+    """
+    name: str
+    standby: ConnectionSettings
+    production: Optional[ConnectionSettings] = None
+    daily_report_bat: str = ''
+    report_path: str = ''
+
+    @property
+    def label(self) -> str:
+        return f"oracledb://{self.standby.dsn}"
+
+
+def _connection(config, section: str, dsn_option: str) -> Optional[ConnectionSettings]:
+    dsn = config.get(section, dsn_option, fallback='').strip()
+    if not dsn:
+        return None
+    # 目标节中未设置的用户名/密码使用 [Database] 节中的设置
+    user = config.get(section, 'user', fallback=config.get(DATABASE_SECTION, 'user', fallback='sys')).strip()
+    password = config.get(section, 'password', fallback=config.get(DATABASE_SECTION, 'password', fallback=''))
+    sysdba = config.getboolean(section, 'sysdba', fallback=config.getboolean(DATABASE_SECTION, 'sysdba', fallback=True))
+    return ConnectionSettings(user, password, dsn, sysdba)
+
+
+def load_database_settings(config, section: str = DATABASE_SECTION, name: str = '') -> DatabaseSettings:
+    """从配置节中读取一个目标的连接设置（standby_dsn 必须设置，production_dsn 可选）。
+
+    Raises:
+        ValueError: 没有设置 standby_dsn
+    """
+    standby = _connection(config, section, 'standby_dsn')
+    if standby is None:
+        raise ValueError(f"[{section}] 中没有设置 standby_dsn")
+    run_report_script = config.getboolean(
+        section, 'run_report_script', fallback=config.getboolean(DATABASE_SECTION, 'run_report_script', fallback=False))
+    if section == DATABASE_SECTION:
+        daily_report_bat = config.get('Paths', 'daily_report_bat', fallback='')
+        report_path = config.get('Paths', 'report_path', fallback='')
+    else:
+        daily_report_bat = config.get(section, 'daily_report_bat', fallback='').strip()
+        report_path = config.get(section, 'report_path', fallback='').strip()
+    return DatabaseSettings(
+        name=name,
+        standby=standby,
+        production=_connection(config, section, 'production_dsn'),
+        daily_report_bat=daily_report_bat if run_report_script else '',
+        report_path=report_path,
+    )
+
+
+def load_database_targets(config) -> List[DatabaseSettings]:
+    """机群模式下从所有 [Target:名称] 节读取连接设置，没有设置 standby_dsn 的目标被忽略。"""
+    targets = []
+    for section in config.sections():
+        if not section.startswith(TARGET_SECTION_PREFIX):
+            continue
+        name = section[len(TARGET_SECTION_PREFIX):].strip()
+        try:
+            targets.append(load_database_settings(config, section, name))
+        except ValueError as e:
+            logger.warning(f"忽略配置不完整的监控目标: {e}")
+    return targets
+
+
+def load_driver(name: str = 'oracledb'):
+    """导入数据库驱动模块（oracledb，或实现同样接口的替身如 fake_oracledb）。
+
+    Raises:
+        RuntimeError: 驱动未安装
+    """
+    if name == 'oracledb':
+        if oracledb is None:
+            raise RuntimeError("未安装 oracledb，请运行 pip install oracledb，或设置 db_backend = sqlplus")
+        return oracledb
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        raise RuntimeError(f"无法加载数据库驱动 {name}: {e}")
+
+
+@dataclass
+class StandbyCheck:
+    """check_standby.sql 的查询结果。
+
+    属性:
+        processes (list): v$managed_standby 中的 (PROCESS, STATUS, SEQUENCE#)
+        database (dict): v$database 中的 DATABASE_ROLE、CONTROLFILE_TYPE、OPEN_MODE、PROTECTION_MODE
+        resetlogs_change (int): 当前化身的 RESETLOGS_CHANGE#
+        archived_logs (list): 当前化身中水位线之后的归档日志
+    """
+    processes: List[Tuple[str, str, int]] = field(default_factory=list)
+    database: Dict[str, str] = field(default_factory=dict)
+    resetlogs_change: Optional[int] = None
+    archived_logs: List[ArchivedLog] = field(default_factory=list)
+
+    def format(self) -> str:
+        """按 SQL*Plus 输出的样子排成文本，用于显示日志和检查错误模式。"""
+        lines = ["PROCESS   STATUS       SEQUENCE#"]
+        lines.extend(f"{process:<9} {status:<12} {sequence}" for process, status, sequence in self.processes)
+        lines.append("")
+        lines.append("DATABASE_ROLE    CONTROL OPEN_MODE            PROTECTION_MODE")
+        if self.database:
+            lines.append(f"{self.database['DATABASE_ROLE']:<16} {self.database['CONTROLFILE_TYPE']:<7} "
+                         f"{self.database['OPEN_MODE']:<20} {self.database['PROTECTION_MODE']}")
+        lines.append("")
+        if self.resetlogs_change is not None:
+            lines.append(f"RESETLOGS_CHANGE# {self.resetlogs_change}")
+            lines.append("")
+        lines.append("   THREAD#  SEQUENCE# APPLIED")
+        lines.extend(f"{log.thread:>10} {log.sequence:>10} {log.applied}" for log in self.archived_logs)
+        return "\n".join(lines) + "\n"
+
+
+def _time(value: Optional[datetime.datetime]) -> str:
+    return value.strftime(REPORT_TIME_FORMAT).upper() if value else ''
+
+
+def _tablespace_status(used_pct: Optional[float]) -> str:
+    # 与 daily_report_prod.sql 中的 CASE 相同
+    if used_pct is None:
+        return 'OK'
+    if used_pct > 90:
+        return 'DANGER'
+    if 80 < used_pct < 90:
+        return 'WARNING'
+    return 'OK'
+
+
+def format_daily_report(report: DailyReport) -> str:
+    """把每日报告排成文本，用于显示日志和检查错误模式（对应HTML报告中的内容）。"""
+    lines = []
+    for instance in report.instances:
+        lines.append(f"[{instance.database}] 实例 {instance.inst_id} {instance.database_name} {instance.instance_name} "
+                     f"{instance.status} {instance.host_name} {instance.database_role} {instance.protection_mode} "
+                     f"START TIME {_time(instance.start_time)}".rstrip())
+    if report.last_applied or report.last_received:
+        lines.append(f"Last Applied  : {_time(report.last_applied)}")
+        lines.append(f"Last Received : {_time(report.last_received)}")
+    if report.gaps is not None:
+        lines.append(f"GAPS: {report.gaps}")
+    if report.not_applied is not None:
+        lines.append(f"NOT APPLIED: {report.not_applied}")
+    if report.deleted_archive_logs is not None:
+        lines.append(f"DELETED ARCHIVE LOGS: {report.deleted_archive_logs}")
+    for ts in report.tablespaces:
+        used = f"{ts.used_pct:.2f}%" if ts.used_pct is not None else "-"
+        lines.append(f"[{ts.database}] TABLESPACE {ts.name} {ts.type} USED {used} {ts.status}")
+    for key, count in report.connections.items():
+        lines.append(f"DATABASE CONNECTIONS {key}: {count}")
+    for job in report.rman_jobs:
+        lines.append(f"[{job.database}] RMAN {job.session_recid} {job.input_type} {_time(job.start_time)} "
+                     f"{job.status} {job.time_taken}")
+    lines.extend(report.alerts)
+    return "\n".join(lines) + "\n"
+
+
+class OracleBackend:
+    """用 python-oracledb（thin 模式，不需要 Oracle 客户端）直接查询数据库，代替 sqlplus 脚本。
+
+    每个连接串保持一个会话池，连接在多轮检查之间复用，不再为每轮启动 sqlplus
+    进程、登录和解析输出；查询结果直接组装为 ArchivedLog / DailyReport 交给分析。
+    驱动可以替换为实现同样接口的模块（create_pool、AUTH_MODE_SYSDBA），
+    没有数据库时可用 fake_oracledb 运行。
+
+    属性:
+        driver: 数据库驱动模块
+        pool_min (int): 每个会话池的最少连接数
+        pool_max (int): 每个会话池的最多连接数
+    """
+
+    def __init__(self, driver=None, pool_min: int = DEFAULT_POOL_MIN, pool_max: int = DEFAULT_POOL_MAX):
+        self.driver = driver or load_driver()
+        self.pool_min = pool_min
+        self.pool_max = max(pool_min, pool_max)
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, conn: ConnectionSettings):
+        key = (conn.user.lower(), conn.dsn, conn.sysdba)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                params = dict(user=conn.user, password=conn.password, dsn=conn.dsn,
+                              min=self.pool_min, max=self.pool_max, increment=1)
+                if conn.sysdba:
+                    params['mode'] = self.driver.AUTH_MODE_SYSDBA
+                pool = self.driver.create_pool(**params)
+                self._pools[key] = pool
+                logger.info(f"已创建数据库会话池: {conn.user}@{conn.dsn}")
+        return pool
+
+    def query(self, conn: ConnectionSettings, sql: str, params: Optional[Dict] = None,
+              timeout: int = 0) -> List[tuple]:
+        """执行一条查询并返回所有行。
+
+        Args:
+            conn: 连接设置
+            sql: 查询语句
+            params: 绑定变量
+            timeout: 单次调用超时（秒），0 表示不限制
+        """
+        with self._pool(conn).acquire() as connection:
+            connection.call_timeout = timeout * 1000
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params or {})
+                return cursor.fetchall()
+
+    def _count(self, conn: ConnectionSettings, sql: str, timeout: int) -> int:
+        rows = self.query(conn, sql, timeout=timeout)
+        return int(rows[0][0] or 0) if rows else 0
+
+    # ---------- check_standby ----------
+
+    def check_standby(self, conn: ConnectionSettings, watermarks: Optional[Dict[int, int]] = None,
+                      timeout: int = 0) -> StandbyCheck:
+        """运行 check_standby.sql 中的查询，归档日志只查询水位线之后的行。
+
+        Args:
+            conn: 备库连接设置
+            watermarks: 每个线程已连续应用到的序列号
+            timeout: 单次查询超时（秒）
+        """
+        check = StandbyCheck()
+        check.processes = [(process, status, int(sequence or 0)) for process, status, sequence
+                           in self.query(conn, STANDBY_PROCESSES_SQL, timeout=timeout)]
+        rows = self.query(conn, STANDBY_DATABASE_SQL, timeout=timeout)
+        if rows:
+            check.database = dict(zip(('DATABASE_ROLE', 'CONTROLFILE_TYPE', 'OPEN_MODE', 'PROTECTION_MODE'), rows[0]))
+            check.resetlogs_change = int(rows[0][4])
+
+        # 水位线用绑定变量传入，语句文本只随线程数变化，可以复用解析结果
+        conditions, params = [], {}
+        for i, (thread, sequence) in enumerate(sorted((watermarks or {}).items())):
+            conditions.append(f" and not (thread# = :t{i} and sequence# <= :s{i})")
+            params[f"t{i}"] = thread
+            params[f"s{i}"] = sequence
+        where = "".join(conditions)
+        check.archived_logs = [ArchivedLog(int(thread), int(sequence), applied) for thread, sequence, applied
+                               in self.query(conn, ARCHIVED_LOGS_SQL.format(where=where), params, timeout)]
+        return check
+
+    # ---------- daily_report ----------
+
+    def daily_report(self, settings: DatabaseSettings, timeout: int = 0) -> DailyReport:
+        """运行 daily_report_dg.sql（备库）和 daily_report_prod.sql（主库）中的查询。"""
+        report = DailyReport()
+        self._add_standby_report(report, settings.standby, timeout)
+        if settings.production is not None:
+            self._add_production_report(report, settings.production, timeout)
+        return report
+
+    def _add_instances(self, report: DailyReport, conn: ConnectionSettings, database: str, timeout: int) -> None:
+        for inst_id, name, instance_name, status, host_name, role, protection_mode, startup_time, sysdate \
+                in self.query(conn, INSTANCES_SQL, timeout=timeout):
+            report.instances.append(InstanceInfo(
+                database=database,
+                inst_id=str(inst_id),
+                database_name=name or '',
+                instance_name=instance_name or '',
+                status=status or '',
+                host_name=host_name or '',
+                database_role=role or '',
+                protection_mode=protection_mode or '',
+                start_time=startup_time,
+                system_date=sysdate,
+            ))
+
+    def _add_standby_report(self, report: DailyReport, conn: ConnectionSettings, timeout: int) -> None:
+        self._add_instances(report, conn, DATABASE_STANDBY, timeout)
+
+        rows = self.query(conn, INSTANCE_STATUS_SQL, timeout=timeout)
+        if rows and rows[0][0] != 'MOUNTED':
+            report.alerts.append(ALERT_NOT_MOUNTED)
+
+        rows = self.query(conn, APPLIED_LOGS_SQL, timeout=timeout)
+        if rows:
+            report.last_applied, report.last_received = rows[0]
+
+        report.gaps = self._count(conn, ARCHIVE_GAPS_SQL, timeout)
+        if report.gaps > 0:
+            report.alerts.append(ALERT_NOT_IN_SYNC)
+        report.not_applied = self._count(conn, NOT_APPLIED_SQL, timeout)
+        if report.not_applied > 0:
+            report.alerts.append(ALERT_NOT_APPLIED)
+        report.deleted_archive_logs = self._count(conn, DELETED_ARCHIVE_LOGS_SQL, timeout)
+
+    def _add_production_report(self, report: DailyReport, conn: ConnectionSettings, timeout: int) -> None:
+        self._add_instances(report, conn, DATABASE_PRODUCTION, timeout)
+
+        for name, size_mb, max_size_mb, used_pct, contents in self.query(conn, TABLESPACE_SQL, timeout=timeout):
+            used_pct = float(used_pct) if used_pct is not None else None
+            report.tablespaces.append(TablespaceUsage(
+                database=DATABASE_PRODUCTION,
+                name=name,
+                size_mb=float(size_mb) if size_mb is not None else None,
+                max_size_mb=float(max_size_mb) if max_size_mb is not None else None,
+                used_pct=used_pct,
+                type=contents or '',
+                status=_tablespace_status(used_pct),
+            ))
+
+        for inst_id, count in self.query(conn, CONNECTIONS_SQL, timeout=timeout):
+            report.connections[f"{DATABASE_PRODUCTION}/{inst_id}"] = int(count)
+
+        # 每个用户的无效对象数（HTML报告中为序号，这里是实际数量）
+        invalid_objects = self.query(conn, INVALID_OBJECTS_SQL, timeout=timeout)
+        if invalid_objects:
+            report.alerts.append(ALERT_INVALID_OBJECTS)
+        for owner, count in invalid_objects:
+            report.invalid_objects[owner] = int(count)
+            report.alerts.append(f"{count} invalid object in {owner} schema.")
+
+        if self._count(conn, BACKUP_COUNT_SQL, timeout) == 0:
+            report.no_backup_found = True
+            report.alerts.append(ALERT_NO_BACKUP)
+
+        for session_recid, start_time, end_time, output_mb, status, input_type, time_taken \
+                in self.query(conn, RMAN_JOBS_SQL, timeout=timeout):
+            duration = int((end_time - start_time).total_seconds()) if start_time and end_time else None
+            report.rman_jobs.append(RmanJob(
+                database=DATABASE_PRODUCTION,
+                session_recid=str(session_recid),
+                start_time=start_time,
+                end_time=end_time,
+                output_mb=float(output_mb) if output_mb is not None else None,
+                status=(status or '').upper(),
+                input_type=input_type or '',
+                time_taken=time_taken or '',
+                duration_seconds=duration,
+            ))
+
+    def close(self) -> None:
+        """关闭所有会话池。"""
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            try:
+                pool.close(force=True)
+            except Exception as e:
+                logger.error(f"关闭数据库会话池时出错: {e}")
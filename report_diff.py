@@ -0,0 +1,215 @@
+import os
+import json
+import logging
+import datetime
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from report_parser import DailyReport
+from archive_tracker import ThreadStatus
+
+logger = logging.getLogger("OperaMonitor")
+
+SNAPSHOT_VERSION = 1
+
+# 表空间使用率变化小于此值（百分点）时不列出
+TABLESPACE_DELTA_MIN = 0.1
+
+_TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+def _time(value: Optional[datetime.datetime]) -> Optional[str]:
+    return value.strftime(_TIME_FORMAT) if value else None
+
+
+def take_snapshot(report: DailyReport, archive_status: List[ThreadStatus],
+                  now: Optional[datetime.datetime] = None) -> Dict:
+    """把一轮的报告记录和归档日志状态转换为可保存、可比较的快照。"""
+    return {
+        'version': SNAPSHOT_VERSION,
+        'taken': _time(now or datetime.datetime.now()),
+        'instances': {f"{i.database}/{i.instance_name or i.database_name or i.inst_id}": {
+            'role': i.database_role, 'status': i.status, 'start_time': _time(i.start_time)}
+            for i in report.instances},
+        'tablespaces': {f"{ts.database}/{ts.name}": {'used_pct': ts.used_pct, 'status': ts.status}
+                        for ts in report.tablespaces},
+        'invalid_objects': dict(report.invalid_objects),
+        'rman_jobs': {f"{job.database}/{job.session_recid}": {
+            'status': job.status, 'input_type': job.input_type, 'start_time': _time(job.start_time)}
+            for job in report.rman_jobs},
+        'no_backup_found': report.no_backup_found,
+        'gaps': report.gaps,
+        'not_applied': report.not_applied,
+        'deleted_archive_logs': report.deleted_archive_logs,
+        'threads': {str(status.thread): {'applied': status.applied, 'received': status.received}
+                    for status in archive_status},
+    }
+
+
+@dataclass
+class ReportDiff:
+    """两轮报告之间的结构化差异，每个部分是一组说明。
+
+    属性:
+        previous_taken (str): 上一轮快照的时间
+        sections (dict): 部分名称 -> 变化说明列表，只包含有变化的部分
+    """
+    previous_taken: str = ''
+    sections: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.sections)
+
+    def add(self, section: str, line: str) -> None:
+        self.sections.setdefault(section, []).append(line)
+
+    def format(self) -> str:
+        if not self.sections:
+            return f"   与上一轮 ({self.previous_taken}) 相比没有变化\n"
+        lines = [f"   与上一轮 ({self.previous_taken}) 相比:\n"]
+        for section, changes in self.sections.items():
+            lines.append(f"   [{section}]\n")
+            lines.extend(f"   - {change}\n" for change in changes)
+        return "".join(lines)
+
+    def to_dict(self) -> Dict:
+        return {'previous_taken': self.previous_taken, 'sections': self.sections}
+
+
+def _count_change(diff: ReportDiff, section: str, label: str, old, new) -> None:
+    if old != new and new is not None:
+        diff.add(section, f"{label}: {old if old is not None else '-'} → {new}")
+
+
+def diff_snapshots(previous: Dict, current: Dict) -> ReportDiff:
+    """比较两个快照，只列出有变化的部分。"""
+    diff = ReportDiff(previous_taken=previous.get('taken', ''))
+
+    # 实例：角色、状态变化和重启
+    section = "实例"
+    old_instances, new_instances = previous.get('instances', {}), current['instances']
+    for key, new in new_instances.items():
+        old = old_instances.get(key)
+        if old is None:
+            diff.add(section, f"新出现的实例 {key} ({new['role']}, {new['status']})")
+            continue
+        if old['role'] != new['role']:
+            diff.add(section, f"{key} 角色: {old['role']} → {new['role']}")
+        if old['status'] != new['status']:
+            diff.add(section, f"{key} 状态: {old['status']} → {new['status']}")
+        if old['start_time'] != new['start_time'] and new['start_time']:
+            diff.add(section, f"{key} 已重启 (启动时间 {old['start_time'] or '-'} → {new['start_time']})")
+    for key in old_instances.keys() - new_instances.keys():
+        diff.add(section, f"实例 {key} 不再出现在报告中")
+
+    # 归档日志：每个线程的应用进度
+    section = "归档日志"
+    old_threads = previous.get('threads', {})
+    for thread, new in sorted(current['threads'].items(), key=lambda item: int(item[0])):
+        old = old_threads.get(thread)
+        if old is None:
+            continue
+        progress = new['applied'] - old['applied']
+        if progress > 0:
+            diff.add(section, f"线程{thread} 应用 SEQUENCE# {old['applied']} → {new['applied']} (+{progress})")
+        elif new['received'] > old['received']:
+            diff.add(section, f"线程{thread} 应用未推进 (停留在 SEQUENCE# {new['applied']}，"
+                              f"已接收至 {new['received']})")
+    _count_change(diff, section, "归档日志间隙", previous.get('gaps'), current['gaps'])
+    _count_change(diff, section, "未应用日志", previous.get('not_applied'), current['not_applied'])
+    _count_change(diff, section, "可删除的已应用日志", previous.get('deleted_archive_logs'),
+                  current['deleted_archive_logs'])
+
+    # 表空间：使用率变化
+    section = "表空间"
+    old_tablespaces = previous.get('tablespaces', {})
+    for key, new in current['tablespaces'].items():
+        old = old_tablespaces.get(key)
+        if old is None:
+            diff.add(section, f"新的表空间 {key} ({new['used_pct']}%)")
+            continue
+        if old['used_pct'] is not None and new['used_pct'] is not None:
+            delta = new['used_pct'] - old['used_pct']
+            if abs(delta) >= TABLESPACE_DELTA_MIN or old['status'] != new['status']:
+                status = f", {old['status']} → {new['status']}" if old['status'] != new['status'] else ""
+                diff.add(section, f"{key} {old['used_pct']:.2f}% → {new['used_pct']:.2f}% ({delta:+.2f}{status})")
+    for key in old_tablespaces.keys() - current['tablespaces'].keys():
+        diff.add(section, f"表空间 {key} 不再出现在报告中")
+
+    # 无效对象：新增或数量变化的用户
+    section = "无效对象"
+    old_invalid = previous.get('invalid_objects', {})
+    for owner, count in current['invalid_objects'].items():
+        if owner not in old_invalid:
+            diff.add(section, f"{owner} 新增 {count} 个无效对象")
+        elif old_invalid[owner] != count:
+            diff.add(section, f"{owner}: {old_invalid[owner]} → {count}")
+    for owner in old_invalid.keys() - current['invalid_objects'].keys():
+        diff.add(section, f"{owner} 已没有无效对象")
+
+    # 备份：新的任务和失败
+    section = "备份"
+    old_jobs = previous.get('rman_jobs', {})
+    for key, job in current['rman_jobs'].items():
+        old = old_jobs.get(key)
+        failed = 'FAILED' in job['status']
+        if old is None:
+            mark = "❌ 失败的" if failed else "新的"
+            diff.add(section, f"{mark}备份任务 {key} {job['input_type']} {job['start_time'] or ''} {job['status']}")
+        elif old['status'] != job['status']:
+            diff.add(section, f"备份任务 {key} 状态: {old['status']} → {job['status']}")
+    if current['no_backup_found'] and not previous.get('no_backup_found'):
+        diff.add(section, "最近3天没有备份记录")
+
+    return diff
+
+
+class SnapshotStore:
+    """保存每个目标最近一次的报告快照（JSON），用于和下一轮比较。
+
+    属性:
+        state_path (str): 快照文件路径
+    """
+
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._snapshots = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                snapshots = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取报告快照时出错，下一轮不比较变化: {e}")
+            return {}
+        return {target: snapshot for target, snapshot in snapshots.items()
+                if snapshot.get('version') == SNAPSHOT_VERSION}
+
+    def _save(self) -> None:
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir and not os.path.exists(state_dir):
+            os.makedirs(state_dir)
+        # 先写临时文件再替换，避免中途退出时损坏状态文件
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._snapshots, f, ensure_ascii=False)
+        os.replace(temp_path, self.state_path)
+
+    def previous(self, target: str) -> Optional[Dict]:
+        with self._lock:
+            return self._snapshots.get(target)
+
+    def compare(self, target: str, snapshot: Dict) -> Optional[ReportDiff]:
+        """与上一轮快照比较并保存本轮快照；没有上一轮时返回 None。"""
+        with self._lock:
+            previous = self._snapshots.get(target)
+            self._snapshots[target] = snapshot
+            self._save()
+        if previous is None:
+            return None
+        return diff_snapshots(previous, snapshot)
@@ -0,0 +1,309 @@
+import re
+import datetime
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from issue_matcher import read_line_blocks
+
+# 报告中 <h2> 标题对应的数据库
+DATABASE_STANDBY = 'standby'
+DATABASE_PRODUCTION = 'production'
+
+# SQL*Plus 中 to_char(..., 'DD-MON-YYYY HH24:MI') 的格式
+REPORT_TIME_FORMAT = '%d-%b-%Y %H:%M'
+
+_INVALID_OBJECTS_RE = re.compile(r'(\d+)\s+invalid object in\s+(\S+)\s+schema', re.IGNORECASE)
+
+
+def parse_number(text: str) -> Optional[float]:
+    """解析SQL*Plus格式化后的数字（如 "1,234.000"），无法解析时返回None。"""
+    text = text.replace(',', '').strip()
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_time(text: str) -> Optional[datetime.datetime]:
+    try:
+        return datetime.datetime.strptime(text.strip(), REPORT_TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def parse_duration(text: str) -> Optional[int]:
+    """解析RMAN的 TIME_TAKEN_DISPLAY（HH:MM:SS），返回秒数。"""
+    parts = text.strip().split(':')
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        return None
+    hours, minutes, seconds = (int(part) for part in parts)
+    return hours * 3600 + minutes * 60 + seconds
+
+
+@dataclass
+class InstanceInfo:
+    """General Database Information 中的一行。"""
+    database: str
+    inst_id: str
+    database_name: str
+    instance_name: str
+    status: str
+    host_name: str
+    database_role: str
+    protection_mode: str = ''
+    start_time: Optional[datetime.datetime] = None
+    system_date: Optional[datetime.datetime] = None
+
+    def uptime_days(self, now: Optional[datetime.datetime] = None) -> Optional[int]:
+        if self.start_time is None:
+            return None
+        now = now or self.system_date or datetime.datetime.now()
+        return (now - self.start_time).days
+
+
+@dataclass
+class TablespaceUsage:
+    """Tablespace usage 中的一行。"""
+    database: str
+    name: str
+    size_mb: Optional[float]
+    max_size_mb: Optional[float]
+    used_pct: Optional[float]
+    type: str
+    status: str
+
+
+@dataclass
+class RmanJob:
+    """最近3天的RMAN备份任务。"""
+    database: str
+    session_recid: str
+    start_time: Optional[datetime.datetime]
+    end_time: Optional[datetime.datetime]
+    output_mb: Optional[float]
+    status: str
+    input_type: str
+    time_taken: str
+    duration_seconds: Optional[int]
+
+
+@dataclass
+class ReportTable:
+    """报告中的一个原始表格。"""
+    database: str
+    section: str
+    headers: List[str]
+    rows: List[List[str]]
+
+
+@dataclass
+class DailyReport:
+    """解析后的每日报告。
+
+    gaps / not_applied 等计数在报告中不存在时为 None。
+    """
+    instances: List[InstanceInfo] = field(default_factory=list)
+    tablespaces: List[TablespaceUsage] = field(default_factory=list)
+    rman_jobs: List[RmanJob] = field(default_factory=list)
+    connections: Dict[str, int] = field(default_factory=dict)
+    invalid_objects: Dict[str, int] = field(default_factory=dict)
+    alerts: List[str] = field(default_factory=list)
+    tables: List[ReportTable] = field(default_factory=list)
+    gaps: Optional[int] = None
+    not_applied: Optional[int] = None
+    deleted_archive_logs: Optional[int] = None
+    last_applied: Optional[datetime.datetime] = None
+    last_received: Optional[datetime.datetime] = None
+    no_backup_found: bool = False
+
+    def has_role(self, role: str) -> bool:
+        return any(instance.database_role.upper() == role for instance in self.instances)
+
+
+class ReportParser(HTMLParser):
+    """daily_report_dg.sql / daily_report_prod.sql 生成的 SET MARKUP HTML 报告的流式解析器。
+
+    报告按块喂入，一次扫描即可得到实例、表空间、归档间隙、RMAN任务等结构化记录。
+    表格按表头列名识别，不依赖全文的子串匹配。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.report = DailyReport()
+        self._database = ''
+        self._section = ''
+        self._heading = None   # 正在读取的 h2/h3 标签名
+        self._text = []
+        self._font_color = []  # 嵌套 <font> 的颜色
+        self._alert = []       # 红色字体中的文本
+        self._headers = None
+        self._rows = None
+        self._cell = None
+        self._row = None
+
+    # ---------- HTMLParser 回调 ----------
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('h2', 'h3'):
+            self._heading = tag
+            self._text = []
+        elif tag == 'table':
+            self._headers = []
+            self._rows = []
+        elif tag == 'tr' and self._rows is not None:
+            self._row = []
+        elif tag in ('th', 'td') and self._row is not None:
+            self._cell = []
+        elif tag == 'font':
+            self._font_color.append((dict(attrs).get('color') or '').upper())
+
+    def handle_endtag(self, tag):
+        if tag == self._heading:
+            title = ''.join(self._text).strip()
+            if tag == 'h2':
+                self._database = DATABASE_STANDBY if 'standby' in title.lower() else DATABASE_PRODUCTION
+            self._section = title.rstrip(':')
+            self._heading = None
+        elif tag in ('th', 'td') and self._cell is not None:
+            text = ' '.join(''.join(self._cell).split())
+            if tag == 'th':
+                self._headers.append(text.upper())
+            else:
+                self._row.append(text)
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            if self._row:
+                self._rows.append(self._row)
+            self._row = None
+        elif tag == 'table' and self._rows is not None:
+            self._finish_table(self._headers, self._rows)
+            self._headers = None
+            self._rows = None
+        elif tag == 'font' and self._font_color:
+            color = self._font_color.pop()
+            if color == '#FF0000' and not self._font_color and self._cell is None:
+                self._add_alert(''.join(self._alert))
+                self._alert = []
+
+    def handle_data(self, data):
+        if self._heading:
+            self._text.append(data)
+        if self._cell is not None:
+            self._cell.append(data)
+        elif '#FF0000' in self._font_color:
+            self._alert.append(data)
+
+    # ---------- 记录提取 ----------
+
+    def _add_alert(self, text: str) -> None:
+        text = ' '.join(text.split())
+        if not text:
+            return
+        self.report.alerts.append(text)
+
+        match = _INVALID_OBJECTS_RE.search(text)
+        if match:
+            self.report.invalid_objects[match.group(2)] = int(match.group(1))
+        elif 'no backup information found' in text.lower():
+            self.report.no_backup_found = True
+
+    def _finish_table(self, headers: List[str], rows: List[List[str]]) -> None:
+        if not headers:
+            return
+        self.report.tables.append(ReportTable(self._database, self._section, headers, rows))
+
+        for row in rows:
+            record = dict(zip(headers, row))
+            if 'DATABASE ROLE' in record:
+                self._add_instance(record)
+            elif 'TABLESPACE' in record and 'USED %' in record:
+                self._add_tablespace(record)
+            elif 'SESSION RECID' in record:
+                self._add_rman_job(record)
+            elif 'DATABASE CONNECTIONS' in record:
+                count = parse_number(record['DATABASE CONNECTIONS'])
+                if count is not None:
+                    key = f"{self._database}/{record.get('INSTANCE', '')}"
+                    self.report.connections[key] = int(count)
+            elif 'GAPS' in record:
+                self.report.gaps = _parse_count(record['GAPS'], self.report.gaps)
+            elif 'NOT APPLIED' in record:
+                self.report.not_applied = _parse_count(record['NOT APPLIED'], self.report.not_applied)
+            elif 'DELETED ARCHIVE LOGS' in record:
+                self.report.deleted_archive_logs = _parse_count(
+                    record['DELETED ARCHIVE LOGS'], self.report.deleted_archive_logs)
+            elif 'LOGS' in record and 'TIME' in record:
+                logs = record['LOGS'].lower()
+                if 'last applied' in logs:
+                    self.report.last_applied = parse_time(record['TIME'])
+                elif 'last received' in logs:
+                    self.report.last_received = parse_time(record['TIME'])
+
+    def _add_instance(self, record: Dict[str, str]) -> None:
+        self.report.instances.append(InstanceInfo(
+            database=self._database,
+            inst_id=record.get('INST_ID', ''),
+            database_name=record.get('DATABASE NAME', ''),
+            instance_name=record.get('INSTANCE NAME', ''),
+            status=record.get('STATUS', ''),
+            host_name=record.get('HOST NAME', ''),
+            database_role=record.get('DATABASE ROLE', ''),
+            protection_mode=record.get('PROTECTION MODE', ''),
+            start_time=parse_time(record.get('START TIME', '')),
+            system_date=parse_time(record.get('SYSTEM DATE', '')),
+        ))
+
+    def _add_tablespace(self, record: Dict[str, str]) -> None:
+        self.report.tablespaces.append(TablespaceUsage(
+            database=self._database,
+            name=record['TABLESPACE'],
+            size_mb=parse_number(record.get('SIZE (M)', '')),
+            max_size_mb=parse_number(record.get('MAX SIZE (M)', '')),
+            used_pct=parse_number(record['USED %']),
+            type=record.get('TYPE', ''),
+            status=record.get('STATUS', '').upper(),
+        ))
+
+    def _add_rman_job(self, record: Dict[str, str]) -> None:
+        time_taken = record.get('TIME TAKEN', '')
+        self.report.rman_jobs.append(RmanJob(
+            database=self._database,
+            session_recid=record['SESSION RECID'],
+            start_time=parse_time(record.get('START_TIME', '')),
+            end_time=parse_time(record.get('END_TIME', '')),
+            output_mb=parse_number(record.get('OUTPUT (M)', '')),
+            status=record.get('STATUS', '').upper(),
+            input_type=record.get('INPUT_TYPE', ''),
+            time_taken=time_taken,
+            duration_seconds=parse_duration(time_taken),
+        ))
+
+    # ---------- 入口 ----------
+
+    def feed_blocks(self, blocks: Iterable[str]) -> Iterator[str]:
+        """边解析边把文本块原样传递下去，便于与其他扫描共用一次文件读取。"""
+        for block in blocks:
+            self.feed(block)
+            yield block
+
+    def result(self) -> DailyReport:
+        self.close()
+        return self.report
+
+
+def _parse_count(text: str, current: Optional[int]) -> Optional[int]:
+    """解析计数；同一报告中出现多次时累加。"""
+    value = parse_number(text)
+    if value is None:
+        return current
+    return int(value) + (current or 0)
+
+
+def parse_report_file(file_path: str, encoding: str = 'utf-8') -> DailyReport:
+    """流式解析报告文件。"""
+    parser = ReportParser()
+    with open(file_path, 'r', encoding=encoding, errors='replace') as f:
+        for block in read_line_blocks(f):
+            parser.feed(block)
+    return parser.result()
@@ -0,0 +1,288 @@
+import re
+import time
+import logging
+import datetime
+import threading
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("OperaMonitor")
+
+# 空闲时最长的单次等待（秒）。到期时间按墙上时钟计算，定期醒来重新计算，
+# 以应对系统休眠或手动调整时间
+MAX_WAIT = 300
+
+# cron 表达式中最多向后查找的天数
+CRON_SEARCH_DAYS = 366 * 5
+
+_INTERVAL_RE = re.compile(r"^(?:every\s+)?(\d+)\s*([smhd]?)$", re.IGNORECASE)
+_INTERVAL_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class IntervalSchedule:
+    """固定间隔的计划，按开始时间对齐，不会因每轮的运行时间而漂移。
+
+    属性:
+        seconds (int): 间隔秒数
+    """
+
+    def __init__(self, seconds: int):
+        if seconds <= 0:
+            raise ValueError(f"间隔必须大于0: {seconds}")
+        self.seconds = seconds
+        self.anchor = None
+
+    def next_after(self, moment: datetime.datetime) -> datetime.datetime:
+        if self.anchor is None:
+            self.anchor = moment
+            return moment + datetime.timedelta(seconds=self.seconds)
+        periods = int((moment - self.anchor).total_seconds() // self.seconds) + 1
+        return self.anchor + datetime.timedelta(seconds=periods * self.seconds)
+
+    def __str__(self):
+        return f"每{self.seconds}秒"
+
+
+class CronSchedule:
+    """5字段 cron 表达式（分 时 日 月 周），支持 *、*/n、a-b、a-b/n 和逗号列表。
+
+    周日为0（也可以写7）。日和周都不是 * 时，满足其中之一即可（与cron相同）。
+    """
+
+    _FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7))
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        parts = self.expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron表达式需要5个字段: {expression}")
+        values = [self._parse_field(part, low, high) for part, (_, low, high) in zip(parts, self._FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = parts[2] == '*'
+        self._any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse_field(text: str, low: int, high: int) -> Set[int]:
+        values = set()
+        for item in text.split(','):
+            step = 1
+            if '/' in item:
+                item, step_text = item.split('/', 1)
+                step = int(step_text)
+                if step <= 0:
+                    raise ValueError(f"cron步长必须大于0: {text}")
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start, end = (int(value) for value in item.split('-', 1))
+            else:
+                start = int(item)
+                end = high if step > 1 else start
+            if start < low or end > high or start > end:
+                raise ValueError(f"cron字段超出范围 {low}-{high}: {text}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime.datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.isoweekday() % 7) in self.weekdays
+        if self._any_day:
+            return weekday_ok
+        if self._any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment: datetime.datetime) -> datetime.datetime:
+        candidate = moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = moment + datetime.timedelta(days=CRON_SEARCH_DAYS)
+        # 逐级跳过不匹配的月、日、时、分，循环次数有上限
+        while candidate <= limit:
+            if candidate.month not in self.months:
+                year, month = (candidate.year + 1, 1) if candidate.month == 12 else (candidate.year, candidate.month + 1)
+                candidate = candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self._day_matches(candidate):
+                candidate = (candidate + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + datetime.timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += datetime.timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"cron表达式没有可用的时间: {self.expression}")
+
+    def __str__(self):
+        return self.expression
+
+
+def parse_schedule(text: str):
+    """解析计划配置。
+
+    支持秒数（"300"）、带单位的间隔（"5m"、"every 2h"、"1d"）和5字段cron表达式（"0 6 * * *"）。
+
+    Returns:
+        IntervalSchedule 或 CronSchedule，配置为空时返回 None
+
+    Raises:
+        ValueError: 无法解析
+    """
+    text = (text or '').strip()
+    if not text:
+        return None
+    match = _INTERVAL_RE.match(text)
+    if match:
+        return IntervalSchedule(int(match.group(1)) * _INTERVAL_UNITS[match.group(2).lower()])
+    return CronSchedule(text)
+
+
+class ScheduledJob:
+    """计划中的一项检查。
+
+    属性:
+        name (str): 名称
+        schedule: IntervalSchedule 或 CronSchedule
+        callback (callable): 到期时调用的函数
+        supersedes (tuple): 本任务运行时同时到期、可以一并跳过的其他任务名称
+        next_run (datetime): 下一次运行时间
+        missed (int): 累计错过的次数
+        run_immediately (bool): 启动后是否立即运行一次
+    """
+
+    def __init__(self, name: str, schedule, callback: Callable[[], None], supersedes: Iterable[str] = ()):
+        self.name = name
+        self.schedule = schedule
+        self.callback = callback
+        self.supersedes = tuple(supersedes)
+        self.next_run = None
+        self.missed = 0
+        self.run_immediately = False
+
+
+class Scheduler:
+    """在单个后台线程中按计划运行检查。
+
+    空闲时阻塞在 Event 上直到最近的到期时间，不会周期性轮询；
+    stop() 会立即唤醒线程。运行时间按计划对齐，不会因每轮耗时而漂移。
+    由于上一轮运行过久或系统休眠而错过的时间点会合并为一次补跑
+    （run_missed 为 False 时直接跳到下一个时间点），并记录错过的次数。
+
+    属性:
+        run_missed (bool): 是否补跑错过的计划
+        log_callback (callable): 日志回调函数
+    """
+
+    def __init__(self, run_missed: bool = True, log_callback: Optional[Callable[[str], None]] = None,
+                 max_wait: float = MAX_WAIT):
+        self.run_missed = run_missed
+        self.log_callback = log_callback
+        self.max_wait = max_wait
+        self.jobs: List[ScheduledJob] = []
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+    def log_message(self, message: str) -> None:
+        if self.log_callback:
+            self.log_callback(message)
+        else:
+            logger.info(message)
+
+    def add_job(self, name: str, schedule, callback: Callable[[], None], supersedes: Iterable[str] = (),
+                run_immediately: bool = False) -> ScheduledJob:
+        """添加任务。
+
+        Args:
+            name: 任务名称
+            schedule: IntervalSchedule 或 CronSchedule
+            callback: 到期时调用的函数
+            supersedes: 本任务运行时可以一并跳过的其他同时到期任务
+            run_immediately: 启动后立即运行一次，之后再按计划运行
+        """
+        job = ScheduledJob(name, schedule, callback, supersedes)
+        job.run_immediately = run_immediately
+        self.jobs.append(job)
+        return job
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        now = datetime.datetime.now()
+        for job in self.jobs:
+            job.next_run = job.schedule.next_after(now)
+            if job.run_immediately:
+                job.next_run = now
+            self.log_message(f"计划任务 {job.name} ({job.schedule})，下次运行: {job.next_run:%Y-%m-%d %H:%M:%S}")
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止计划，正在等待的线程立即返回；正在运行的任务会运行完。"""
+        self._stop_event.set()
+        self._wake_event.set()
+        if timeout is not None and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop_event.is_set()
+
+    def next_runs(self) -> List[Tuple[str, datetime.datetime]]:
+        return [(job.name, job.next_run) for job in self.jobs if job.next_run is not None]
+
+    def _wait_until_due(self) -> bool:
+        """阻塞到最近的任务到期，返回 False 表示已停止。"""
+        while not self._stop_event.is_set():
+            now = datetime.datetime.now()
+            due = min(job.next_run for job in self.jobs)
+            remaining = (due - now).total_seconds()
+            if remaining <= 0:
+                return True
+            # 用单调时钟计算截止时间，提前醒来（如被唤醒）时重新计算
+            deadline = time.monotonic() + min(remaining, self.max_wait)
+            while not self._stop_event.is_set():
+                wait_time = deadline - time.monotonic()
+                if wait_time <= 0:
+                    break
+                if self._wake_event.wait(wait_time):
+                    self._wake_event.clear()
+                    break
+        return False
+
+    def _run(self) -> None:
+        if not self.jobs:
+            return
+        while self._wait_until_due():
+            now = datetime.datetime.now()
+            due = [job for job in self.jobs if job.next_run <= now]
+            superseded = set()
+            for job in due:
+                if self._stop_event.is_set():
+                    return
+                if job.name in superseded:
+                    continue
+                self._run_job(job)
+                superseded.update(job.supersedes)
+
+            # 计算下一次运行时间，统计运行期间错过的时间点
+            now = datetime.datetime.now()
+            for job in due:
+                missed = 0
+                next_run = job.schedule.next_after(job.next_run)
+                while next_run <= now:
+                    missed += 1
+                    next_run = job.schedule.next_after(next_run)
+                if missed:
+                    job.missed += missed
+                    if self.run_missed:
+                        # 错过的时间点合并为一次，立即补跑
+                        next_run = now
+                        self.log_message(f"计划任务 {job.name} 错过了{missed}次运行，将立即补跑一次")
+                    else:
+                        self.log_message(f"计划任务 {job.name} 错过了{missed}次运行，已跳过")
+                job.next_run = next_run
+
+    def _run_job(self, job: ScheduledJob) -> None:
+        try:
+            job.callback()
+        except Exception as e:
+            self.log_message(f"计划任务 {job.name} 运行出错: {e}")
+            logger.error(f"计划任务 {job.name} 运行出错", exc_info=True)
@@ -0,0 +1,223 @@
+import os
+import io
+import sys
+import codecs
+import time
+import shlex
+import signal
+import logging
+import threading
+import subprocess
+from collections import deque
+from typing import Callable, List, Optional
+
+from log_pipeline import bind_context
+
+logger = logging.getLogger("OperaMonitor")
+
+# 默认最多保留的输出字符数（超过后丢弃最早的部分）
+DEFAULT_MAX_OUTPUT_SIZE = 10 * 1024 * 1024
+# 每次从管道读取的字节数
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# 输出回调：output_callback(source, lines)，source 为 'stdout' 或 'stderr'
+OutputCallback = Callable[[str, List[str]], None]
+
+# 等待脚本结束时检查取消标志的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.2
+
+
+class ScriptCancelled(Exception):
+    """脚本被用户取消。
+
+    属性:
+        cmd (str): 被取消的批处理文件
+        output (str): 取消前已读取的输出
+    """
+
+    def __init__(self, cmd: str, output: str = ""):
+        super().__init__(f"脚本已取消: {cmd}")
+        self.cmd = cmd
+        self.output = output
+
+
+class OutputBuffer:
+    """分块保存脚本输出，追加为 O(1)，只保留最近的 max_size 个字符。
+
+    属性:
+        max_size (int): 最多保留的字符数，0 表示不限制
+        dropped (int): 因超过上限而丢弃的字符数
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_OUTPUT_SIZE):
+        self.max_size = max_size
+        self.dropped = 0
+        self._chunks = deque()
+        self._size = 0
+
+    def append(self, text: str) -> None:
+        if not text:
+            return
+        self._chunks.append(text)
+        self._size += len(text)
+
+        # 整块丢弃最早的输出，直到剩余部分刚好不少于上限
+        if self.max_size > 0:
+            while len(self._chunks) > 1 and self._size - len(self._chunks[0]) >= self.max_size:
+                chunk = self._chunks.popleft()
+                self._size -= len(chunk)
+                self.dropped += len(chunk)
+
+    def getvalue(self) -> str:
+        text = ''.join(self._chunks)
+        dropped = self.dropped
+        if self.max_size > 0 and len(text) > self.max_size:
+            dropped += len(text) - self.max_size
+            text = text[-self.max_size:]
+        if dropped:
+            text = f"[输出过长，已省略前 {dropped} 个字符]\n" + text
+        return text
+
+
+def _drain_stream(stream, buffer: OutputBuffer, source: str,
+                  output_callback: Optional[OutputCallback], chunk_size: int) -> None:
+    """持续读取管道直到EOF，按块写入缓冲区，并按整行回调。"""
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder('utf-8')(errors='replace'), translate=True)
+    pending = ''
+    try:
+        while True:
+            data = stream.read1(chunk_size)
+            text = decoder.decode(data, final=not data)
+            buffer.append(text)
+
+            if output_callback and (text or pending):
+                lines = (pending + text).split('\n')
+                pending = lines.pop()
+                # 没有换行的超长输出也按块回调，避免无限累积
+                if not data or len(pending) > chunk_size:
+                    if pending:
+                        lines.append(pending)
+                    pending = ''
+                if lines:
+                    output_callback(source, lines)
+
+            if not data:
+                break
+    except Exception as e:
+        logger.error(f"读取脚本{source}时出错: {e}", exc_info=True)
+    finally:
+        stream.close()
+
+
+def kill_process_tree(process: subprocess.Popen) -> None:
+    """结束进程及其所有子进程（批处理启动的sqlplus等）。"""
+    try:
+        if sys.platform == 'win32':
+            subprocess.call(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        process.kill()
+
+
+def _combine_output(stdout_buffer: OutputBuffer, stderr_buffer: OutputBuffer) -> str:
+    output = stdout_buffer.getvalue()
+    stderr = stderr_buffer.getvalue()
+    if stderr:
+        output += "\n错误输出:\n" + stderr
+    return output
+
+
+def run_script(batch_file: str, timeout: Optional[float] = None,
+               output_callback: Optional[OutputCallback] = None,
+               max_output_size: int = DEFAULT_MAX_OUTPUT_SIZE,
+               chunk_size: int = DEFAULT_CHUNK_SIZE,
+               cancel_event: Optional[threading.Event] = None,
+               args: Optional[List[str]] = None) -> str:
+    """运行批处理文件，同时读取标准输出和错误输出。
+
+    两个管道各由一个线程读取，任何一个管道写满都不会阻塞脚本；
+    输出按块保存，整体为线性时间。超时或取消时结束整个进程树。
+
+    Args:
+        batch_file: 批处理文件路径
+        timeout: 超时时间（秒），None 或 0 表示不限制
+        output_callback: 输出回调函数，在读取线程中按整行批量调用
+        max_output_size: 每个管道最多保留的字符数，0 表示不限制
+        chunk_size: 每次从管道读取的字节数
+        cancel_event: 取消标志，被设置后立即结束脚本
+        args: 传给批处理文件的参数
+
+    Returns:
+        str: 标准输出（如有错误输出则追加在后）
+
+    Raises:
+        subprocess.TimeoutExpired: 脚本在超时时间内没有结束，output 为已读取的输出
+        ScriptCancelled: 脚本被取消，output 为已读取的输出
+    """
+    command = batch_file
+    if args:
+        quote = subprocess.list2cmdline if sys.platform == 'win32' else shlex.join
+        command = quote([batch_file] + [str(arg) for arg in args])
+
+    popen_kwargs = {}
+    if sys.platform != 'win32':
+        # 新建进程组，超时时可以连同子进程一起结束
+        popen_kwargs['start_new_session'] = True
+
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        shell=True,
+        **popen_kwargs
+    )
+
+    stdout_buffer = OutputBuffer(max_output_size)
+    stderr_buffer = OutputBuffer(max_output_size)
+    readers = [
+        # 读取线程继承调用者的日志上下文（轮次、目标、脚本），输出记录的日志可以按这些字段查找
+        threading.Thread(target=bind_context(_drain_stream), daemon=True,
+                         args=(process.stdout, stdout_buffer, 'stdout', output_callback, chunk_size)),
+        threading.Thread(target=bind_context(_drain_stream), daemon=True,
+                         args=(process.stderr, stderr_buffer, 'stderr', output_callback, chunk_size)),
+    ]
+    for reader in readers:
+        reader.start()
+
+    deadline = time.monotonic() + timeout if timeout else None
+    interrupted = None
+    try:
+        while True:
+            wait_time = CANCEL_POLL_INTERVAL if cancel_event is not None else None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                wait_time = remaining if wait_time is None else min(wait_time, remaining)
+            try:
+                process.wait(timeout=max(0, wait_time) if wait_time is not None else None)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel_event is not None and cancel_event.is_set():
+                    interrupted = 'cancelled'
+                elif deadline is not None and time.monotonic() >= deadline:
+                    interrupted = 'timeout'
+                if interrupted:
+                    kill_process_tree(process)
+                    process.wait()
+                    break
+    finally:
+        # 子进程可能把管道遗留给孙进程，等待读取线程时设置上限
+        for reader in readers:
+            reader.join(timeout=5)
+
+    output = _combine_output(stdout_buffer, stderr_buffer)
+    if interrupted == 'timeout':
+        logger.warning(f"脚本超过{timeout}秒未完成，已结束进程树: {batch_file}")
+        raise subprocess.TimeoutExpired(batch_file, timeout, output=output)
+    if interrupted == 'cancelled':
+        logger.warning(f"脚本已取消，已结束进程树: {batch_file}")
+        raise ScriptCancelled(batch_file, output)
+    return output
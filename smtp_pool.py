@@ -0,0 +1,342 @@
+import copy
+import time
+import socket
+import smtplib
+import logging
+import threading
+from contextlib import contextmanager
+from email import policy
+from email.message import Message
+from email.utils import getaddresses
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+from mime_stream import StreamingMessage, send_chunks
+
+logger = logging.getLogger(__name__)
+
+# 每个连接最多发送的邮件数，超过后重新连接（很多服务器限制单个会话的邮件数）
+DEFAULT_MAX_MESSAGES_PER_CONNECTION = 50
+
+# 连接空闲超过该秒数后，复用前先用 NOOP 检查是否仍然可用
+DEFAULT_NOOP_AFTER_IDLE = 10
+
+# 空闲超过该秒数的连接直接关闭重建（服务器通常在几分钟后断开空闲会话）
+DEFAULT_MAX_IDLE = 240
+
+# 服务器表示会话已失效、可以在新连接上重试的错误
+_RETRY_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)
+_RETRY_CODES = {421}
+
+# 只影响单封邮件的错误：smtplib 已对会话执行 RSET，连接可以继续使用
+_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def is_permanent_error(error: BaseException) -> bool:
+    """服务器明确拒绝（5xx）的错误，重试也不会成功。包装过的异常按 __cause__ 判断。"""
+    while error.__cause__ is not None and not isinstance(error, smtplib.SMTPException):
+        error = error.__cause__
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class DeliveryUnknown(smtplib.SMTPException):
+    """邮件内容已写入数据流，但在收到服务器确认前连接中断，无法确定是否已送达。
+
+    这种情况不能自动重发，否则服务器已经接受的邮件会被重复发送。
+    """
+
+
+def _message_envelope(msg: Message, from_addr: Optional[str],
+                      to_addrs: Optional[List[str]]) -> Tuple[str, List[str], bytes]:
+    """按 smtplib.SMTP.send_message 的规则确定发件人、收件人，返回 (发件人, 收件人, 内容)。"""
+    if from_addr is None:
+        from_addr = getaddresses(msg.get_all('Sender') or msg.get_all('From', []))[0][1]
+    if to_addrs is None:
+        to_addrs = [addr for _, addr in getaddresses(msg.get_all('To', []) + msg.get_all('Cc', [])
+                                                     + msg.get_all('Bcc', [])) if addr]
+    # 密送地址不写入邮件内容
+    data = msg
+    if 'Bcc' in msg or 'Resent-Bcc' in msg:
+        data = copy.copy(msg)
+        del data['Bcc']
+        del data['Resent-Bcc']
+    return from_addr, list(to_addrs), data.as_bytes(policy=policy.SMTP)
+
+
+def deliver(smtp: smtplib.SMTP, msg: Union[Message, StreamingMessage], from_addr: Optional[str] = None,
+            to_addrs: Optional[List[str]] = None) -> None:
+    """在一个已登录的会话上发送一封邮件。
+
+    服务器接受 DATA 命令之前连接断开时原样抛出，可以在新连接上重试；
+    之后才断开的抛出 DeliveryUnknown，由调用方决定是否确认后重发。
+
+    Raises:
+        DeliveryUnknown: 内容已发出但没有收到服务器的确认
+    """
+    data_started = False
+
+    def on_data():
+        nonlocal data_started
+        data_started = True
+
+    try:
+        if isinstance(msg, StreamingMessage):
+            msg.send(smtp, from_addr, to_addrs, on_data=on_data)
+        else:
+            from_addr, to_addrs, data = _message_envelope(msg, from_addr, to_addrs)
+            send_chunks(smtp, from_addr, to_addrs, [(data, True)], on_data)
+    except _RETRY_ERRORS as e:
+        if not data_started:
+            raise
+        raise DeliveryUnknown(f"邮件内容已发出，但在服务器确认前连接中断（{e}），无法确定是否已送达") from e
+
+
+class RateLimiter:
+    """限制发送速率，多个线程共用。
+
+    按固定间隔（60 / 每分钟邮件数）分配发送时间，并允许最多 burst 封的突发，
+    避免中继服务器因短时间内邮件过多而限流。
+
+    属性:
+        per_minute (float): 每分钟最多发送的邮件数
+        burst (int): 允许连续发送而不等待的邮件数
+    """
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        if per_minute <= 0:
+            raise ValueError(f"每分钟邮件数必须大于0: {per_minute}")
+        self.per_minute = per_minute
+        self.burst = max(1, burst)
+        self._interval = 60.0 / per_minute
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic() - self._interval * (self.burst - 1)
+
+    def acquire(self) -> float:
+        """等待到可以发送下一封邮件，返回等待的秒数。"""
+        with self._lock:
+            now = time.monotonic()
+            # 空闲时最多积累 burst 封的额度
+            earliest = max(self._next_free, now - self._interval * (self.burst - 1))
+            self._next_free = earliest + self._interval
+            wait = earliest - now
+        if wait > 0:
+            time.sleep(wait)
+            return wait
+        return 0.0
+
+
+class PooledConnection:
+    """连接池中的一个已登录SMTP会话。
+
+    属性:
+        smtp (smtplib.SMTP): SMTP连接
+        messages_sent (int): 本会话已发送的邮件数
+        created (float): 建立时间（单调时钟）
+        last_used (float): 最后使用时间（单调时钟）
+    """
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.messages_sent = 0
+        self.created = time.monotonic()
+        self.last_used = self.created
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_used
+
+    def close(self) -> None:
+        try:
+            self.smtp.quit()
+        except Exception:
+            # 服务器已断开时 QUIT 会失败，直接关闭套接字
+            try:
+                self.smtp.close()
+            except Exception:
+                pass
+
+
+class SMTPConnectionPool:
+    """复用已登录SMTP会话的连接池。
+
+    批量发送时 TLS 握手和 AUTH 只在建立连接时进行一次，之后的邮件复用同一会话。
+    复用前对空闲过久的连接发送 NOOP 检查；服务器断开会话时自动重新连接并重试一次；
+    单个连接发送的邮件数达到上限后关闭并重建。连接按需建立，线程安全。
+
+    属性:
+        connect (callable): 建立并登录新连接的函数，返回 smtplib.SMTP
+        max_size (int): 最多同时打开的连接数
+        max_messages_per_connection (int): 每个连接最多发送的邮件数，0 表示不限制
+        noop_after_idle (float): 空闲超过该秒数后复用前先发送 NOOP
+        max_idle (float): 空闲超过该秒数的连接直接关闭
+        rate_limiter (RateLimiter): 发送速率限制，None 表示不限制
+    """
+
+    def __init__(self, connect: Callable[[], smtplib.SMTP], max_size: int = 1,
+                 max_messages_per_connection: int = DEFAULT_MAX_MESSAGES_PER_CONNECTION,
+                 noop_after_idle: float = DEFAULT_NOOP_AFTER_IDLE,
+                 max_idle: float = DEFAULT_MAX_IDLE,
+                 rate_limiter: Optional[RateLimiter] = None):
+        if max_size <= 0:
+            raise ValueError(f"连接池大小必须大于0: {max_size}")
+        self.connect = connect
+        self.max_size = max_size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.noop_after_idle = noop_after_idle
+        self.max_idle = max_idle
+        self.rate_limiter = rate_limiter
+
+        self._idle: List[PooledConnection] = []
+        self._open_count = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+        # 统计信息
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.reconnects = 0
+
+    def _is_usable(self, conn: PooledConnection) -> bool:
+        """检查空闲连接是否仍可复用。"""
+        if self.max_messages_per_connection and conn.messages_sent >= self.max_messages_per_connection:
+            return False
+        idle = conn.idle_seconds()
+        if idle > self.max_idle:
+            return False
+        if idle > self.noop_after_idle:
+            try:
+                code, _ = conn.smtp.noop()
+            except (smtplib.SMTPException, OSError):
+                return False
+            return code == 250
+        return True
+
+    def _open(self) -> PooledConnection:
+        conn = PooledConnection(self.connect())
+        self.connections_opened += 1
+        logger.debug(f"已建立SMTP连接（第{self.connections_opened}个）")
+        return conn
+
+    def _discard(self, conn: PooledConnection) -> None:
+        conn.close()
+        with self._condition:
+            self._open_count -= 1
+            self._condition.notify()
+
+    def _take(self, fresh: bool = False) -> PooledConnection:
+        """取出一个可用连接，没有空闲连接且已达上限时等待。
+
+        Args:
+            fresh: 不复用空闲连接，总是新建（重试时使用，避免再次拿到同样将被断开的会话）
+        """
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise RuntimeError("SMTP连接池已关闭")
+                if self._idle:
+                    conn = self._idle.pop()
+                elif self._open_count < self.max_size:
+                    # 先占位，连接在锁外建立
+                    self._open_count += 1
+                    conn = None
+                else:
+                    self._condition.wait()
+                    continue
+
+            if conn is not None and fresh:
+                # 关闭空闲连接，在同一个位置上新建
+                conn.close()
+                conn = None
+
+            if conn is None:
+                try:
+                    return self._open()
+                except BaseException:
+                    with self._condition:
+                        self._open_count -= 1
+                        self._condition.notify()
+                    raise
+
+            if self._is_usable(conn):
+                return conn
+            logger.debug(f"SMTP连接已失效或达到发送上限（已发送{conn.messages_sent}封），重新连接")
+            self._discard(conn)
+
+    def _release(self, conn: PooledConnection) -> None:
+        conn.last_used = time.monotonic()
+        with self._condition:
+            if self._closed:
+                self._open_count -= 1
+                close = True
+            else:
+                self._idle.append(conn)
+                close = False
+            self._condition.notify()
+        if close:
+            conn.close()
+
+    @contextmanager
+    def connection(self, fresh: bool = False) -> Iterator[PooledConnection]:
+        """借出一个连接，正常结束或只是单封邮件被拒绝时归还，连接出错时关闭。"""
+        conn = self._take(fresh)
+        try:
+            yield conn
+        except _MESSAGE_ERRORS as e:
+            if getattr(e, 'smtp_code', None) in _RETRY_CODES:
+                self._discard(conn)
+            else:
+                self._release(conn)
+            raise
+        except BaseException:
+            self._discard(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def send_message(self, msg: Union[Message, StreamingMessage], from_addr: Optional[str] = None,
+                     to_addrs: Optional[List[str]] = None) -> None:
+        """通过池中的连接发送邮件，会话被服务器断开时在新连接上重试一次。
+
+        StreamingMessage 按块直接写入数据流，重试时重新生成内容。
+        只在服务器接受 DATA 命令之前失败时重试；内容已经发出的不再重发，
+        连接中断时抛出 DeliveryUnknown，服务器回复错误时原样抛出。
+        """
+        for attempt in range(2):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                with self.connection(fresh=attempt > 0) as conn:
+                    deliver(conn.smtp, msg, from_addr, to_addrs)
+                    conn.messages_sent += 1
+                with self._condition:
+                    self.messages_sent += 1
+                return
+            except smtplib.SMTPResponseException as e:
+                # SMTPDataError 不重试：可能是对已发出内容的回复，服务器也许已经处理了这封邮件
+                if attempt or e.smtp_code not in _RETRY_CODES or isinstance(e, smtplib.SMTPDataError):
+                    raise
+                logger.warning(f"SMTP服务器关闭了会话（{e.smtp_code}），重新连接后重试")
+            except _RETRY_ERRORS as e:
+                if attempt:
+                    raise
+                logger.warning(f"SMTP连接已断开（{e}），重新连接后重试")
+            with self._condition:
+                self.reconnects += 1
+
+    def close(self) -> None:
+        """关闭所有空闲连接；借出中的连接归还时关闭。"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open_count -= len(idle)
+            self._condition.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def __enter__(self) -> 'SMTPConnectionPool':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -0,0 +1,71 @@
+import queue
+from dataclasses import dataclass
+from typing import List
+
+
+@dataclass(frozen=True)
+class StatusChanged:
+    """状态栏文字。"""
+    text: str
+    coalesce = True
+
+
+@dataclass(frozen=True)
+class MonitorStateChanged:
+    """监控开始或结束，界面据此切换按钮状态。"""
+    running: bool
+    coalesce = True
+
+
+@dataclass(frozen=True)
+class AnalysisReplaced:
+    """用新内容替换分析结果（空字符串为清空）。"""
+    text: str
+    coalesce = True
+
+
+@dataclass(frozen=True)
+class ShowMessage:
+    """弹出消息框。
+
+    属性:
+        kind (str): info / warning / error
+        title (str): 标题
+        message (str): 内容
+    """
+    kind: str
+    title: str
+    message: str
+    coalesce = False
+
+
+class UIEventQueue:
+    """工作线程向界面线程传递更新的队列。
+
+    工作线程只调用 post()，不直接操作 Tk 组件；界面线程用 after() 定时调用
+    drain() 分批取出并处理，每次处理的数量有上限，输出再快界面也不会卡顿。
+    同一批中可以合并的事件（coalesce = True，例如状态栏文字）只保留最后一个。
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def post(self, event) -> None:
+        self._queue.put(event)
+
+    def pending(self) -> bool:
+        return not self._queue.empty()
+
+    def drain(self, max_events: int) -> List:
+        """取出最多 max_events 个事件，合并后按发送顺序返回。"""
+        events = []
+        try:
+            while len(events) < max_events:
+                events.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        # 可合并的事件只保留每种类型的最后一个，位置取最后一次出现的位置
+        last_index = {type(event): i for i, event in enumerate(events) if event.coalesce}
+        return [event for i, event in enumerate(events)
+                if not event.coalesce or last_index[type(event)] == i]
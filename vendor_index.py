@@ -0,0 +1,128 @@
+import re
+import difflib
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+# email.ini 中不是供应商邮箱的配置项
+RESERVED_KEYS = {'sender_email', 'email_subject', 'email_body', 'vendor_fuzzy_match'}
+RESERVED_PREFIXES = ('smtp_', 'outbox_', 'scan_')
+
+# 别名配置项前缀，例如 "alias.某某公司: 某某有限公司"
+ALIAS_PREFIX = 'alias.'
+
+# 近似名称归一化时去掉的字符：空白、下划线、连字符和常见中英文标点
+_LOOSE_STRIP_RE = re.compile(r"[\s_\-·.,，。、()（）]+")
+
+MATCH_EXACT = 'exact'
+MATCH_LOOSE = 'loose'
+MATCH_ALIAS = 'alias'
+
+
+def normalize_exact(name: str) -> str:
+    """精确匹配使用的形式：去掉下划线和首尾空白（与原来的比较方式相同）。"""
+    return name.replace('_', '').strip()
+
+
+def normalize_loose(name: str) -> str:
+    """近似匹配使用的形式：全角转半角、去掉空白和标点、忽略大小写。"""
+    return _LOOSE_STRIP_RE.sub('', unicodedata.normalize('NFKC', name)).casefold()
+
+
+def is_vendor_key(key: str) -> bool:
+    return key not in RESERVED_KEYS and not key.startswith(RESERVED_PREFIXES) and not key.startswith(ALIAS_PREFIX)
+
+
+@dataclass
+class VendorMatch:
+    """一次供应商查找的结果。
+
+    属性:
+        vendor_name (str): 查找的供应商名称
+        config_key (str): 匹配到的配置项名称
+        email (str): 邮箱地址
+        match_type (str): exact / loose / alias
+    """
+    vendor_name: str
+    config_key: str
+    email: str
+    match_type: str = MATCH_EXACT
+
+
+class VendorIndex:
+    """供应商名称到邮箱地址的索引，加载配置时建立一次，每次查找都是字典查询。
+
+    查找顺序：精确匹配 → 别名 → 近似匹配（全角/半角、空格、标点、大小写差异）。
+    别名不受 fuzzy 开关影响。
+    近似形式相同但邮箱不同的配置项视为有歧义，不参与近似匹配。
+
+    属性:
+        fuzzy (bool): 是否启用近似匹配
+    """
+
+    def __init__(self, config: Dict[str, str], fuzzy: bool = True):
+        self.fuzzy = fuzzy
+        self._exact: Dict[str, str] = {}
+        self._loose: Dict[str, str] = {}
+        self._aliases: Dict[str, str] = {}
+        self._emails: Dict[str, str] = {}
+        self.ambiguous: Dict[str, List[str]] = {}
+
+        loose_keys: Dict[str, List[str]] = {}
+        for key, value in config.items():
+            if key.startswith(ALIAS_PREFIX):
+                alias = key[len(ALIAS_PREFIX):]
+                self._aliases[normalize_loose(alias)] = value.strip()
+                continue
+            if not is_vendor_key(key):
+                continue
+            self._emails[key] = value
+            # 同一精确形式出现多次时保留第一个（与逐项查找的结果一致）
+            self._exact.setdefault(normalize_exact(key), key)
+            loose_keys.setdefault(normalize_loose(key), []).append(key)
+
+        for loose, keys in loose_keys.items():
+            if len({self._emails[key] for key in keys}) == 1:
+                self._loose[loose] = keys[0]
+            else:
+                self.ambiguous[loose] = keys
+
+    def __len__(self) -> int:
+        return len(self._emails)
+
+    def _find_key(self, name: str) -> Optional[str]:
+        key = self._exact.get(normalize_exact(name))
+        if key is None:
+            key = self._loose.get(normalize_loose(name))
+        return key
+
+    def lookup(self, vendor_name: str) -> Optional[VendorMatch]:
+        """查找供应商，找不到时返回 None。"""
+        key = self._exact.get(normalize_exact(vendor_name))
+        if key is not None:
+            return VendorMatch(vendor_name, key, self._emails[key], MATCH_EXACT)
+
+        # 别名可以指向配置项名称，也可以直接是邮箱地址
+        target = self._aliases.get(normalize_loose(vendor_name))
+        if target is not None:
+            if '@' in target:
+                return VendorMatch(vendor_name, ALIAS_PREFIX + vendor_name, target, MATCH_ALIAS)
+            key = self._find_key(target)
+            if key is not None:
+                return VendorMatch(vendor_name, key, self._emails[key], MATCH_ALIAS)
+
+        if self.fuzzy:
+            key = self._loose.get(normalize_loose(vendor_name))
+            if key is not None:
+                return VendorMatch(vendor_name, key, self._emails[key], MATCH_LOOSE)
+        return None
+
+    def suggest(self, vendor_name: str, count: int = 3) -> List[str]:
+        """找不到时给出名称相近的配置项，只用于提示，不会自动使用。"""
+        candidates = {normalize_loose(key): key for key in self._emails}
+        matches = difflib.get_close_matches(normalize_loose(vendor_name), list(candidates), n=count, cutoff=0.6)
+        return [candidates[match] for match in matches]
+
+    def check(self, vendor_names: Iterable[str]) -> Dict[str, Optional[VendorMatch]]:
+        """批量查找，返回每个供应商的结果（找不到为 None）。"""
+        return {vendor_name: self.lookup(vendor_name) for vendor_name in vendor_names}